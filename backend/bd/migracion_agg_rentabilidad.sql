@@ -0,0 +1,85 @@
+/* ===========================================================
+   MIGRACIÓN: agregado mensual de rentabilidad
+   - agg_rentabilidad_mensual: ventas/costo/unidades/DSO por
+     (anio, mes, tipo_cliente, tipo_transaccion, categoria_producto);
+     también da los drivers del prorrateo de gastos (core/prorrateo.py)
+   - agg_gastos_mensual: gasto total por mes (el prorrateo se hace al leer,
+     sobre los segmentos filtrados, igual que fn_resumen_mensual)
+   - agg_rentabilidad_estado: marcas del último refresco (ids y fecha)
+   - índices filtrados sobre fecha_modificacion para detectar cambios
+   Luego: python manage.py rentabilidad_refrescar --completo
+          y RENTABILIDAD_AGREGADA=True en backend/.env; programar
+          `rentabilidad_refrescar` (p.ej. cada 5 min) para los cambios
+          hechos desde la app fuera del ETL
+   Idempotente.
+   =========================================================== */
+IF OBJECT_ID('dbo.agg_rentabilidad_mensual', 'U') IS NULL
+CREATE TABLE dbo.agg_rentabilidad_mensual (
+    anio                  INT NOT NULL,
+    mes                   INT NOT NULL,
+    id_tipo_cliente       INT NOT NULL,
+    id_tipo_transaccion   INT NOT NULL,
+    id_categoria_producto INT NOT NULL,
+    total_venta           DECIMAL(18,4) NOT NULL,
+    total_costo           DECIMAL(18,4) NOT NULL,
+    total_unidades        DECIMAL(18,2) NOT NULL DEFAULT (0),
+    dso_suma_dias         BIGINT NOT NULL DEFAULT (0),   -- suma de DATEDIFF(venta, pago)
+    dso_pagos             INT NOT NULL DEFAULT (0),      -- pagos promediados (venta x categoría x pago)
+    fecha_actualizacion   DATETIME NOT NULL DEFAULT (GETDATE()),
+    CONSTRAINT PK_agg_rentabilidad_mensual
+        PRIMARY KEY (anio, mes, id_tipo_cliente, id_tipo_transaccion, id_categoria_producto)
+);
+GO
+
+IF OBJECT_ID('dbo.agg_gastos_mensual', 'U') IS NULL
+CREATE TABLE dbo.agg_gastos_mensual (
+    anio                INT NOT NULL,
+    mes                 INT NOT NULL,
+    total_gasto         DECIMAL(18,2) NOT NULL,
+    fecha_actualizacion DATETIME NOT NULL DEFAULT (GETDATE()),
+    CONSTRAINT PK_agg_gastos_mensual PRIMARY KEY (anio, mes)
+);
+GO
+
+IF OBJECT_ID('dbo.agg_rentabilidad_estado', 'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.agg_rentabilidad_estado (
+        id                  INT NOT NULL PRIMARY KEY CHECK (id = 1),
+        ultimo_id_bitacora  BIGINT NOT NULL DEFAULT (0),
+        ultimo_id_detalle   INT NOT NULL DEFAULT (0),
+        ultimo_id_pago      INT NOT NULL DEFAULT (0),
+        ultima_modificacion DATETIME NULL,           -- NULL: el próximo refresco es completo
+        fecha_refresco      DATETIME NULL,
+        meses_refrescados   INT NOT NULL DEFAULT (0)
+    );
+    INSERT INTO dbo.agg_rentabilidad_estado (id) VALUES (1);
+END
+GO
+
+-- agregados creados antes de total_unidades: la columna se agrega y el
+-- próximo refresco es completo (ultima_modificacion = NULL) para llenarla
+IF COL_LENGTH('dbo.agg_rentabilidad_mensual', 'total_unidades') IS NULL
+BEGIN
+    ALTER TABLE dbo.agg_rentabilidad_mensual
+        ADD total_unidades DECIMAL(18,2) NOT NULL
+        CONSTRAINT DF_agg_rentabilidad_unidades DEFAULT (0);
+    EXEC ('UPDATE dbo.agg_rentabilidad_estado SET ultima_modificacion = NULL WHERE id = 1');
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_detalle_ventas_fecha_mod')
+    CREATE INDEX IX_detalle_ventas_fecha_mod ON dbo.detalle_ventas(fecha_modificacion)
+        INCLUDE (id_venta) WHERE fecha_modificacion IS NOT NULL;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_pagos_fecha_mod')
+    CREATE INDEX IX_pagos_fecha_mod ON dbo.pagos(fecha_modificacion)
+        INCLUDE (id_venta) WHERE fecha_modificacion IS NOT NULL;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_clientes_fecha_mod')
+    CREATE INDEX IX_clientes_fecha_mod ON dbo.clientes(fecha_modificacion)
+        WHERE fecha_modificacion IS NOT NULL;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_productos_fecha_mod')
+    CREATE INDEX IX_productos_fecha_mod ON dbo.productos(fecha_modificacion)
+        WHERE fecha_modificacion IS NOT NULL;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_detalle_ventas_venta')
+    CREATE INDEX IX_detalle_ventas_venta ON dbo.detalle_ventas(id_venta)
+        INCLUDE (id_producto, cantidad, precio_unitario, costo_unitario_venta);
+GO
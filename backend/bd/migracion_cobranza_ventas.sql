@@ -0,0 +1,461 @@
+/* ===========================================================
+   MIGRACIÓN: tiempos de cobro por venta (DSO)
+   - cobranza_ventas: por venta con pagos, primer/último pago, cantidad
+     y suma de días venta->pago, días ponderados por monto y fecha en
+     que quedó saldada (crédito: cuotas cubiertas en pago_cuota;
+     contado o sin cuotas: pagos acumulados >= total_venta_final)
+   - sp_cobranza_ventas_recalcular: recalcula las ventas indicadas (las
+     que no tienen pagos quedan fuera)
+   - triggers en pagos, pago_cuota, cuota_creditos y ventas: recalculan
+     solo las ventas tocadas (app, recálculo de totales y ETL)
+   - vw_resumen_rentabilidades y fn_resumen_mensual: el DSO por segmento
+     sale de cobranza_ventas en vez de unir cada pago con
+     ventas_categorias (mismo promedio: suma de días / pagos)
+   - carga inicial desde pagos
+   Luego: COBRANZA_VENTAS=True en backend/.env (el agregado de
+          rentabilidad también la usa)
+   Verificar/reconstruir: python manage.py cobranza_reconstruir
+   Idempotente.
+   =========================================================== */
+IF OBJECT_ID('dbo.cobranza_ventas', 'U') IS NULL
+CREATE TABLE dbo.cobranza_ventas (
+    id_venta            INT NOT NULL PRIMARY KEY,
+    primer_pago         DATE NOT NULL,
+    ultimo_pago         DATE NOT NULL,
+    pagos               INT NOT NULL,
+    monto_pagado        DECIMAL(14,2) NOT NULL,
+    dias_suma           INT NOT NULL,            -- suma de DATEDIFF(venta, pago) de cada pago
+    dias_ponderados     DECIMAL(9,2) NULL,       -- promedio de días ponderado por monto_pago
+    fecha_saldada       DATE NULL,               -- NULL: todavía con saldo
+    dias_saldada        INT NULL,                -- DATEDIFF(venta, fecha_saldada)
+    fecha_actualizacion DATETIME NOT NULL DEFAULT (GETDATE()),
+    CONSTRAINT FK_cobranza_ventas_venta FOREIGN KEY (id_venta) REFERENCES dbo.ventas(id_venta)
+);
+GO
+
+IF TYPE_ID('dbo.tipo_ids_venta') IS NULL
+CREATE TYPE dbo.tipo_ids_venta AS TABLE (id_venta INT NOT NULL PRIMARY KEY);
+GO
+
+CREATE OR ALTER PROCEDURE dbo.sp_cobranza_ventas_recalcular
+    @ids dbo.tipo_ids_venta READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DELETE c
+    FROM dbo.cobranza_ventas c
+    JOIN @ids i ON i.id_venta = c.id_venta;
+
+    WITH ventas_sel AS (
+        SELECT v.id_venta, v.id_tipo_transaccion, v.total_venta_final, fv.fecha AS fecha_venta
+        FROM @ids i
+        JOIN dbo.ventas v     ON v.id_venta = i.id_venta
+        JOIN dbo.dim_fecha fv ON fv.id_fecha = v.id_fecha
+    ),
+    programado AS (  -- total de cuotas de las ventas a crédito
+        SELECT c.id_venta, SUM(c.monto_programado) AS monto_programado
+        FROM dbo.cuota_creditos c
+        JOIN @ids i ON i.id_venta = c.id_venta
+        GROUP BY c.id_venta
+    ),
+    pagos_sel AS (
+        SELECT vs.id_venta, fp.fecha, p.monto_pago,
+               DATEDIFF(DAY, vs.fecha_venta, fp.fecha) AS dias,
+               SUM(p.monto_pago) OVER (PARTITION BY p.id_venta ORDER BY fp.fecha, p.id_pago
+                                       ROWS UNBOUNDED PRECEDING) AS pagado_acum,
+               SUM(ISNULL(pc.asignado, 0)) OVER (PARTITION BY p.id_venta ORDER BY fp.fecha, p.id_pago
+                                                 ROWS UNBOUNDED PRECEDING) AS asignado_acum
+        FROM ventas_sel vs
+        JOIN dbo.pagos p      ON p.id_venta = vs.id_venta
+        JOIN dbo.dim_fecha fp ON fp.id_fecha = p.id_fecha
+        OUTER APPLY (
+            SELECT SUM(x.monto_asignado) AS asignado FROM dbo.pago_cuota x WHERE x.id_pago = p.id_pago
+        ) pc
+    ),
+    resumen AS (
+        SELECT
+            vs.id_venta,
+            MIN(ps.fecha) AS primer_pago,
+            MAX(ps.fecha) AS ultimo_pago,
+            COUNT(*) AS pagos,
+            SUM(ps.monto_pago) AS monto_pagado,
+            SUM(ps.dias) AS dias_suma,
+            CONVERT(DECIMAL(9,2), SUM(ps.monto_pago * ps.dias) / NULLIF(SUM(ps.monto_pago), 0)) AS dias_ponderados,
+            MIN(CASE
+                    WHEN vs.id_tipo_transaccion = 2 AND pr.monto_programado > 0
+                        THEN CASE WHEN ps.asignado_acum >= pr.monto_programado THEN ps.fecha END
+                    WHEN ps.pagado_acum >= vs.total_venta_final THEN ps.fecha
+                END) AS fecha_saldada,
+            MIN(vs.fecha_venta) AS fecha_venta
+        FROM ventas_sel vs
+        JOIN pagos_sel ps      ON ps.id_venta = vs.id_venta
+        LEFT JOIN programado pr ON pr.id_venta = vs.id_venta
+        GROUP BY vs.id_venta
+    )
+    INSERT INTO dbo.cobranza_ventas
+        (id_venta, primer_pago, ultimo_pago, pagos, monto_pagado, dias_suma,
+         dias_ponderados, fecha_saldada, dias_saldada)
+    SELECT id_venta, primer_pago, ultimo_pago, pagos, monto_pagado, dias_suma,
+           dias_ponderados, fecha_saldada, DATEDIFF(DAY, fecha_venta, fecha_saldada)
+    FROM resumen;
+END;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_cobranza_pagos
+ON dbo.pagos
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(id_venta) OR UPDATE(id_fecha) OR UPDATE(monto_pago))
+        RETURN;
+
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta)
+    SELECT id_venta FROM inserted
+    UNION
+    SELECT id_venta FROM deleted;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+END;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_cobranza_pago_cuota
+ON dbo.pago_cuota
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(id_pago) OR UPDATE(id_cuota) OR UPDATE(monto_asignado))
+        RETURN;
+
+    -- por la cuota (el pago puede estar borrándose en cascada)
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta)
+    SELECT c.id_venta
+    FROM (SELECT id_cuota FROM inserted UNION SELECT id_cuota FROM deleted) x
+    JOIN dbo.cuota_creditos c ON c.id_cuota = x.id_cuota
+    GROUP BY c.id_venta;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+END;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_cobranza_cuota_creditos
+ON dbo.cuota_creditos
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(id_venta) OR UPDATE(monto_programado))
+        RETURN;
+
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta)
+    SELECT id_venta FROM inserted
+    UNION
+    SELECT id_venta FROM deleted;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+END;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_cobranza_ventas
+ON dbo.ventas
+AFTER UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF EXISTS (SELECT 1 FROM inserted)
+       AND NOT (UPDATE(id_fecha) OR UPDATE(total_venta_final) OR UPDATE(id_tipo_transaccion))
+        RETURN;
+
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta)
+    SELECT id_venta FROM deleted;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+END;
+GO
+
+/* carga inicial (solo si está vacío) */
+IF NOT EXISTS (SELECT 1 FROM dbo.cobranza_ventas)
+BEGIN
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta) SELECT DISTINCT id_venta FROM dbo.pagos;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+END
+GO
+
+CREATE OR ALTER VIEW dbo.vw_resumen_rentabilidades
+AS
+WITH base AS (
+    SELECT
+        df.anio,
+        df.mes,
+        tc.id_tipo_cliente,
+        vt.id_tipo_transaccion,
+        cp.id_categoria AS id_categoria_producto,
+        SUM(dv.cantidad * dv.precio_unitario)      AS total_venta,
+        SUM(dv.cantidad * dv.costo_unitario_venta) AS total_costo
+    FROM dbo.ventas vt
+    JOIN dbo.detalle_ventas dv       ON dv.id_venta = vt.id_venta
+    JOIN dbo.dim_fecha df            ON df.id_fecha = vt.id_fecha
+    JOIN dbo.clientes cl             ON cl.id_cliente = vt.id_cliente
+    JOIN dbo.tipo_clientes tc        ON tc.id_tipo_cliente = cl.id_tipo_cliente
+    JOIN dbo.productos pr            ON pr.id_producto = dv.id_producto
+    JOIN dbo.categoria_productos cp  ON cp.id_categoria = pr.id_categoria
+    GROUP BY df.anio, df.mes, tc.id_tipo_cliente, vt.id_tipo_transaccion, cp.id_categoria
+),
+ventas_periodo AS (  -- ventas totales por periodo (para prorrateo de gastos)
+    SELECT anio, mes, SUM(total_venta) AS total_venta_periodo
+    FROM base
+    GROUP BY anio, mes
+),
+gastos_periodo AS (  -- gastos totales por periodo
+    SELECT df.anio, df.mes, SUM(g.monto_gasto) AS total_gasto_periodo
+    FROM dbo.gastos g
+    JOIN dbo.dim_fecha df ON df.id_fecha = g.id_fecha
+    GROUP BY df.anio, df.mes
+),
+-- AJUSTE 1: cada venta puede tener varias líneas; tomamos una fila por venta-categoría
+ventas_categorias AS (
+    SELECT DISTINCT
+        v.id_venta,
+        cp.id_categoria AS id_categoria_producto
+    FROM dbo.ventas v
+    JOIN dbo.detalle_ventas dv       ON dv.id_venta = v.id_venta
+    JOIN dbo.productos pr            ON pr.id_producto = dv.id_producto
+    JOIN dbo.categoria_productos cp  ON cp.id_categoria = pr.id_categoria
+),
+dso_segmento AS (  -- DSO por segmento: días y pagos de cada venta ya sumados en cobranza_ventas
+    SELECT
+        df.anio,
+        df.mes,
+        tc.id_tipo_cliente,
+        v.id_tipo_transaccion,
+        vc.id_categoria_producto,
+        SUM(CAST(cv.dias_suma AS BIGINT)) * 1.0 / NULLIF(SUM(cv.pagos), 0) AS dso_dias_prom
+    FROM dbo.ventas v
+    JOIN ventas_categorias vc    ON vc.id_venta = v.id_venta
+    JOIN dbo.cobranza_ventas cv  ON cv.id_venta = v.id_venta
+    JOIN dbo.clientes cl         ON cl.id_cliente = v.id_cliente
+    JOIN dbo.tipo_clientes tc    ON tc.id_tipo_cliente = cl.id_tipo_cliente
+    JOIN dbo.dim_fecha df        ON df.id_fecha = v.id_fecha
+    GROUP BY df.anio, df.mes, tc.id_tipo_cliente, v.id_tipo_transaccion, vc.id_categoria_producto
+),
+-- AJUSTE 2: proporción decimal segura para prorratear gastos
+proporcion AS (
+    SELECT
+        b.anio,
+        b.mes,
+        b.id_tipo_cliente,
+        b.id_tipo_transaccion,
+        b.id_categoria_producto,
+        CAST(b.total_venta AS DECIMAL(18,6)) /
+        NULLIF(CAST(vp.total_venta_periodo AS DECIMAL(18,6)), 0) AS pct
+    FROM base b
+    JOIN ventas_periodo vp
+      ON vp.anio = b.anio AND vp.mes = b.mes
+)
+SELECT
+    b.anio,
+    b.mes,
+    b.id_tipo_cliente,
+    b.id_tipo_transaccion,
+    b.id_categoria_producto,
+    b.total_venta,
+    b.total_costo,
+    (b.total_venta - b.total_costo) AS margen_bruto,
+    -- Gastos asignados = gastos del periodo * % participación del segmento
+    CONVERT(DECIMAL(12,2),
+        ISNULL(gp.total_gasto_periodo, 0) * ISNULL(p.pct, 0)
+    ) AS gastos_asignados,
+    -- Margen neto
+    CONVERT(DECIMAL(12,2),
+        (b.total_venta - b.total_costo)
+        - (ISNULL(gp.total_gasto_periodo, 0) * ISNULL(p.pct, 0))
+    ) AS margen_neto,
+    ds.dso_dias_prom
+FROM base b
+LEFT JOIN gastos_periodo gp
+  ON gp.anio = b.anio AND gp.mes = b.mes
+LEFT JOIN proporcion p
+  ON p.anio = b.anio
+ AND p.mes  = b.mes
+ AND p.id_tipo_cliente      = b.id_tipo_cliente
+ AND p.id_tipo_transaccion  = b.id_tipo_transaccion
+ AND p.id_categoria_producto= b.id_categoria_producto
+LEFT JOIN dso_segmento ds
+  ON ds.anio = b.anio 
+ AND ds.mes  = b.mes 
+ AND ds.id_tipo_cliente      = b.id_tipo_cliente
+ AND ds.id_tipo_transaccion  = b.id_tipo_transaccion
+ AND ds.id_categoria_producto= b.id_categoria_producto;
+GO
+
+CREATE OR ALTER FUNCTION dbo.fn_resumen_mensual(
+    @desde DATE = NULL,                  -- inclusive (si NULL, sin límite inferior)
+    @hasta DATE = NULL,                  -- inclusive (si NULL, sin límite superior)
+    @id_tipo_cliente INT = NULL,         -- filtro opcional
+    @id_tipo_transaccion INT = NULL,     -- filtro opcional
+    @id_categoria_producto INT = NULL    -- filtro opcional
+)
+RETURNS TABLE
+AS
+RETURN
+/* ============================================================
+   Devuelve KPIs mensuales:
+   - total_venta, total_costo, margen_bruto, gastos_asignados, margen_neto, dso_dias_prom
+   - clave: anio, mes, id_tipo_cliente, id_tipo_transaccion, id_categoria_producto
+   - nombres incluidos para filtros en UI
+   Incluye meses sin datos (cero) dentro del rango [@desde, @hasta].
+   Ajustes:
+   (1) DSO sin duplicados por venta-categoría (ventas_categorias),
+       con días y pagos por venta de dbo.cobranza_ventas
+   (2) Prorrateo decimal seguro con CAST/NULLIF
+   ============================================================ */
+WITH rango AS (
+    SELECT
+        ISNULL(@desde, (SELECT MIN(fecha) FROM dbo.dim_fecha)) AS f_ini,
+        ISNULL(@hasta, (SELECT MAX(fecha) FROM dbo.dim_fecha)) AS f_fin
+),
+meses AS (  -- calendario de meses dentro del rango solicitado (cubre ceros)
+    SELECT DISTINCT
+        DATEFROMPARTS(df.anio, df.mes, 1) AS mes_inicio,
+        df.anio, df.mes
+    FROM dbo.dim_fecha df
+    CROSS JOIN rango r
+    WHERE df.fecha BETWEEN r.f_ini AND r.f_fin
+),
+base AS (
+    SELECT
+        df.anio,
+        df.mes,
+        tc.id_tipo_cliente,
+        vt.id_tipo_transaccion,
+        cp.id_categoria AS id_categoria_producto,
+        SUM(dv.cantidad * dv.precio_unitario)      AS total_venta,
+        SUM(dv.cantidad * dv.costo_unitario_venta) AS total_costo
+    FROM dbo.ventas vt
+    JOIN dbo.detalle_ventas dv       ON dv.id_venta = vt.id_venta
+    JOIN dbo.dim_fecha df            ON df.id_fecha = vt.id_fecha
+    JOIN dbo.clientes cl             ON cl.id_cliente = vt.id_cliente
+    JOIN dbo.tipo_clientes tc        ON tc.id_tipo_cliente = cl.id_tipo_cliente
+    JOIN dbo.productos pr            ON pr.id_producto = dv.id_producto
+    JOIN dbo.categoria_productos cp  ON cp.id_categoria = pr.id_categoria
+    CROSS JOIN rango r
+    WHERE DATEFROMPARTS(df.anio, df.mes, 1) BETWEEN DATEFROMPARTS(YEAR(r.f_ini), MONTH(r.f_ini), 1)
+                                               AND DATEFROMPARTS(YEAR(r.f_fin), MONTH(r.f_fin), 1)
+      AND (@id_tipo_cliente     IS NULL OR tc.id_tipo_cliente     = @id_tipo_cliente)
+      AND (@id_tipo_transaccion IS NULL OR vt.id_tipo_transaccion = @id_tipo_transaccion)
+      AND (@id_categoria_producto IS NULL OR cp.id_categoria      = @id_categoria_producto)
+    GROUP BY df.anio, df.mes, tc.id_tipo_cliente, vt.id_tipo_transaccion, cp.id_categoria
+),
+ventas_periodo AS (
+    SELECT anio, mes, SUM(total_venta) AS total_venta_periodo
+    FROM base
+    GROUP BY anio, mes
+),
+gastos_periodo AS (
+    SELECT df.anio, df.mes, SUM(g.monto_gasto) AS total_gasto_periodo
+    FROM dbo.gastos g
+    JOIN dbo.dim_fecha df ON df.id_fecha = g.id_fecha
+    CROSS JOIN rango r
+    WHERE DATEFROMPARTS(df.anio, df.mes, 1) BETWEEN DATEFROMPARTS(YEAR(r.f_ini), MONTH(r.f_ini), 1)
+                                               AND DATEFROMPARTS(YEAR(r.f_fin), MONTH(r.f_fin), 1)
+    GROUP BY df.anio, df.mes
+),
+ventas_categorias AS (  -- una fila por venta y categoría (evita sesgo en DSO)
+    SELECT DISTINCT
+        v.id_venta,
+        cp.id_categoria AS id_categoria_producto
+    FROM dbo.ventas v
+    JOIN dbo.detalle_ventas dv       ON dv.id_venta = v.id_venta
+    JOIN dbo.productos pr            ON pr.id_producto = dv.id_producto
+    JOIN dbo.categoria_productos cp  ON cp.id_categoria = pr.id_categoria
+),
+dso_segmento AS (  -- DSO por segmento: días y pagos de cada venta ya sumados en cobranza_ventas
+    SELECT
+        df.anio,
+        df.mes,
+        tc.id_tipo_cliente,
+        v.id_tipo_transaccion,
+        vc.id_categoria_producto,
+        SUM(CAST(cv.dias_suma AS BIGINT)) * 1.0 / NULLIF(SUM(cv.pagos), 0) AS dso_dias_prom
+    FROM dbo.ventas v
+    JOIN ventas_categorias vc    ON vc.id_venta = v.id_venta
+    JOIN dbo.cobranza_ventas cv  ON cv.id_venta = v.id_venta
+    JOIN dbo.clientes cl         ON cl.id_cliente = v.id_cliente
+    JOIN dbo.tipo_clientes tc    ON tc.id_tipo_cliente = cl.id_tipo_cliente
+    JOIN dbo.dim_fecha df        ON df.id_fecha = v.id_fecha
+    CROSS JOIN rango r
+    WHERE DATEFROMPARTS(df.anio, df.mes, 1) BETWEEN DATEFROMPARTS(YEAR(r.f_ini), MONTH(r.f_ini), 1)
+                                               AND DATEFROMPARTS(YEAR(r.f_fin), MONTH(r.f_fin), 1)
+      AND (@id_tipo_cliente     IS NULL OR tc.id_tipo_cliente     = @id_tipo_cliente)
+      AND (@id_tipo_transaccion IS NULL OR v.id_tipo_transaccion  = @id_tipo_transaccion)
+      AND (@id_categoria_producto IS NULL OR vc.id_categoria_producto = @id_categoria_producto)
+    GROUP BY df.anio, df.mes, tc.id_tipo_cliente, v.id_tipo_transaccion, vc.id_categoria_producto
+),
+proporcion AS (  -- prorrateo seguro de gastos
+    SELECT
+        b.anio,
+        b.mes,
+        b.id_tipo_cliente,
+        b.id_tipo_transaccion,
+        b.id_categoria_producto,
+        CAST(b.total_venta AS DECIMAL(18,6)) /
+        NULLIF(CAST(vp.total_venta_periodo AS DECIMAL(18,6)), 0) AS pct
+    FROM base b
+    JOIN ventas_periodo vp
+      ON vp.anio = b.anio AND vp.mes = b.mes
+),
+nombres AS (
+    SELECT
+        tc.id_tipo_cliente, tc.nombre_tipo_cliente,
+        tt.id_tipo_transaccion, tt.nombre_tipo_transaccion,
+        cp.id_categoria AS id_categoria_producto, cp.nombre_categoria
+    FROM dbo.tipo_clientes tc
+    CROSS JOIN dbo.tipo_transacciones tt
+    CROSS JOIN dbo.categoria_productos cp
+)
+SELECT
+    m.anio,
+    m.mes,
+    DATEFROMPARTS(m.anio, m.mes, 1) AS mes_inicio,   -- para graficar por mes
+    b.id_tipo_cliente,
+    ISNULL(tc.nombre_tipo_cliente, 'N/A') AS nombre_tipo_cliente,
+    b.id_tipo_transaccion,
+    ISNULL(tt.nombre_tipo_transaccion, 'N/A') AS nombre_tipo_transaccion,
+    b.id_categoria_producto,
+    ISNULL(cp.nombre_categoria, 'N/A') AS nombre_categoria_producto,
+    ISNULL(b.total_venta, 0) AS total_venta,
+    ISNULL(b.total_costo, 0) AS total_costo,
+    ISNULL(b.total_venta, 0) - ISNULL(b.total_costo, 0) AS margen_bruto,
+    CONVERT(DECIMAL(12,2),
+        ISNULL(gp.total_gasto_periodo, 0) * ISNULL(p.pct, 0)
+    ) AS gastos_asignados,
+    CONVERT(DECIMAL(12,2),
+        (ISNULL(b.total_venta, 0) - ISNULL(b.total_costo, 0))
+        - (ISNULL(gp.total_gasto_periodo, 0) * ISNULL(p.pct, 0))
+    ) AS margen_neto,
+    ds.dso_dias_prom
+FROM meses m
+LEFT JOIN base b
+  ON b.anio = m.anio AND b.mes = m.mes
+LEFT JOIN proporcion p
+  ON p.anio = b.anio AND p.mes = b.mes
+ AND p.id_tipo_cliente      = b.id_tipo_cliente
+ AND p.id_tipo_transaccion  = b.id_tipo_transaccion
+ AND p.id_categoria_producto= b.id_categoria_producto
+LEFT JOIN gastos_periodo gp
+  ON gp.anio = m.anio AND gp.mes = m.mes
+LEFT JOIN dso_segmento ds
+  ON ds.anio = b.anio AND ds.mes = b.mes
+ AND ds.id_tipo_cliente      = b.id_tipo_cliente
+ AND ds.id_tipo_transaccion  = b.id_tipo_transaccion
+ AND ds.id_categoria_producto= b.id_categoria_producto
+LEFT JOIN dbo.tipo_clientes tc       ON tc.id_tipo_cliente = b.id_tipo_cliente
+LEFT JOIN dbo.tipo_transacciones tt  ON tt.id_tipo_transaccion = b.id_tipo_transaccion
+LEFT JOIN dbo.categoria_productos cp ON cp.id_categoria = b.id_categoria_producto;
+GO
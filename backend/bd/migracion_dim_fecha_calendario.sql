@@ -0,0 +1,13 @@
+/* ===========================================================
+   MIGRACIÓN: banderas de día hábil en dim_fecha
+   - es_fin_de_semana / es_dia_habil (usadas por dim_fecha_generar)
+   Luego: python manage.py dim_fecha_generar
+   Idempotente.
+   =========================================================== */
+IF COL_LENGTH('dbo.dim_fecha', 'es_fin_de_semana') IS NULL
+    ALTER TABLE dbo.dim_fecha ADD es_fin_de_semana BIT NOT NULL DEFAULT (0);
+GO
+
+IF COL_LENGTH('dbo.dim_fecha', 'es_dia_habil') IS NULL
+    ALTER TABLE dbo.dim_fecha ADD es_dia_habil BIT NOT NULL DEFAULT (1);
+GO
@@ -0,0 +1,259 @@
+/* ===========================================================
+   MIGRACIÓN: dim_fecha.id_fecha IDENTITY -> clave YYYYMMDD
+   - Reescribe id_fecha = YEAR*10000 + MONTH*100 + DAY
+   - Actualiza ventas, pagos, cuota_creditos y gastos con los triggers de
+     ventas apagados (bitácora y, si existe, resumen_ventas_mensual: el
+     resumen es por anio/mes y no cambia; con el trigger encendido uniría
+     la clave nueva con la dim_fecha vieja y vaciaría el resumen) y, si
+     existe cobranza_ventas, los de pagos, ventas y cuota_creditos
+   - Con la dimensión nueva en su lugar reconstruye cobranza_ventas en la
+     misma transacción (sp_cobranza_ventas_recalcular)
+   - Reemplaza los SPs de ETL para calcular la clave sin JOIN
+   Después de correrla: DIM_FECHA_SMART_KEY=True en backend/.env
+   Idempotente: si id_fecha ya no es IDENTITY no hace nada.
+   =========================================================== */
+SET XACT_ABORT ON;
+GO
+
+IF COLUMNPROPERTY(OBJECT_ID('dbo.dim_fecha'), 'id_fecha', 'IsIdentity') = 0
+BEGIN
+    PRINT 'dim_fecha ya usa clave YYYYMMDD; nada que migrar.';
+    SET NOEXEC ON;
+END
+GO
+
+BEGIN TRANSACTION;
+
+/* 1) Nueva dimensión con la clave calculada */
+CREATE TABLE dbo.dim_fecha_yyyymmdd (
+    id_fecha      INT  NOT NULL,
+    fecha         DATE NOT NULL,
+    anio          INT  NOT NULL,
+    mes           INT  NOT NULL,
+    trimestre     INT  NOT NULL,
+    semana_iso    INT  NOT NULL,
+    dia           INT  NOT NULL,
+    nombre_mes    VARCHAR(20) NOT NULL DEFAULT ('SinNombreMes'),
+    nombre_dia    VARCHAR(20) NOT NULL DEFAULT ('SinNombreDia'),
+    es_fin_de_mes BIT NOT NULL DEFAULT (0),
+    es_fin_de_semana BIT NOT NULL DEFAULT (0),
+    es_dia_habil  BIT NOT NULL DEFAULT (1)
+);
+
+-- es_fin_de_semana/es_dia_habil se recalculan (lunes = 0); los feriados los
+-- vuelve a marcar `manage.py dim_fecha_generar`
+INSERT INTO dbo.dim_fecha_yyyymmdd
+    (id_fecha, fecha, anio, mes, trimestre, semana_iso, dia, nombre_mes, nombre_dia, es_fin_de_mes,
+     es_fin_de_semana, es_dia_habil)
+SELECT YEAR(fecha) * 10000 + MONTH(fecha) * 100 + DAY(fecha),
+       fecha, anio, mes, trimestre, semana_iso, dia, nombre_mes, nombre_dia, es_fin_de_mes,
+       CASE WHEN DATEDIFF(DAY, '19000101', fecha) % 7 >= 5 THEN 1 ELSE 0 END,
+       CASE WHEN DATEDIFF(DAY, '19000101', fecha) % 7 >= 5 THEN 0 ELSE 1 END
+FROM dbo.dim_fecha;
+
+/* 2) Soltar las FKs que apuntan a dim_fecha */
+ALTER TABLE dbo.ventas         DROP CONSTRAINT FK_ventas_dim_fecha;
+ALTER TABLE dbo.pagos          DROP CONSTRAINT FK_pagos_fecha;
+ALTER TABLE dbo.cuota_creditos DROP CONSTRAINT FK_cuota_fecha_venc;
+ALTER TABLE dbo.gastos         DROP CONSTRAINT FK_gastos_fecha;
+
+/* 3) Reescribir las claves en los hechos (sin llenar la bitácora ni tocar el resumen) */
+DISABLE TRIGGER dbo.trg_bitacora_ventas ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_resumen_ventas_mensual', 'TR') IS NOT NULL
+    DISABLE TRIGGER dbo.trg_resumen_ventas_mensual ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_cobranza_ventas', 'TR') IS NOT NULL
+    DISABLE TRIGGER dbo.trg_cobranza_ventas ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_cobranza_pagos', 'TR') IS NOT NULL
+    DISABLE TRIGGER dbo.trg_cobranza_pagos ON dbo.pagos;
+IF OBJECT_ID('dbo.trg_cobranza_cuota_creditos', 'TR') IS NOT NULL
+    DISABLE TRIGGER dbo.trg_cobranza_cuota_creditos ON dbo.cuota_creditos;
+
+UPDATE v SET v.id_fecha = n.id_fecha
+FROM dbo.ventas v
+JOIN dbo.dim_fecha o          ON o.id_fecha = v.id_fecha
+JOIN dbo.dim_fecha_yyyymmdd n ON n.fecha = o.fecha;
+
+UPDATE p SET p.id_fecha = n.id_fecha
+FROM dbo.pagos p
+JOIN dbo.dim_fecha o          ON o.id_fecha = p.id_fecha
+JOIN dbo.dim_fecha_yyyymmdd n ON n.fecha = o.fecha;
+
+UPDATE c SET c.id_fecha_venc = n.id_fecha
+FROM dbo.cuota_creditos c
+JOIN dbo.dim_fecha o          ON o.id_fecha = c.id_fecha_venc
+JOIN dbo.dim_fecha_yyyymmdd n ON n.fecha = o.fecha;
+
+UPDATE g SET g.id_fecha = n.id_fecha
+FROM dbo.gastos g
+JOIN dbo.dim_fecha o          ON o.id_fecha = g.id_fecha
+JOIN dbo.dim_fecha_yyyymmdd n ON n.fecha = o.fecha;
+
+ENABLE TRIGGER dbo.trg_bitacora_ventas ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_resumen_ventas_mensual', 'TR') IS NOT NULL
+    ENABLE TRIGGER dbo.trg_resumen_ventas_mensual ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_cobranza_ventas', 'TR') IS NOT NULL
+    ENABLE TRIGGER dbo.trg_cobranza_ventas ON dbo.ventas;
+IF OBJECT_ID('dbo.trg_cobranza_pagos', 'TR') IS NOT NULL
+    ENABLE TRIGGER dbo.trg_cobranza_pagos ON dbo.pagos;
+IF OBJECT_ID('dbo.trg_cobranza_cuota_creditos', 'TR') IS NOT NULL
+    ENABLE TRIGGER dbo.trg_cobranza_cuota_creditos ON dbo.cuota_creditos;
+
+/* 4) Reemplazar la tabla */
+DROP TABLE dbo.dim_fecha;
+EXEC sp_rename 'dbo.dim_fecha_yyyymmdd', 'dim_fecha';
+GO
+
+IF XACT_STATE() <> 1
+BEGIN
+    RAISERROR ('La migración de dim_fecha falló; transacción revertida.', 16, 1);
+    SET NOEXEC ON;
+END
+GO
+
+ALTER TABLE dbo.dim_fecha ADD CONSTRAINT PK_dim_fecha PRIMARY KEY (id_fecha);
+ALTER TABLE dbo.dim_fecha ADD CONSTRAINT UQ_dim_fecha_fecha UNIQUE (fecha);
+ALTER TABLE dbo.dim_fecha ADD CONSTRAINT CHK_dim_fecha_yyyymmdd
+    CHECK (id_fecha = YEAR(fecha) * 10000 + MONTH(fecha) * 100 + DAY(fecha));
+
+/* 5) Restaurar las FKs */
+ALTER TABLE dbo.ventas         ADD CONSTRAINT FK_ventas_dim_fecha  FOREIGN KEY (id_fecha)      REFERENCES dbo.dim_fecha(id_fecha);
+ALTER TABLE dbo.pagos          ADD CONSTRAINT FK_pagos_fecha       FOREIGN KEY (id_fecha)      REFERENCES dbo.dim_fecha(id_fecha);
+ALTER TABLE dbo.cuota_creditos ADD CONSTRAINT FK_cuota_fecha_venc  FOREIGN KEY (id_fecha_venc) REFERENCES dbo.dim_fecha(id_fecha);
+ALTER TABLE dbo.gastos         ADD CONSTRAINT FK_gastos_fecha      FOREIGN KEY (id_fecha)      REFERENCES dbo.dim_fecha(id_fecha);
+
+/* 6) cobranza_ventas contra la dimensión nueva (dinámico: el tipo puede no existir) */
+IF OBJECT_ID('dbo.sp_cobranza_ventas_recalcular', 'P') IS NOT NULL
+    EXEC sp_executesql N'
+        DECLARE @ids dbo.tipo_ids_venta;
+        INSERT INTO @ids (id_venta) SELECT DISTINCT id_venta FROM dbo.pagos;
+        EXEC dbo.sp_cobranza_ventas_recalcular @ids;';
+
+COMMIT TRANSACTION;
+GO
+
+IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+GO
+
+/* 7) Objetos que leen dim_fecha */
+EXEC sp_refreshview 'dbo.vw_resumen_rentabilidades';
+EXEC sp_refreshsqlmodule 'dbo.fn_resumen_mensual';
+GO
+
+/* 8) SPs de ETL: la clave se calcula, ya no se busca en dim_fecha */
+CREATE OR ALTER PROCEDURE dbo.sp_etl_cargar_dimensiones
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- dim_fecha (clave YYYYMMDD)
+    INSERT INTO dbo.dim_fecha (id_fecha, fecha, anio, mes, trimestre, semana_iso, dia)
+    SELECT YEAR(s.fecha) * 10000 + MONTH(s.fecha) * 100 + DAY(s.fecha),
+           s.fecha,
+           YEAR(s.fecha),
+           MONTH(s.fecha),
+           DATEPART(QUARTER, s.fecha),
+           DATEPART(ISO_WEEK, s.fecha),
+           DAY(s.fecha)
+    FROM (
+        SELECT fecha FROM dbo.stg_ventas
+        UNION
+        SELECT fecha FROM dbo.stg_gastos
+    ) s
+    LEFT JOIN dbo.dim_fecha d ON d.fecha = s.fecha
+    WHERE d.id_fecha IS NULL;
+
+    -- tipo_clientes
+    INSERT INTO dbo.tipo_clientes (nombre_tipo_cliente)
+    SELECT DISTINCT sv.tipo_cliente
+    FROM dbo.stg_ventas sv
+    LEFT JOIN dbo.tipo_clientes tc ON tc.nombre_tipo_cliente = sv.tipo_cliente
+    WHERE tc.id_tipo_cliente IS NULL;
+
+    -- categoria_productos
+    INSERT INTO dbo.categoria_productos (nombre_categoria)
+    SELECT DISTINCT sd.categoria_producto
+    FROM dbo.stg_detalle_ventas sd
+    LEFT JOIN dbo.categoria_productos cp ON cp.nombre_categoria = sd.categoria_producto
+    WHERE cp.id_categoria IS NULL;
+
+    -- productos
+    INSERT INTO dbo.productos (nombre_producto, precio_unitario, costo_unitario, id_categoria)
+    SELECT DISTINCT sd.producto, sd.precio_unitario, sd.costo_unitario, cp.id_categoria
+    FROM dbo.stg_detalle_ventas sd
+    JOIN dbo.categoria_productos cp ON cp.nombre_categoria = sd.categoria_producto
+    LEFT JOIN dbo.productos p ON p.nombre_producto = sd.producto
+    WHERE p.id_producto IS NULL;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.sp_etl_cargar_ventas
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- 1) Clientes
+    INSERT INTO dbo.clientes (nombre_cliente, apellido_cliente, id_tipo_cliente)
+    SELECT DISTINCT sv.cliente_nombre, sv.cliente_apellido, tc.id_tipo_cliente
+    FROM dbo.stg_ventas sv
+    JOIN dbo.tipo_clientes tc ON tc.nombre_tipo_cliente = sv.tipo_cliente
+    LEFT JOIN dbo.clientes c
+      ON c.nombre_cliente = sv.cliente_nombre
+     AND c.apellido_cliente = sv.cliente_apellido
+     AND c.id_tipo_cliente = tc.id_tipo_cliente
+    WHERE c.id_cliente IS NULL;
+
+    -- 2) Ventas (id_fecha = YYYYMMDD; la FK valida que exista en dim_fecha)
+    INSERT INTO dbo.ventas (id_cliente, id_tipo_transaccion, id_fecha, plazo_mes, interes, total_venta_final)
+    SELECT c.id_cliente,
+           tt.id_tipo_transaccion,
+           YEAR(sv.fecha) * 10000 + MONTH(sv.fecha) * 100 + DAY(sv.fecha),
+           ISNULL(sv.plazo_mes,0),
+           ISNULL(sv.interes,0),
+           sv.total_venta_final
+    FROM dbo.stg_ventas sv
+    JOIN dbo.tipo_clientes tc    ON tc.nombre_tipo_cliente = sv.tipo_cliente
+    JOIN dbo.clientes c          ON c.nombre_cliente = sv.cliente_nombre
+                                AND c.apellido_cliente = sv.cliente_apellido
+                                AND c.id_tipo_cliente = tc.id_tipo_cliente
+    JOIN dbo.tipo_transacciones tt ON tt.nombre_tipo_transaccion = sv.tipo_transaccion;
+
+    -- 3) Detalle
+    INSERT INTO dbo.detalle_ventas (id_venta, id_producto, cantidad, precio_unitario, costo_unitario_venta)
+    SELECT v.id_venta, p.id_producto, sd.cantidad, sd.precio_unitario, sd.costo_unitario
+    FROM dbo.stg_detalle_ventas sd
+    JOIN dbo.stg_ventas sv       ON sv.id_externo_venta = sd.id_externo_venta
+    JOIN dbo.tipo_clientes tc    ON tc.nombre_tipo_cliente = sv.tipo_cliente
+    JOIN dbo.clientes c          ON c.nombre_cliente = sv.cliente_nombre
+                                AND c.apellido_cliente = sv.cliente_apellido
+                                AND c.id_tipo_cliente = tc.id_tipo_cliente
+    JOIN dbo.tipo_transacciones tt ON tt.nombre_tipo_transaccion = sv.tipo_transaccion
+    JOIN dbo.ventas v            ON v.id_cliente = c.id_cliente
+                                AND v.id_fecha = YEAR(sv.fecha) * 10000 + MONTH(sv.fecha) * 100 + DAY(sv.fecha)
+                                AND v.id_tipo_transaccion = tt.id_tipo_transaccion
+    JOIN dbo.productos p         ON p.nombre_producto = sd.producto;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.sp_etl_cargar_gastos
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO dbo.categoria_gastos (nombre_categoria)
+    SELECT DISTINCT s.categoria_gasto
+    FROM dbo.stg_gastos s
+    LEFT JOIN dbo.categoria_gastos cg ON cg.nombre_categoria = s.categoria_gasto
+    WHERE cg.id_categoria_gastos IS NULL;
+
+    INSERT INTO dbo.gastos (nombre_gasto, monto_gasto, id_fecha, id_categoria_gastos)
+    SELECT s.nombre_gasto,
+           s.monto_gasto,
+           YEAR(s.fecha) * 10000 + MONTH(s.fecha) * 100 + DAY(s.fecha),
+           cg.id_categoria_gastos
+    FROM dbo.stg_gastos s
+    JOIN dbo.categoria_gastos cg  ON cg.nombre_categoria = s.categoria_gasto;
+END;
+GO
+
+SET NOEXEC OFF;
+GO
@@ -0,0 +1,29 @@
+/* ===========================================================
+   MIGRACIÓN: configuración del prorrateo de gastos (core/prorrateo.py)
+   - prorrateo_categoria_gastos: a qué categorías de producto se cargan
+     los gastos de cada categoría de gasto (driver "categoria"); las
+     categorías de gasto sin filas se reparten por ventas entre todos
+   - prorrateo_pesos: peso fijo de cada categoría de producto (driver
+     "pesos"); dentro de la categoría se reparte por ventas
+   Se editan con SQL; /rentabilidad/ los toma al vencer RENTABILIDAD_TTL
+   (o al correr el ETL).
+   Idempotente.
+   =========================================================== */
+IF OBJECT_ID('dbo.prorrateo_categoria_gastos', 'U') IS NULL
+CREATE TABLE dbo.prorrateo_categoria_gastos (
+    id_categoria_gastos   INT NOT NULL,
+    id_categoria_producto INT NOT NULL,
+    CONSTRAINT PK_prorrateo_categoria_gastos PRIMARY KEY (id_categoria_gastos, id_categoria_producto),
+    CONSTRAINT FK_prorrateo_cg_gastos    FOREIGN KEY (id_categoria_gastos)   REFERENCES dbo.categoria_gastos(id_categoria_gastos),
+    CONSTRAINT FK_prorrateo_cg_productos FOREIGN KEY (id_categoria_producto) REFERENCES dbo.categoria_productos(id_categoria)
+);
+GO
+
+IF OBJECT_ID('dbo.prorrateo_pesos', 'U') IS NULL
+CREATE TABLE dbo.prorrateo_pesos (
+    id_categoria_producto INT NOT NULL PRIMARY KEY,
+    peso                  DECIMAL(9,4) NOT NULL,
+    CONSTRAINT FK_prorrateo_pesos_categoria FOREIGN KEY (id_categoria_producto) REFERENCES dbo.categoria_productos(id_categoria),
+    CONSTRAINT CHK_prorrateo_pesos_peso CHECK (peso >= 0)
+);
+GO
@@ -0,0 +1,128 @@
+/* ===========================================================
+   MIGRACIÓN: resumen mensual de ventas (respaldo de /ventas/totales-mes/)
+   - resumen_ventas_mensual: total y cantidad de ventas por
+     (anio, mes, tipo_cliente, tipo_transaccion)
+   - trg_resumen_ventas_mensual (ventas): aplica el delta de cada
+     INSERT/UPDATE/DELETE (app, recálculo de totales y ETL)
+   - trg_resumen_ventas_mensual_clientes (clientes): mueve las ventas del
+     cliente cuando cambia su tipo
+   - carga inicial desde ventas
+   Luego: RESUMEN_VENTAS_MENSUAL=True en backend/.env
+   Verificar/reconstruir: python manage.py ventas_resumen_reconstruir
+   Idempotente.
+   =========================================================== */
+IF OBJECT_ID('dbo.resumen_ventas_mensual', 'U') IS NULL
+CREATE TABLE dbo.resumen_ventas_mensual (
+    anio                INT NOT NULL,
+    mes                 INT NOT NULL,
+    id_tipo_cliente     INT NOT NULL,
+    id_tipo_transaccion INT NOT NULL,
+    total               DECIMAL(18,2) NOT NULL,
+    ventas              INT NOT NULL,
+    fecha_actualizacion DATETIME NOT NULL DEFAULT (GETDATE()),
+    CONSTRAINT PK_resumen_ventas_mensual PRIMARY KEY (anio, mes, id_tipo_cliente, id_tipo_transaccion)
+);
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_resumen_ventas_mensual
+ON dbo.ventas
+AFTER INSERT, UPDATE, DELETE
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- UPDATE que no toca columnas del resumen (p.ej. solo usuario_modificacion)
+    IF EXISTS (SELECT 1 FROM inserted) AND EXISTS (SELECT 1 FROM deleted)
+       AND NOT (UPDATE(total_venta_final) OR UPDATE(id_fecha) OR UPDATE(id_cliente) OR UPDATE(id_tipo_transaccion))
+        RETURN;
+
+    WITH delta AS (
+        SELECT df.anio, df.mes, c.id_tipo_cliente, i.id_tipo_transaccion,
+               i.total_venta_final AS total, 1 AS ventas
+        FROM inserted i
+        JOIN dbo.dim_fecha df ON df.id_fecha = i.id_fecha
+        JOIN dbo.clientes c   ON c.id_cliente = i.id_cliente
+        UNION ALL
+        SELECT df.anio, df.mes, c.id_tipo_cliente, d.id_tipo_transaccion,
+               -d.total_venta_final, -1
+        FROM deleted d
+        JOIN dbo.dim_fecha df ON df.id_fecha = d.id_fecha
+        JOIN dbo.clientes c   ON c.id_cliente = d.id_cliente
+    ),
+    neto AS (
+        SELECT anio, mes, id_tipo_cliente, id_tipo_transaccion, SUM(total) AS total, SUM(ventas) AS ventas
+        FROM delta
+        GROUP BY anio, mes, id_tipo_cliente, id_tipo_transaccion
+        HAVING SUM(total) <> 0 OR SUM(ventas) <> 0
+    )
+    MERGE dbo.resumen_ventas_mensual WITH (HOLDLOCK) AS t
+    USING neto AS s
+    ON  t.anio = s.anio AND t.mes = s.mes
+    AND t.id_tipo_cliente = s.id_tipo_cliente AND t.id_tipo_transaccion = s.id_tipo_transaccion
+    WHEN MATCHED AND t.ventas + s.ventas = 0 THEN
+        DELETE
+    WHEN MATCHED THEN
+        UPDATE SET total = t.total + s.total, ventas = t.ventas + s.ventas, fecha_actualizacion = GETDATE()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (anio, mes, id_tipo_cliente, id_tipo_transaccion, total, ventas)
+        VALUES (s.anio, s.mes, s.id_tipo_cliente, s.id_tipo_transaccion, s.total, s.ventas);
+END;
+GO
+
+CREATE OR ALTER TRIGGER dbo.trg_resumen_ventas_mensual_clientes
+ON dbo.clientes
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT UPDATE(id_tipo_cliente)
+        RETURN;
+
+    WITH cambios AS (
+        SELECT i.id_cliente, d.id_tipo_cliente AS tipo_anterior, i.id_tipo_cliente AS tipo_nuevo
+        FROM inserted i
+        JOIN deleted d ON d.id_cliente = i.id_cliente
+        WHERE d.id_tipo_cliente <> i.id_tipo_cliente
+    ),
+    delta AS (
+        SELECT df.anio, df.mes, x.tipo_nuevo AS id_tipo_cliente, v.id_tipo_transaccion,
+               v.total_venta_final AS total, 1 AS ventas
+        FROM cambios x
+        JOIN dbo.ventas v     ON v.id_cliente = x.id_cliente
+        JOIN dbo.dim_fecha df ON df.id_fecha = v.id_fecha
+        UNION ALL
+        SELECT df.anio, df.mes, x.tipo_anterior, v.id_tipo_transaccion,
+               -v.total_venta_final, -1
+        FROM cambios x
+        JOIN dbo.ventas v     ON v.id_cliente = x.id_cliente
+        JOIN dbo.dim_fecha df ON df.id_fecha = v.id_fecha
+    ),
+    neto AS (
+        SELECT anio, mes, id_tipo_cliente, id_tipo_transaccion, SUM(total) AS total, SUM(ventas) AS ventas
+        FROM delta
+        GROUP BY anio, mes, id_tipo_cliente, id_tipo_transaccion
+        HAVING SUM(total) <> 0 OR SUM(ventas) <> 0
+    )
+    MERGE dbo.resumen_ventas_mensual WITH (HOLDLOCK) AS t
+    USING neto AS s
+    ON  t.anio = s.anio AND t.mes = s.mes
+    AND t.id_tipo_cliente = s.id_tipo_cliente AND t.id_tipo_transaccion = s.id_tipo_transaccion
+    WHEN MATCHED AND t.ventas + s.ventas = 0 THEN
+        DELETE
+    WHEN MATCHED THEN
+        UPDATE SET total = t.total + s.total, ventas = t.ventas + s.ventas, fecha_actualizacion = GETDATE()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (anio, mes, id_tipo_cliente, id_tipo_transaccion, total, ventas)
+        VALUES (s.anio, s.mes, s.id_tipo_cliente, s.id_tipo_transaccion, s.total, s.ventas);
+END;
+GO
+
+/* carga inicial (solo si está vacío) */
+IF NOT EXISTS (SELECT 1 FROM dbo.resumen_ventas_mensual)
+INSERT INTO dbo.resumen_ventas_mensual (anio, mes, id_tipo_cliente, id_tipo_transaccion, total, ventas)
+SELECT df.anio, df.mes, c.id_tipo_cliente, v.id_tipo_transaccion, SUM(v.total_venta_final), COUNT(*)
+FROM dbo.ventas v
+JOIN dbo.dim_fecha df ON df.id_fecha = v.id_fecha
+JOIN dbo.clientes c   ON c.id_cliente = v.id_cliente
+GROUP BY df.anio, df.mes, c.id_tipo_cliente, v.id_tipo_transaccion;
+GO
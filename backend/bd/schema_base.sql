@@ -70,6 +70,7 @@ GO
 /* ==========================================
    2) DIMENSIÓN FECHA (con unicidad en fecha)
    ========================================== */
+-- Para claves YYYYMMDD (sin IDENTITY) ver bd/migracion_dim_fecha_smart_key.sql
 CREATE TABLE dbo.dim_fecha (
     id_fecha      INT IDENTITY(1,1) NOT NULL PRIMARY KEY,
     fecha         DATE NOT NULL,
@@ -81,6 +82,8 @@ CREATE TABLE dbo.dim_fecha (
     nombre_mes    VARCHAR(20) NOT NULL DEFAULT ('SinNombreMes'),
     nombre_dia    VARCHAR(20) NOT NULL DEFAULT ('SinNombreDia'),
     es_fin_de_mes BIT NOT NULL DEFAULT (0),
+    es_fin_de_semana BIT NOT NULL DEFAULT (0),
+    es_dia_habil  BIT NOT NULL DEFAULT (1),   -- lunes a viernes y no feriado
     CONSTRAINT UQ_dim_fecha_fecha UNIQUE (fecha)
 );
 GO
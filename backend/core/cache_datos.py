@@ -0,0 +1,149 @@
+# core/cache_datos.py
+"""
+Caché de resultados derivados de las tablas (conteos de listados, reportes).
+
+Cada tabla tiene una versión guardada en la caché de Django y la clave de
+cada resultado incluye las versiones de las tablas de las que depende:
+cuando una tabla cambia, su versión cambia y los resultados viejos
+simplemente dejan de encontrarse (no hay que buscarlos para borrarlos).
+
+Quién cambia las versiones:
+  - post_save / post_delete de los modelos de core (models.py)
+  - los caminos que escriben sin señales (SQL crudo, bulk_*): invalidar(tabla)
+  - el ETL al terminar un proceso: invalidar_todo()
+El TTL de cada resultado es solo una red de seguridad para escrituras que
+no pasan por la aplicación (SQL manual).
+Las versiones solo se ven entre procesos si la caché es compartida
+(CACHES en settings: base de datos, Redis o Memcached).
+
+Dentro de una transacción la versión cambia recién al confirmarla (no se
+toma ningún lock de la caché en la transacción del que escribe) y nada se
+memoriza: lo calculado ahí puede incluir datos sin confirmar. Si la caché
+falla (p. ej. falta la tabla de createcachetable) todo se calcula sin
+memorizar y se registra el error; ninguna lectura ni escritura falla por eso.
+
+    n = cacheado("conteo", ["ventas", "pagos"], clave, lambda: qs.count(), ttl=30)
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_PREFIJO = "datos"
+_TODO = "*"
+
+# tablas que cambian junto con otra (triggers de la base de datos)
+DERIVADAS = {
+    "ventas": ("bitacora_ventas",),
+}
+
+
+def _clave_version(tabla: str) -> str:
+    return f"{_PREFIJO}:ver:{tabla}"
+
+
+def versiones(tablas) -> list:
+    """
+    Versión actual de cada tabla (más la global); las que no existen se crean.
+    Sin caché, versiones nuevas: no coinciden con nada guardado.
+    """
+    claves = [_clave_version(t) for t in (_TODO, *tablas)]
+    try:
+        actuales = cache.get_many(claves)
+        faltan = {k: time.time_ns() for k in claves if k not in actuales}
+        if faltan:
+            cache.set_many(faltan, None)
+            actuales.update(faltan)
+    except Exception:
+        logger.exception("Caché no disponible: se calcula sin memorizar")
+        return [time.time_ns() for _ in claves]
+    return [actuales[k] for k in claves]
+
+
+def _nueva_version(tablas):
+    try:
+        cache.set_many({_clave_version(t): time.time_ns() for t in tablas}, None)
+    except Exception:
+        # la escritura ya está hecha; lo memorizado vence por TTL
+        logger.exception("No se pudo invalidar la caché de %s", sorted(tablas))
+
+
+def invalidar(*tablas):
+    """Cambia la versión de `tablas` (y de sus derivadas); dentro de una transacción, al confirmarla."""
+    todas = set(tablas)
+    for t in tablas:
+        todas.update(DERIVADAS.get(t, ()))
+    if connection.in_atomic_block:
+        # hasta el commit los demás leen los datos viejos: la versión vieja sigue valiendo
+        transaction.on_commit(lambda: _nueva_version(todas))
+    else:
+        _nueva_version(todas)
+
+
+def invalidar_todo():
+    invalidar(_TODO)
+
+
+def _leer(claves) -> dict:
+    try:
+        return cache.get_many(list(claves))
+    except Exception:
+        logger.exception("Caché no disponible: se calcula sin memorizar")
+        return {}
+
+
+def _guardar(valores: dict, ttl: int):
+    try:
+        cache.set_many(valores, ttl)
+    except Exception:
+        logger.exception("No se pudo guardar en la caché")
+
+
+def cacheado(nombre: str, tablas, clave, calcular, ttl: int):
+    """
+    Resultado de `calcular()` memorizado por (nombre, clave, versiones de
+    `tablas`) durante `ttl` segundos. `clave` debe ser serializable a JSON.
+    None no se memoriza.
+    """
+    if connection.in_atomic_block:
+        return calcular()
+    firma = json.dumps([clave, versiones(tablas)], default=str, sort_keys=True)
+    k = f"{_PREFIJO}:{nombre}:{hashlib.sha1(firma.encode()).hexdigest()}"
+    valor = _leer({k}).get(k)
+    if valor is None:
+        valor = calcular()
+        if valor is not None:
+            _guardar({k: valor}, ttl)
+    return valor
+
+
+def cacheados(nombre: str, tablas, claves: list, calcular, ttl: int, tablas_de=None) -> dict:
+    """
+    Como cacheado() para varias claves a la vez: {clave: valor}. Las que no
+    están se piden juntas a `calcular(faltantes) -> {clave: valor}`, así un
+    reporte de N periodos cuesta una consulta y no N.
+    `tablas_de(clave)` agrega las tablas propias de cada clave (p. ej. la
+    versión de su mes): cambiar una invalida solo esa clave.
+    """
+    if connection.in_atomic_block:
+        return {c: v for c, v in calcular(list(claves)).items() if v is not None}
+    propias = {c: list(tablas_de(c)) if tablas_de else [] for c in claves}
+    todas = list(dict.fromkeys([*tablas, *(t for ts in propias.values() for t in ts)]))
+    vers = dict(zip([_TODO, *todas], versiones(todas)))
+    internas = {}
+    for c in claves:
+        firma = json.dumps([c, [vers[t] for t in (_TODO, *tablas, *propias[c])]], default=str, sort_keys=True)
+        internas[c] = f"{_PREFIJO}:{nombre}:{hashlib.sha1(firma.encode()).hexdigest()}"
+    guardados = _leer(internas.values())
+    valores = {c: guardados[k] for c, k in internas.items() if guardados.get(k) is not None}
+    faltan = [c for c in claves if c not in valores]
+    if faltan:
+        nuevos = {c: v for c, v in calcular(faltan).items() if v is not None}
+        _guardar({internas[c]: v for c, v in nuevos.items()}, ttl)
+        valores.update(nuevos)
+    return valores
@@ -0,0 +1,116 @@
+# core/cargadores.py
+"""
+Carga por lotes de entidades relacionadas (estilo DataLoader).
+
+Al armar una página, la vista registra los ids que va a necesitar y luego
+los lee: cada tipo de entidad se resuelve con UNA consulta IN (...) por
+lote de ids pendientes y el resultado queda memorizado en el request, así
+cualquier serializador puede agregar campos relacionados sin N+1.
+
+    cg = cargadores_de(request)
+    cg["venta"].registrar(r[1] for r in rows)
+    cg["cliente"].registrar(v["id_cliente_id"] for v in cg["venta"].valores())
+    nombre = cg["cliente"].get(id_cliente, {}).get("nombre_cliente")
+"""
+from .fechas import MAX_IN, dim_fecha_cache
+from .models import CategoriaGasto, CategoriaProducto, Cliente, Producto, TipoCliente, TipoTransaccion, Venta
+
+# tipo -> (modelo, campos traídos además de la pk)
+ENTIDADES = {
+    "cliente": (Cliente, ("nombre_cliente", "apellido_cliente", "id_tipo_cliente_id")),
+    "tipo_cliente": (TipoCliente, ("nombre_tipo_cliente", "tasa_interes_default")),
+    "producto": (Producto, ("nombre_producto", "id_categoria_id", "precio_unitario", "costo_unitario")),
+    "categoria_productos": (CategoriaProducto, ("nombre_categoria",)),
+    "categoria_gastos": (CategoriaGasto, ("nombre_categoria",)),
+    "tipo_transaccion": (TipoTransaccion, ("nombre_tipo_transaccion",)),
+    "venta": (Venta, ("id_cliente_id", "id_tipo_transaccion_id", "id_fecha_id", "total_venta_final")),
+}
+
+
+class Cargador:
+    """Memo id -> valor de un tipo de entidad; `buscar(ids)` devuelve {id: valor} de los que existen."""
+
+    def __init__(self, buscar):
+        self._buscar = buscar
+        self._memo = {}
+        self._pendientes = set()
+        self.consultas = 0
+
+    def registrar(self, ids):
+        for i in ids:
+            if i is not None and i not in self._memo:
+                self._pendientes.add(i)
+        return self
+
+    def resolver(self):
+        if not self._pendientes:
+            return
+        ids, self._pendientes = list(self._pendientes), set()
+        encontrados = self._buscar(ids)
+        self.consultas += 1
+        for i in ids:
+            self._memo[i] = encontrados.get(i)
+
+    def get(self, id_, default=None):
+        if id_ is None:
+            return default
+        if id_ not in self._memo:
+            self._pendientes.add(id_)
+        self.resolver()
+        valor = self._memo.get(id_)
+        return default if valor is None else valor
+
+    def valores(self):
+        self.resolver()
+        return [v for v in self._memo.values() if v is not None]
+
+
+def _buscar_modelo(modelo, campos):
+    pk = modelo._meta.pk.attname
+
+    def buscar(ids):
+        res = {}
+        ids = list(ids)
+        for k in range(0, len(ids), MAX_IN):
+            for fila in modelo.objects.filter(pk__in=ids[k:k + MAX_IN]).values(pk, *campos):
+                res[fila[pk]] = fila
+        return res
+    return buscar
+
+
+class Cargadores:
+    """Un Cargador por tipo de entidad ("fecha" usa la caché de dim_fecha)."""
+
+    def __init__(self):
+        self._cargadores = {}
+
+    def __getitem__(self, tipo: str) -> Cargador:
+        if tipo not in self._cargadores:
+            if tipo == "fecha":
+                self._cargadores[tipo] = Cargador(dim_fecha_cache.fechas_de)
+            elif tipo in ENTIDADES:
+                self._cargadores[tipo] = Cargador(_buscar_modelo(*ENTIDADES[tipo]))
+            else:
+                raise KeyError(f"tipo de entidad desconocido: {tipo}")
+        return self._cargadores[tipo]
+
+
+def cargadores_de(request) -> Cargadores:
+    """Cargadores memorizados en el request (nuevos si no hay request)."""
+    if request is None:
+        return Cargadores()
+    cg = getattr(request, "_cargadores", None)
+    if cg is None:
+        cg = request._cargadores = Cargadores()
+    return cg
+
+
+def nombre_cliente(cg: Cargadores, id_cliente) -> str | None:
+    c = cg["cliente"].get(id_cliente)
+    return f"{c['nombre_cliente']} {c['apellido_cliente']}" if c else None
+
+
+def registrar_clientes_de_ventas(cg: Cargadores, ids_venta):
+    """venta -> cliente en dos consultas para toda la página."""
+    cg["venta"].registrar(ids_venta).resolver()
+    cg["cliente"].registrar(v["id_cliente_id"] for v in cg["venta"].valores())
@@ -0,0 +1,40 @@
+# core/checks.py
+"""
+Chequeos de arranque (manage.py check, runserver, migrate).
+
+cache_datos guarda las versiones de las tablas en la caché `default`. Con
+la caché en base de datos (el valor por defecto en settings) la tabla la
+crea `manage.py createcachetable`; si falta, todo funciona pero nada se
+memoriza, así que se avisa al arrancar en vez de descubrirlo en los logs.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError
+
+_POR_PROCESO = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def revisar_cache_datos(app_configs=None, **kwargs):
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in _POR_PROCESO:
+        return [Warning(
+            f"La caché default ({backend}) no es compartida entre procesos.",
+            hint="Con más de un proceso las invalidaciones de core/cache_datos.py no se ven en los demás; "
+                 "usar DatabaseCache, Redis o Memcached (CACHE_BACKEND).",
+            id="core.W001",
+        )]
+    if backend.endswith("DatabaseCache"):
+        try:
+            cache.get("datos:ver:*")
+        except DatabaseError as e:
+            return [Warning(
+                f"La caché en base de datos no está disponible: {e}",
+                hint="Ejecutar `python manage.py createcachetable`; mientras tanto nada se memoriza.",
+                id="core.W002",
+            )]
+    return []
@@ -0,0 +1,60 @@
+# core/cobranza.py
+"""
+Tiempos de cobro por venta (bd/migracion_cobranza_ventas.sql).
+
+cobranza_ventas tiene una fila por venta con pagos: primer y último pago,
+cantidad y suma de días venta->pago, días ponderados por monto y fecha en
+que quedó saldada. La mantienen los triggers de pagos, pago_cuota,
+cuota_creditos y ventas (sp_cobranza_ventas_recalcular sobre las ventas
+tocadas), así que el DSO de un segmento es SUM(dias_suma) / SUM(pagos) sobre
+sus ventas en vez de un renglón por pago. fn_resumen_mensual y
+vw_resumen_rentabilidades ya la leen después de la migración; con
+COBRANZA_VENTAS=True también el agregado de rentabilidad.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+_COLUMNAS = ("id_venta, primer_pago, ultimo_pago, pagos, monto_pagado, dias_suma, "
+             "dias_ponderados, fecha_saldada, dias_saldada")
+
+# recalcula todas las ventas y cuenta las filas que cambiaron
+_SQL_RECALCULAR_TODO = f"""
+    SET NOCOUNT ON;
+    SELECT {_COLUMNAS} INTO #cobranza_antes FROM cobranza_ventas;
+
+    DECLARE @ids dbo.tipo_ids_venta;
+    INSERT INTO @ids (id_venta)
+    SELECT id_venta FROM pagos
+    UNION
+    SELECT id_venta FROM cobranza_ventas;
+    EXEC dbo.sp_cobranza_ventas_recalcular @ids;
+
+    SELECT COUNT(DISTINCT id_venta)
+    FROM (
+        (SELECT {_COLUMNAS} FROM #cobranza_antes EXCEPT SELECT {_COLUMNAS} FROM cobranza_ventas)
+        UNION ALL
+        (SELECT {_COLUMNAS} FROM cobranza_ventas EXCEPT SELECT {_COLUMNAS} FROM #cobranza_antes)
+    ) d;
+    DROP TABLE #cobranza_antes;
+"""
+
+
+def usa_cobranza() -> bool:
+    return bool(getattr(settings, "COBRANZA_VENTAS", False))
+
+
+def reconstruir_cobranza(reparar: bool = False) -> dict:
+    """
+    Recalcula cobranza_ventas desde pagos y cuenta las ventas que no
+    coincidían; sin `reparar` se deshace el recálculo.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(_SQL_RECALCULAR_TODO)
+            diferencias = int(cur.fetchone()[0])
+        if not (reparar and diferencias):
+            transaction.set_rollback(True)
+    if reparar and diferencias:
+        from .cache_datos import invalidar
+        invalidar("pagos")
+    return {"diferencias": diferencias, "reconstruido": bool(reparar and diferencias)}
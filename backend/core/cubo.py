@@ -0,0 +1,367 @@
+# core/cubo.py
+"""
+Cubo de rentabilidad en memoria (opcional: requiere numpy y CUBO_RENTABILIDAD=True).
+
+Los hechos a nivel de detalle_ventas se cargan una vez en arreglos
+columnares de numpy:
+  - dimensiones (anio, mes, tipo_cliente, tipo_transaccion, categoria,
+    producto, cliente) como códigos enteros chicos; los ids de catálogo se
+    codifican 0..n-1 con un diccionario por dimensión
+  - montos (venta, costo, cantidad) como int64 escalados (ESCALAS: venta y
+    costo con 4 decimales, exactos como cantidad * precio en SQL; cantidad
+    con 2), sin errores de redondeo al sumar: los totales son los mismos
+    que SUM(dv.cantidad * dv.precio_unitario) y SUM(dv.cantidad *
+    dv.costo_unitario_venta) del reporte
+Agrupar, filtrar y top-k se resuelven con operaciones vectorizadas
+(máscara booleana, clave compuesta, argsort + add.reduceat) sin ir a SQL Server.
+
+Refresco incremental: antes de cada consulta, si cambió la versión de las
+tablas (cache_datos) o pasaron CUBO_TTL segundos, se buscan las ventas
+tocadas desde la última carga (bitácora, detalle nuevo/modificado, clientes
+y productos modificados), se quitan sus filas y se vuelven a leer solo esas.
+Las marcas de id se releen con MARGEN_IDS de holgura (un id se asigna al
+insertar pero la fila se ve al confirmar).
+"""
+import json
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .cache_datos import versiones
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional
+    np = None
+
+LOTE_LECTURA = 50000
+# holgura para cambios confirmados mientras corría el refresco anterior
+MARGEN_MODIFICACION = timedelta(minutes=5)
+# ids anteriores a la marca que se vuelven a revisar; menor que en
+# core/rentabilidad.py porque aquí cada venta tocada se vuelve a leer
+MARGEN_IDS = 1000
+# más ventas tocadas que esto (fracción de las cargadas): recarga completa
+FRACCION_RECARGA = 0.25
+
+TABLAS_CUBO = ["ventas", "detalle_ventas", "clientes", "productos", "dim_fecha"]
+
+# columna -> dtype; las de dimensión con diccionario se guardan como código
+DIMENSIONES = {
+    "anio": "int16",
+    "mes": "int8",
+    "tipo_cliente": "int16",
+    "tipo_transaccion": "int16",
+    "categoria": "int16",
+    "producto": "int32",
+    "cliente": "int32",
+}
+CODIFICADAS = ("tipo_cliente", "tipo_transaccion", "categoria", "producto", "cliente")
+MONTOS = ("venta", "costo", "cantidad")          # int64 escalados
+# decimales de cada medida entera que devuelve consultar() (valor * 10**escala)
+ESCALAS = {"venta": 4, "costo": 4, "margen": 4, "cantidad": 2}
+MEDIDAS = ("venta", "costo", "margen", "cantidad", "lineas", "ventas")
+
+_COLUMNAS_SQL = """
+    SELECT d.id_detalle_venta, d.id_venta, df.anio, df.mes,
+           c.id_tipo_cliente, v.id_tipo_transaccion, p.id_categoria, d.id_producto, v.id_cliente,
+           CAST(d.cantidad * d.precio_unitario * 10000 AS BIGINT),
+           CAST(d.cantidad * d.costo_unitario_venta * 10000 AS BIGINT),
+           CAST(d.cantidad * 100 AS BIGINT)
+    FROM detalle_ventas d
+    JOIN ventas v     ON v.id_venta = d.id_venta
+    JOIN dim_fecha df ON df.id_fecha = v.id_fecha
+    JOIN clientes c   ON c.id_cliente = v.id_cliente
+    JOIN productos p  ON p.id_producto = d.id_producto
+"""
+
+_SQL_CARGA_COMPLETA = _COLUMNAS_SQL
+
+_SQL_CARGA_VENTAS = _COLUMNAS_SQL + """
+    JOIN OPENJSON(%s) WITH (id_venta INT '$') j ON j.id_venta = d.id_venta
+"""
+
+_SQL_MARCAS = """
+    SELECT
+        (SELECT ISNULL(MAX(id_bitacora), 0) FROM bitacora_ventas),
+        (SELECT ISNULL(MAX(id_detalle_venta), 0) FROM detalle_ventas)
+"""
+
+_SQL_VENTAS_TOCADAS = """
+    SELECT id_venta FROM bitacora_ventas WHERE id_bitacora > %s AND id_bitacora <= %s
+    UNION
+    SELECT id_venta FROM detalle_ventas
+    WHERE (id_detalle_venta > %s AND id_detalle_venta <= %s) OR fecha_modificacion >= %s
+    UNION
+    SELECT v.id_venta FROM clientes c JOIN ventas v ON v.id_cliente = c.id_cliente
+    WHERE c.fecha_modificacion >= %s
+    UNION
+    SELECT d.id_venta FROM productos p JOIN detalle_ventas d ON d.id_producto = p.id_producto
+    WHERE p.fecha_modificacion >= %s
+"""
+
+
+class CuboNoDisponible(Exception):
+    pass
+
+
+def disponible() -> bool:
+    return np is not None and bool(getattr(settings, "CUBO_RENTABILIDAD", False))
+
+
+class _Diccionario:
+    """id de catálogo <-> código 0..n-1 (los códigos no cambian al agregar ids)."""
+
+    def __init__(self):
+        self.ids = []
+        self.codigo = {}
+
+    def codificar(self, ids) -> list[int]:
+        res = []
+        for i in ids:
+            c = self.codigo.get(i)
+            if c is None:
+                c = self.codigo[i] = len(self.ids)
+                self.ids.append(i)
+            res.append(c)
+        return res
+
+    def bytes(self) -> int:
+        return sys.getsizeof(self.ids) + sys.getsizeof(self.codigo)
+
+
+class CuboRentabilidad:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_refresco = threading.RLock()  # una carga/refresco a la vez
+        self._col = None                      # nombre -> np.ndarray
+        self._dic = {d: _Diccionario() for d in CODIFICADAS}
+        self._marcas = None                   # (id_bitacora, id_detalle, fecha)
+        self._versiones = None
+        self._refrescado = 0.0
+        self.cargas = 0
+        self.refrescos = 0
+        self.segundos_carga = None
+
+    # ---------- carga ----------
+    def _leer(self, sql, params=None) -> dict:
+        """Lee filas del SQL a columnas numpy (por bloques)."""
+        partes = []
+        with connection.cursor() as cur:
+            cur.execute(sql, params or [])
+            while True:
+                rows = cur.fetchmany(LOTE_LECTURA)
+                if not rows:
+                    break
+                partes.append(self._a_columnas(rows))
+        if not partes:
+            return self._a_columnas([])
+        return {k: np.concatenate([p[k] for p in partes]) for k in partes[0]}
+
+    def _a_columnas(self, rows) -> dict:
+        t = list(zip(*rows)) if rows else [()] * 12
+        col = {
+            "id_detalle": np.array(t[0], dtype="int32"),
+            "id_venta": np.array(t[1], dtype="int32"),
+            "anio": np.array(t[2], dtype=DIMENSIONES["anio"]),
+            "mes": np.array(t[3], dtype=DIMENSIONES["mes"]),
+        }
+        for k, d in zip(CODIFICADAS, t[4:9]):
+            col[k] = np.array(self._dic[k].codificar(d), dtype=DIMENSIONES[k])
+        for k, m in zip(MONTOS, t[9:12]):
+            col[k] = np.array(m, dtype="int64")
+        return col
+
+    def _marcas_actuales(self):
+        with connection.cursor() as cur:
+            cur.execute(_SQL_MARCAS)
+            id_bit, id_det = cur.fetchone()
+        return int(id_bit), int(id_det), timezone.now().replace(tzinfo=None)
+
+    def cargar(self):
+        """Carga completa de los hechos."""
+        if np is None:
+            raise CuboNoDisponible("numpy no está instalado")
+        with self._lock_refresco:
+            t0 = time.monotonic()
+            vers = versiones(TABLAS_CUBO)
+            marcas = self._marcas_actuales()
+            col = self._leer(_SQL_CARGA_COMPLETA)
+            with self._lock:
+                self._col, self._marcas, self._versiones = col, marcas, vers
+                self._refrescado = time.monotonic()
+                self.cargas += 1
+                self.segundos_carga = round(time.monotonic() - t0, 3)
+
+    @property
+    def cargado(self) -> bool:
+        return self._col is not None
+
+    def invalidar(self):
+        with self._lock:
+            self._col = None
+            self._marcas = None
+
+    def refrescar(self) -> int:
+        """Vuelve a leer solo las ventas tocadas desde la última carga. Devuelve cuántas."""
+        with self._lock_refresco:
+            return self._refrescar()
+
+    def _refrescar(self) -> int:
+        if self._col is None:
+            self.cargar()
+            return 0
+        vers = versiones(TABLAS_CUBO)
+        id_bit, id_det, ultima = self._marcas
+        marcas = self._marcas_actuales()
+        desde_mod = ultima - MARGEN_MODIFICACION
+        desde_bit, desde_det = max(id_bit - MARGEN_IDS, 0), max(id_det - MARGEN_IDS, 0)
+        with connection.cursor() as cur:
+            cur.execute(_SQL_VENTAS_TOCADAS, [desde_bit, marcas[0], desde_det, marcas[1], desde_mod, desde_mod, desde_mod])
+            tocadas = sorted({int(r[0]) for r in cur.fetchall()})
+        if tocadas:
+            n_ventas = len(np.unique(self._col["id_venta"])) or 1
+            if len(tocadas) > FRACCION_RECARGA * n_ventas:
+                self.cargar()
+                return len(tocadas)
+            nuevas = self._leer(_SQL_CARGA_VENTAS, [json.dumps(tocadas)])
+            quedan = ~np.isin(self._col["id_venta"], np.array(tocadas, dtype="int32"))
+            col = {k: np.concatenate([v[quedan], nuevas[k]]) for k, v in self._col.items()}
+        else:
+            col = self._col
+        with self._lock:
+            self._col, self._marcas, self._versiones = col, marcas, vers
+            self._refrescado = time.monotonic()
+            self.refrescos += 1
+        return len(tocadas)
+
+    def _asegurar_fresco(self):
+        if not disponible():
+            raise CuboNoDisponible("cubo deshabilitado (requiere numpy y CUBO_RENTABILIDAD=True)")
+        ttl = getattr(settings, "CUBO_TTL", 300)
+        with self._lock_refresco:
+            if self._col is None:
+                self.cargar()
+            elif versiones(TABLAS_CUBO) != self._versiones or time.monotonic() - self._refrescado > ttl:
+                self.refrescar()
+
+    # ---------- consultas ----------
+    def _mascara(self, col, filtros: dict):
+        n = len(col["id_venta"])
+        m = np.ones(n, dtype=bool)
+        desde, hasta = filtros.get("desde"), filtros.get("hasta")
+        if desde or hasta:
+            periodo = col["anio"].astype("int32") * 100 + col["mes"]
+            if desde:
+                m &= periodo >= desde[0] * 100 + desde[1]
+            if hasta:
+                m &= periodo <= hasta[0] * 100 + hasta[1]
+        for dim in CODIFICADAS:
+            ids = filtros.get(dim)
+            if ids:
+                codigos = [self._dic[dim].codigo[i] for i in ids if i in self._dic[dim].codigo]
+                m &= np.isin(col[dim], np.array(codigos, dtype=col[dim].dtype))
+        return m
+
+    def consultar(self, agrupar: list[str], filtros: dict | None = None, medidas=MEDIDAS,
+                  ordenar: str | None = None, top: int | None = None) -> list[dict]:
+        """
+        agrupar: dimensiones de DIMENSIONES; filtros: desde/hasta (anio, mes)
+        y listas de ids por dimensión codificada. Devuelve una fila por grupo
+        con los ids originales y las medidas (enteros; montos y cantidad
+        multiplicados por 10**ESCALAS[medida]).
+        """
+        if ordenar and ordenar.lstrip("-") not in (*MEDIDAS, *agrupar):
+            raise ValueError(f"ordenar: una medida {list(MEDIDAS)} o una dimensión agrupada")
+        self._asegurar_fresco()
+        col = self._col
+        m = self._mascara(col, filtros or {})
+        idx = np.nonzero(m)[0]
+
+        # clave compuesta (radix mixto) sobre los códigos de cada dimensión
+        clave = np.zeros(len(idx), dtype="int64")
+        bases, combinaciones = [], 1
+        for dim in agrupar:
+            v = col[dim][idx].astype("int64")
+            minimo = int(v.min()) if len(v) else 0
+            base = (int(v.max()) - minimo + 1) if len(v) else 1
+            combinaciones *= base
+            if combinaciones >= 2 ** 62:
+                raise ValueError("demasiadas combinaciones de dimensiones para agrupar")
+            clave = clave * base + (v - minimo)
+            bases.append((dim, minimo, base))
+
+        orden = np.argsort(clave, kind="stable")
+        clave_ord = clave[orden]
+        inicios = np.flatnonzero(np.r_[True, clave_ord[1:] != clave_ord[:-1]]) if len(idx) else np.array([], dtype="int64")
+        filas_ord = idx[orden]
+
+        res = {}
+        for k in MONTOS:
+            res[k] = np.add.reduceat(col[k][filas_ord], inicios) if len(inicios) else np.array([], dtype="int64")
+        res["margen"] = res["venta"] - res["costo"]
+        res["lineas"] = np.diff(np.r_[inicios, len(filas_ord)]) if len(inicios) else np.array([], dtype="int64")
+        if "ventas" in medidas or (ordenar or "").lstrip("-") == "ventas":
+            # ventas distintas por grupo: pares (grupo, id_venta) únicos
+            grupo = np.repeat(np.arange(len(inicios)), res["lineas"])
+            pares = np.unique(grupo.astype("int64") * (1 << 32) + col["id_venta"][filas_ord].astype("int64"))
+            res["ventas"] = np.bincount(pares >> 32, minlength=len(inicios))
+
+        # valores de cada dimensión del grupo a partir de la clave
+        claves_grupo = clave_ord[inicios] if len(inicios) else clave_ord[:0]
+        dims = {}
+        resto = claves_grupo.copy()
+        for dim, minimo, base in reversed(bases):
+            dims[dim] = resto % base + minimo
+            resto //= base
+
+        n = len(inicios)
+        sel = np.arange(n)
+        if ordenar:
+            campo, desc = ordenar.lstrip("-"), ordenar.startswith("-")
+            valores = res[campo] if campo in res else dims[campo]
+            if top and top < n:
+                # top-k sin ordenar todo: argpartition y luego solo esos k
+                k = top
+                sel = np.argpartition(-valores if desc else valores, k - 1)[:k]
+            sel = sel[np.argsort(-valores[sel] if desc else valores[sel], kind="stable")]
+        elif top:
+            sel = sel[:top]
+
+        filas = []
+        for g in sel:
+            fila = {}
+            for dim in agrupar:
+                codigo = int(dims[dim][g])
+                fila[dim] = self._dic[dim].ids[codigo] if dim in self._dic else codigo
+            for k in medidas:
+                fila[k] = int(res[k][g])
+            filas.append(fila)
+        return filas
+
+    # ---------- métricas ----------
+    def stats(self) -> dict:
+        col = self._col
+        columnas = {k: int(v.nbytes) for k, v in col.items()} if col is not None else {}
+        diccionarios = sum(d.bytes() for d in self._dic.values())
+        return {
+            "disponible": disponible(),
+            "numpy": np is not None,
+            "cargado": col is not None,
+            "filas": int(len(col["id_venta"])) if col is not None else 0,
+            "bytes_columnas": columnas,
+            "bytes_diccionarios": diccionarios,
+            "bytes_total": sum(columnas.values()) + diccionarios,
+            "cargas": self.cargas,
+            "refrescos": self.refrescos,
+            "segundos_ultima_carga": self.segundos_carga,
+            "marcas": {"id_bitacora": self._marcas[0], "id_detalle": self._marcas[1]} if self._marcas else None,
+        }
+
+
+# instancia única del proceso
+cubo_rentabilidad = CuboRentabilidad()
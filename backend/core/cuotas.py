@@ -0,0 +1,355 @@
+# core/cuotas.py
+"""
+Plan de cuotas de ventas a crédito y su inserción en cuota_creditos.
+
+El plan se calcula en memoria (_add_months_keep_day) y se inserta con un
+solo INSERT ... SELECT FROM OPENJSON, así el número de consultas no
+depende del plazo.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache_datos import invalidar
+from .fechas import dim_fecha_cache
+from .models import _add_months_keep_day
+
+TIPO_CREDITO = 2
+PLAZOS_VALIDOS = [3, 6, 9, 12, 24, 36, 48]
+CENT = Decimal('0.01')
+# subtotal / total_venta_final / monto_programado son DECIMAL(12,2)
+MONTO_MAXIMO = Decimal('9999999999.99')
+
+_estado = threading.local()
+
+
+@contextmanager
+def suspender_generacion():
+    """Desactiva el post_save de Venta (operaciones masivas que generan sus propias cuotas)."""
+    previo = getattr(_estado, "suspendida", False)
+    _estado.suspendida = True
+    try:
+        yield
+    finally:
+        _estado.suspendida = previo
+
+
+def generacion_suspendida() -> bool:
+    return getattr(_estado, "suspendida", False)
+
+
+def interes_porcentaje(tasa) -> Decimal:
+    """tasa_interes_default puede venir como fracción (0.15) o porcentaje (15)."""
+    tasa = Decimal(tasa or 0)
+    return (tasa * 100) if tasa <= 1 else tasa
+
+
+def total_con_interes(subtotal: Decimal, interes: Decimal) -> Decimal:
+    """total_venta_final = subtotal * (1 + interes/100), redondeo igual que SQL Server (ROUND)."""
+    return (Decimal(subtotal) * (Decimal('1') + Decimal(interes) / Decimal('100'))).quantize(CENT, ROUND_HALF_UP)
+
+
+def montos_cuotas(total: Decimal, plazo: int) -> list[Decimal]:
+    """
+    Reparte `total` en `plazo` montos en centavos enteros; los centavos que
+    sobran de la división se suman a las primeras cuotas, así la suma de
+    las cuotas es exactamente el total.
+    """
+    if plazo <= 0 or total <= 0:
+        return []
+    base, resto = divmod(int(Decimal(total).quantize(CENT) * 100), plazo)
+    return [Decimal(base + (1 if n < resto else 0)) * CENT for n in range(plazo)]
+
+
+def montos_cuotas_legado(total: Decimal, plazo: int) -> list[Decimal]:
+    """Montos de los planes generados antes de montos_cuotas(): total/plazo redondeado, igual en todas."""
+    if plazo <= 0 or total <= 0:
+        return []
+    return [(Decimal(total) / Decimal(plazo)).quantize(CENT)] * plazo
+
+
+def plan_cuotas(total: Decimal, plazo: int, fecha_base: date) -> list[tuple[int, date, Decimal]]:
+    """[(numero_cuota, fecha_venc, monto), ...] ver montos_cuotas()."""
+    return [(n, _add_months_keep_day(fecha_base, n), m)
+            for n, m in enumerate(montos_cuotas(total, plazo), start=1)]
+
+
+@lru_cache(maxsize=2048)
+def _cotizar(interes: Decimal, subtotal: Decimal, fecha_base: date, plazos: tuple) -> dict:
+    # los vencimientos se calculan una vez para el plazo mayor; cada plazo usa un prefijo
+    total = total_con_interes(subtotal, interes)
+    vencimientos = [_add_months_keep_day(fecha_base, n).isoformat() for n in range(1, max(plazos) + 1)]
+    centavos = int(total * 100)
+    opciones = []
+    for plazo in plazos:
+        base, resto = divmod(centavos, plazo)
+        alto, bajo = str(Decimal(base + 1) * CENT), str(Decimal(base) * CENT)
+        opciones.append({
+            "plazo_mes": plazo,
+            "cuota": bajo,
+            "cuotas": [
+                {"numero_cuota": n + 1, "fecha_venc": vencimientos[n], "monto": alto if n < resto else bajo}
+                for n in range(plazo)
+            ],
+        })
+    return {
+        "subtotal": str(subtotal),
+        "interes": str(interes),
+        "total_venta_final": str(total),
+        "fecha_base": fecha_base.isoformat(),
+        "opciones": opciones,
+    }
+
+
+def cotizar_plazos(interes, subtotal, fecha_base: date, plazos=PLAZOS_VALIDOS) -> dict:
+    """
+    Plan de cuotas de todos los `plazos` para un subtotal, sin crear la venta.
+    Memoizado por (interés, subtotal, fecha base, plazos): el resultado es
+    compartido, no modificarlo. ValueError si subtotal o total no entran en
+    DECIMAL(12,2).
+    """
+    plazos = tuple(sorted({int(p) for p in plazos if int(p) > 0}))
+    if not plazos:
+        raise ValueError("plazos vacío")
+    subtotal, interes = Decimal(subtotal), Decimal(interes)
+    if not subtotal.is_finite() or not 0 < subtotal <= MONTO_MAXIMO:
+        raise ValueError(f"subtotal debe ser mayor que 0 y como máximo {MONTO_MAXIMO}.")
+    if total_con_interes(subtotal, interes) > MONTO_MAXIMO:
+        raise ValueError(f"El total con interés supera el máximo ({MONTO_MAXIMO}).")
+    return _cotizar(interes.quantize(CENT), subtotal.quantize(CENT), fecha_base, plazos)
+
+
+# filas: [[id_venta, numero_cuota, id_fecha_venc, "monto"], ...]
+_SQL_INSERT_CUOTAS = """
+    INSERT INTO cuota_creditos
+        (id_venta, numero_cuota, id_fecha_venc, monto_programado, fecha_creacion, usuario_creacion)
+    SELECT j.id_venta, j.numero_cuota, j.id_fecha_venc, j.monto, %s, %s
+    FROM OPENJSON(%s) WITH (
+        id_venta      INT           '$[0]',
+        numero_cuota  INT           '$[1]',
+        id_fecha_venc INT           '$[2]',
+        monto         DECIMAL(12,2) '$[3]'
+    ) j
+    WHERE NOT EXISTS (SELECT 1 FROM cuota_creditos c WHERE c.id_venta = j.id_venta)
+"""
+
+
+def insertar_cuotas(filas, ahora, usuario: str) -> int:
+    """Inserta el lote en una sola sentencia; omite ventas que ya tienen cuotas."""
+    if not filas:
+        return 0
+    payload = json.dumps([[v, n, f, str(m)] for v, n, f, m in filas])
+    with connection.cursor() as cur:
+        cur.execute(_SQL_INSERT_CUOTAS, [ahora, usuario, payload])
+        n = max(cur.rowcount or 0, 0)
+    if n:
+        invalidar("cuota_creditos")
+    return n
+
+
+def filas_cuotas(id_venta: int, total: Decimal, plazo: int, fecha_base: date) -> list[tuple]:
+    """Plan de una venta con las claves de vencimiento ya resueltas (una consulta como máximo)."""
+    plan = plan_cuotas(total, plazo, fecha_base)
+    ids = dim_fecha_cache.ids_de(f for _, f, _ in plan)
+    # si el vencimiento no existe en dim_fecha se omite (ver manage.py dim_fecha_generar)
+    return [(id_venta, n, ids[f], m) for n, f, m in plan if f in ids]
+
+
+def generar_cuotas(id_venta: int, total: Decimal, plazo: int, id_fecha: int, usuario: str = "web") -> int:
+    """Genera las cuotas de una venta a crédito si todavía no tiene."""
+    fecha_venta = dim_fecha_cache.fecha_de(id_fecha)
+    if not fecha_venta:
+        return 0
+    return insertar_cuotas(filas_cuotas(id_venta, total, plazo, fecha_venta), timezone.now(), usuario)
+
+
+# ===== Re-planificación al modificar una venta =====
+
+_SQL_CUOTAS_VENTAS = """
+    SELECT v.id_venta, v.id_tipo_transaccion, v.plazo_mes, v.total_venta_final, v.id_fecha,
+           c.numero_cuota, c.id_fecha_venc, c.monto_programado,
+           CASE WHEN EXISTS (SELECT 1 FROM pago_cuota pc WHERE pc.id_cuota = c.id_cuota) THEN 1 ELSE 0 END
+    FROM OPENJSON(%s) WITH (id_venta INT '$') j
+    JOIN ventas v ON v.id_venta = j.id_venta
+    LEFT JOIN cuota_creditos c ON c.id_venta = v.id_venta
+"""
+
+# fuente = plan deseado de las cuotas SIN pagos de las ventas que cambian;
+# las que tienen asignaciones en pago_cuota nunca se tocan (también se
+# re-verifica aquí por concurrencia)
+_SQL_MERGE_CUOTAS = """
+    WITH t AS (
+        SELECT * FROM cuota_creditos
+        WHERE id_venta IN (SELECT id_venta FROM OPENJSON(%s) WITH (id_venta INT '$'))
+    )
+    MERGE t
+    USING (
+        SELECT id_venta, numero_cuota, id_fecha_venc, monto
+        FROM OPENJSON(%s) WITH (
+            id_venta      INT           '$[0]',
+            numero_cuota  INT           '$[1]',
+            id_fecha_venc INT           '$[2]',
+            monto         DECIMAL(12,2) '$[3]'
+        )
+    ) s ON t.id_venta = s.id_venta AND t.numero_cuota = s.numero_cuota
+    WHEN MATCHED AND (t.id_fecha_venc <> s.id_fecha_venc OR t.monto_programado <> s.monto)
+         AND NOT EXISTS (SELECT 1 FROM pago_cuota pc WHERE pc.id_cuota = t.id_cuota) THEN
+        UPDATE SET id_fecha_venc = s.id_fecha_venc, monto_programado = s.monto,
+                   fecha_modificacion = %s, usuario_modificacion = %s
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (id_venta, numero_cuota, id_fecha_venc, monto_programado, fecha_creacion, usuario_creacion)
+        VALUES (s.id_venta, s.numero_cuota, s.id_fecha_venc, s.monto, %s, %s)
+    WHEN NOT MATCHED BY SOURCE
+         AND NOT EXISTS (SELECT 1 FROM pago_cuota pc WHERE pc.id_cuota = t.id_cuota) THEN
+        DELETE;
+"""
+
+
+def diff_cuotas(actuales, id_tipo: int, plazo: int, total: Decimal, fecha_base: date | None) -> dict | None:
+    """
+    Plan deseado de las cuotas sin pagos, o None si ya coincide con `actuales`.
+
+    actuales: [(numero_cuota, id_fecha_venc, monto, pagada), ...]
+    Las cuotas pagadas (total o parcialmente) se conservan tal cual; el
+    saldo `total - sum(pagadas)` se reparte entre los números libres
+    1..plazo con sus vencimientos desde la fecha de la venta. Sin crédito,
+    plazo o saldo, las cuotas libres se eliminan. Un plan anterior a
+    montos_cuotas() (montos iguales, montos_cuotas_legado) que coincide en
+    números y vencimientos se deja como está: solo un cambio real de la
+    venta lo re-planifica con el reparto nuevo.
+    """
+    pagadas = {int(n): Decimal(m) for n, _, m, pagada in actuales if pagada}
+    libres = {int(n): (int(f), Decimal(m)) for n, f, m, pagada in actuales if not pagada}
+
+    deseado = {}
+    if id_tipo == TIPO_CREDITO and plazo > 0 and fecha_base:
+        numeros = [n for n in range(1, plazo + 1) if n not in pagadas]
+        saldo = Decimal(total or 0) - sum(pagadas.values(), Decimal('0'))
+        montos = montos_cuotas(saldo, len(numeros)) if numeros else []
+        if montos:
+            vencs = {n: _add_months_keep_day(fecha_base, n) for n in numeros}
+            ids = dim_fecha_cache.ids_de(vencs.values())
+            deseado = {n: (ids[vencs[n]], m) for n, m in zip(numeros, montos) if vencs[n] in ids}
+            legado = montos_cuotas_legado(total, plazo)
+            if libres and libres == {n: (f, legado[n - 1]) for n, (f, _) in deseado.items()}:
+                return None
+
+    return None if deseado == libres else deseado
+
+
+def replanificar_cuotas_lote(ids, usuario: str = "web") -> int:
+    """
+    Ajusta cuota_creditos al plazo/total/fecha actuales de las ventas `ids`
+    escribiendo solo las filas que cambian: una lectura para todo el lote y,
+    si alguna venta tiene diferencias, un único MERGE. Devuelve las filas
+    afectadas.
+    """
+    ids = sorted({int(i) for i in ids if i is not None})
+    if not ids:
+        return 0
+    ventas, actuales = {}, defaultdict(list)
+    with connection.cursor() as cur:
+        cur.execute(_SQL_CUOTAS_VENTAS, [json.dumps(ids)])
+        for id_venta, id_tipo, plazo, total, id_fecha, n, f, m, pagada in cur.fetchall():
+            ventas[id_venta] = (id_tipo, plazo, total, id_fecha)
+            if n is not None:
+                actuales[id_venta].append((n, f, m, pagada))
+
+    cambian, filas = [], []
+    for id_venta, (id_tipo, plazo, total, id_fecha) in sorted(ventas.items()):
+        deseado = diff_cuotas(actuales[id_venta], int(id_tipo or 0), int(plazo or 0), Decimal(total or 0),
+                              dim_fecha_cache.fecha_de(id_fecha))
+        if deseado is None:
+            continue
+        cambian.append(id_venta)
+        filas.extend([id_venta, n, f, str(m)] for n, (f, m) in sorted(deseado.items()))
+    if not cambian:
+        return 0
+    ahora = timezone.now()
+    with connection.cursor() as cur:
+        cur.execute(_SQL_MERGE_CUOTAS, [json.dumps(cambian), json.dumps(filas), ahora, usuario, ahora, usuario])
+        n = max(cur.rowcount or 0, 0)
+    if n:
+        invalidar("cuota_creditos")
+    return n
+
+
+def replanificar_cuotas(id_venta: int, usuario: str = "web") -> int:
+    """replanificar_cuotas_lote() de una sola venta (post_save de Venta)."""
+    return replanificar_cuotas_lote([id_venta], usuario)
+
+
+# ===== Backfill de ventas a crédito sin cuotas (p.ej. cargadas por el ETL) =====
+
+_SQL_VENTAS_SIN_CUOTAS = """
+    SELECT TOP (%s) v.id_venta, v.plazo_mes, v.total_venta_final, v.id_fecha
+    FROM ventas v
+    WHERE v.id_venta > %s
+      AND v.id_tipo_transaccion = %s
+      AND v.plazo_mes > 0
+      AND v.total_venta_final > 0
+      AND NOT EXISTS (SELECT 1 FROM cuota_creditos c WHERE c.id_venta = v.id_venta)
+    ORDER BY v.id_venta
+"""
+
+
+def backfill_cuotas(lote_ventas: int = 5000, filas_por_insert: int = 50000,
+                    limite: int | None = None, usuario: str = "etl") -> dict:
+    """
+    Genera las cuotas de todas las ventas a crédito que no tienen ninguna.
+    Recorre ventas por id (keyset) en lotes; por lote: 1 SELECT, fechas desde
+    la caché y los INSERT necesarios de hasta ~`filas_por_insert` cuotas
+    (nunca se parte una venta entre dos INSERT: el guard es por venta).
+    """
+    t0 = time.monotonic()
+    ultimo_id = 0
+    ventas = cuotas = omitidas = 0
+    ahora = timezone.now()
+
+    while limite is None or ventas < limite:
+        n = lote_ventas if limite is None else min(lote_ventas, limite - ventas)
+        with connection.cursor() as cur:
+            cur.execute(_SQL_VENTAS_SIN_CUOTAS, [n, ultimo_id, TIPO_CREDITO])
+            rows = cur.fetchall()
+        if not rows:
+            break
+        ultimo_id = rows[-1][0]
+        ventas += len(rows)
+
+        fechas_venta = dim_fecha_cache.fechas_de(r[3] for r in rows)
+        planes = []
+        for id_venta, plazo, total, id_fecha in rows:
+            base = fechas_venta.get(int(id_fecha))
+            if not base:
+                omitidas += 1
+                continue
+            planes.append((id_venta, plan_cuotas(Decimal(total), int(plazo), base)))
+        ids = dim_fecha_cache.ids_de(f for _, plan in planes for _, f, _ in plan)
+
+        filas = []
+        for id_venta, plan in planes:
+            filas.extend((id_venta, num, ids[f], m) for num, f, m in plan if f in ids)
+            if len(filas) >= filas_por_insert:
+                with transaction.atomic():
+                    cuotas += insertar_cuotas(filas, ahora, usuario)
+                filas = []
+        if filas:
+            with transaction.atomic():
+                cuotas += insertar_cuotas(filas, ahora, usuario)
+
+    segundos = time.monotonic() - t0
+    return {
+        "ventas": ventas,
+        "ventas_omitidas": omitidas,
+        "cuotas": cuotas,
+        "segundos": round(segundos, 3),
+        "ventas_por_seg": round(ventas / segundos, 1) if segundos else None,
+    }
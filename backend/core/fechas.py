@@ -0,0 +1,209 @@
+# core/fechas.py
+"""
+Caché de proceso para dim_fecha (id_fecha <-> fecha).
+
+dim_fecha es pequeña (una fila por día) y sus filas no cambian una vez
+insertadas, así que la cargamos completa en memoria la primera vez que se
+necesita y resolvemos las conversiones sin ir a la base de datos.
+Los ids/fechas que no estén en memoria se buscan en lote y se agregan.
+
+Con DIM_FECHA_SMART_KEY=True la clave es YYYYMMDD (ver
+bd/migracion_dim_fecha_smart_key.sql) y la conversión es aritmética pura;
+solo se confirma que la fila exista (una consulta por lote la primera vez
+que aparece cada clave; las filas no se borran), así una fecha fuera del
+calendario es un error de validación y no un IntegrityError de la FK.
+"""
+import threading
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import DimFecha
+
+# SQL Server admite 2100 parámetros por sentencia
+MAX_IN = 2000
+
+
+def _a_fecha(valor) -> date | None:
+    """Normaliza 'YYYY-MM-DD' / datetime / date a date."""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor).strip()[:10])
+    except ValueError:
+        return None
+
+
+def usa_smart_key() -> bool:
+    return bool(getattr(settings, "DIM_FECHA_SMART_KEY", False))
+
+def id_fecha_smart(fecha: date) -> int:
+    """date(2025, 1, 31) -> 20250131"""
+    return fecha.year * 10000 + fecha.month * 100 + fecha.day
+
+def fecha_smart(id_fecha: int) -> date | None:
+    """20250131 -> date(2025, 1, 31); None si la clave no es una fecha válida."""
+    try:
+        return date(id_fecha // 10000, id_fecha // 100 % 100, id_fecha % 100)
+    except ValueError:
+        return None
+
+
+class DimFechaCache:
+    """Mapa bidireccional id_fecha <-> fecha compartido por todo el proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_id: dict[int, date] = {}
+        self._por_fecha: dict[date, int] = {}
+        self._cargada = False
+        self._existentes: set[int] = set()   # claves smart confirmadas
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- carga / invalidación ----------
+    def cargar(self):
+        """Carga dim_fecha completa en un solo SELECT."""
+        rows = list(DimFecha.objects.values_list("id_fecha", "fecha"))
+        with self._lock:
+            self._por_id = {int(r[0]): _a_fecha(r[1]) for r in rows}
+            self._por_fecha = {f: i for i, f in self._por_id.items()}
+            self._cargada = True
+
+    def invalidar(self):
+        """Descarta el contenido; se recarga en el siguiente uso."""
+        with self._lock:
+            self._por_id = {}
+            self._por_fecha = {}
+            self._existentes = set()
+            self._cargada = False
+
+    def _asegurar_carga(self):
+        if not self._cargada:
+            self.cargar()
+
+    def _contar(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def _confirmar_smart(self, ids) -> set[int]:
+        """Claves smart de `ids` que tienen fila en dim_fecha; las no vistas se buscan por lotes."""
+        ids = set(ids)
+        with self._lock:
+            faltantes = [i for i in ids if i not in self._existentes]
+        encontrados = set()
+        for i in range(0, len(faltantes), MAX_IN):
+            lote = faltantes[i:i + MAX_IN]
+            encontrados.update(int(x) for x in DimFecha.objects.filter(pk__in=lote).values_list("id_fecha", flat=True))
+        with self._lock:
+            self._existentes.update(encontrados)
+            self.hits += len(ids) - len(faltantes)
+            self.misses += len(faltantes)
+            return {i for i in ids if i in self._existentes}
+
+    def _agregar(self, rows):
+        with self._lock:
+            for id_fecha, fecha in rows:
+                f = _a_fecha(fecha)
+                self._por_id[int(id_fecha)] = f
+                self._por_fecha[f] = int(id_fecha)
+
+    # ---------- id_fecha -> fecha ----------
+    def fechas_de(self, ids) -> dict[int, date]:
+        """Resuelve varios id_fecha; los faltantes se buscan con IN (...) por lotes."""
+        ids = {int(i) for i in ids if i is not None}
+        if usa_smart_key():
+            res = {i: fecha_smart(i) for i in ids}
+            existentes = self._confirmar_smart(i for i, f in res.items() if f)
+            return {i: f for i, f in res.items() if i in existentes}
+        self._asegurar_carga()
+        faltantes = [i for i in ids if i not in self._por_id]
+        self._contar(len(ids) - len(faltantes), len(faltantes))
+        for i in range(0, len(faltantes), MAX_IN):
+            lote = faltantes[i:i + MAX_IN]
+            self._agregar(DimFecha.objects.filter(pk__in=lote).values_list("id_fecha", "fecha"))
+        return {i: self._por_id[i] for i in ids if i in self._por_id}
+
+    def fecha_de(self, id_fecha) -> date | None:
+        if id_fecha is None:
+            return None
+        return self.fechas_de([id_fecha]).get(int(id_fecha))
+
+    def iso_de(self, id_fecha) -> str | None:
+        f = self.fecha_de(id_fecha)
+        return f.isoformat() if f else None
+
+    # ---------- fecha -> id_fecha ----------
+    def ids_de(self, fechas) -> dict[date, int]:
+        """Resuelve varias fechas; las faltantes se buscan con IN (...) por lotes."""
+        fechas = {f for f in (_a_fecha(x) for x in fechas) if f}
+        if usa_smart_key():
+            res = {f: id_fecha_smart(f) for f in fechas}
+            existentes = self._confirmar_smart(res.values())
+            return {f: i for f, i in res.items() if i in existentes}
+        self._asegurar_carga()
+        faltantes = [f for f in fechas if f not in self._por_fecha]
+        self._contar(len(fechas) - len(faltantes), len(faltantes))
+        for i in range(0, len(faltantes), MAX_IN):
+            lote = faltantes[i:i + MAX_IN]
+            self._agregar(DimFecha.objects.filter(fecha__in=lote).values_list("id_fecha", "fecha"))
+        return {f: self._por_fecha[f] for f in fechas if f in self._por_fecha}
+
+    def id_de(self, fecha) -> int | None:
+        f = _a_fecha(fecha)
+        if not f:
+            return None
+        return self.ids_de([f]).get(f)
+
+    # ---------- métricas ----------
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "smart_key": usa_smart_key(),
+            "cargada": self._cargada,
+            "filas": len(self._existentes) if usa_smart_key() else len(self._por_id),
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+
+
+# instancia única del proceso
+dim_fecha_cache = DimFechaCache()
+
+
+def filtro_rango_fechas(campo: str, desde=None, hasta=None) -> Q:
+    """
+    Q para filtrar una FK a dim_fecha (`campo`) por rango de fechas sin
+    calcular la fecha fila por fila:
+      - smart key: rango directo sobre la clave (index seek en la FK)
+      - identity: semi-join contra dim_fecha por su UNIQUE(fecha)
+    ValueError si desde/hasta vienen pero no son YYYY-MM-DD.
+    """
+    d, h = _a_fecha(desde), _a_fecha(hasta)
+    for nombre, valor, f in (("desde", desde, d), ("hasta", hasta, h)):
+        if valor not in (None, "") and f is None:
+            raise ValueError(f"{nombre} debe ser YYYY-MM-DD.")
+    if not d and not h:
+        return Q()
+    if usa_smart_key():
+        q = Q()
+        if d:
+            q &= Q(**{f"{campo}__gte": id_fecha_smart(d)})
+        if h:
+            q &= Q(**{f"{campo}__lte": id_fecha_smart(h)})
+        return q
+    rango = DimFecha.objects.all()
+    if d:
+        rango = rango.filter(fecha__gte=d)
+    if h:
+        rango = rango.filter(fecha__lte=h)
+    return Q(**{f"{campo}__in": rango.values("id_fecha")})
@@ -0,0 +1,176 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_tipocliente_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoriaGasto',
+            fields=[
+                ('id_categoria_gastos', models.AutoField(db_column='id_categoria_gastos', primary_key=True, serialize=False)),
+                ('nombre_categoria', models.CharField(db_column='nombre_categoria', max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'categoria_gastos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoriaProducto',
+            fields=[
+                ('id_categoria', models.AutoField(db_column='id_categoria', primary_key=True, serialize=False)),
+                ('nombre_categoria', models.CharField(db_column='nombre_categoria', max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'categoria_productos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id_cliente', models.AutoField(db_column='id_cliente', primary_key=True, serialize=False)),
+                ('nombre_cliente', models.CharField(db_column='nombre_cliente', max_length=100)),
+                ('apellido_cliente', models.CharField(db_column='apellido_cliente', max_length=100)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+                ('usuario_creacion', models.CharField(blank=True, db_column='usuario_creacion', max_length=50, null=True)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, db_column='fecha_modificacion', null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, db_column='usuario_modificacion', max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'clientes',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CuotaCredito',
+            fields=[
+                ('id_cuota', models.AutoField(primary_key=True, serialize=False)),
+                ('numero_cuota', models.IntegerField()),
+                ('monto_programado', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('usuario_creacion', models.CharField(max_length=50)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'cuota_creditos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVenta',
+            fields=[
+                ('id_detalle_venta', models.AutoField(db_column='id_detalle_venta', primary_key=True, serialize=False)),
+                ('cantidad', models.DecimalField(db_column='cantidad', decimal_places=2, max_digits=12)),
+                ('precio_unitario', models.DecimalField(db_column='precio_unitario', decimal_places=2, max_digits=12)),
+                ('costo_unitario_venta', models.DecimalField(db_column='costo_unitario_venta', decimal_places=2, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+                ('usuario_creacion', models.CharField(blank=True, db_column='usuario_creacion', max_length=50, null=True)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, db_column='fecha_modificacion', null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, db_column='usuario_modificacion', max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'detalle_ventas',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='DimFecha',
+            fields=[
+                ('id_fecha', models.AutoField(db_column='id_fecha', primary_key=True, serialize=False)),
+                ('fecha', models.DateField(db_column='fecha', unique=True)),
+                ('anio', models.IntegerField(db_column='anio')),
+                ('mes', models.IntegerField(db_column='mes')),
+                ('trimestre', models.IntegerField(db_column='trimestre')),
+                ('semana_iso', models.IntegerField(db_column='semana_iso')),
+                ('dia', models.IntegerField(db_column='dia')),
+            ],
+            options={
+                'db_table': 'dim_fecha',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Gasto',
+            fields=[
+                ('id_gasto', models.AutoField(db_column='id_gasto', primary_key=True, serialize=False)),
+                ('nombre_gasto', models.CharField(db_column='nombre_gasto', max_length=100)),
+                ('monto_gasto', models.DecimalField(db_column='monto_gasto', decimal_places=2, default=0, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+                ('usuario_creacion', models.CharField(blank=True, db_column='usuario_creacion', max_length=50, null=True)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, db_column='fecha_modificacion', null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, db_column='usuario_modificacion', max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'gastos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Pago',
+            fields=[
+                ('id_pago', models.AutoField(primary_key=True, serialize=False)),
+                ('monto_pago', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('usuario_creacion', models.CharField(max_length=50)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'pagos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Producto',
+            fields=[
+                ('id_producto', models.AutoField(db_column='id_producto', primary_key=True, serialize=False)),
+                ('nombre_producto', models.CharField(db_column='nombre_producto', max_length=200)),
+                ('precio_unitario', models.DecimalField(db_column='precio_unitario', decimal_places=2, default=0, max_digits=12)),
+                ('costo_unitario', models.DecimalField(db_column='costo_unitario', decimal_places=2, default=0, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+                ('usuario_creacion', models.CharField(blank=True, db_column='usuario_creacion', max_length=50, null=True)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, db_column='fecha_modificacion', null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, db_column='usuario_modificacion', max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'productos',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TipoTransaccion',
+            fields=[
+                ('id_tipo_transaccion', models.AutoField(db_column='id_tipo_transaccion', primary_key=True, serialize=False)),
+                ('nombre_tipo_transaccion', models.CharField(db_column='nombre_tipo_transaccion', max_length=100, unique=True)),
+            ],
+            options={
+                'db_table': 'tipo_transacciones',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Venta',
+            fields=[
+                ('id_venta', models.AutoField(db_column='id_venta', primary_key=True, serialize=False)),
+                ('plazo_mes', models.IntegerField(db_column='plazo_mes', default=0)),
+                ('interes', models.DecimalField(db_column='interes', decimal_places=2, default=0, max_digits=5)),
+                ('total_venta_final', models.DecimalField(db_column='total_venta_final', decimal_places=2, default=0, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField(blank=True, db_column='fecha_creacion', null=True)),
+                ('usuario_creacion', models.CharField(blank=True, db_column='usuario_creacion', max_length=50, null=True)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, db_column='fecha_modificacion', null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, db_column='usuario_modificacion', max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'ventas',
+                'managed': False,
+            },
+        ),
+    ]
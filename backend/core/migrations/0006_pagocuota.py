@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_modelos_no_gestionados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagoCuota',
+            fields=[
+                ('pk', models.CompositePrimaryKey('id_pago', 'id_cuota', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('monto_asignado', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('usuario_creacion', models.CharField(max_length=50)),
+                ('fecha_modificacion', models.DateTimeField(blank=True, null=True)),
+                ('usuario_modificacion', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+            options={
+                'db_table': 'pago_cuota',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,6 +1,6 @@
 # core/models.py
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from decimal import Decimal
 from datetime import date
@@ -100,7 +100,12 @@ class Gasto(models.Model):
     id_gasto = models.AutoField(primary_key=True, db_column='id_gasto')
     nombre_gasto = models.CharField(max_length=100, db_column='nombre_gasto')
     monto_gasto = models.DecimalField(max_digits=12, decimal_places=2, db_column='monto_gasto', default=0)
-    id_fecha = models.IntegerField(db_column='id_fecha')  # FK a dim_fecha (mantenemos int)
+    id_fecha = models.ForeignKey(
+        'DimFecha',
+        on_delete=models.PROTECT,
+        db_column='id_fecha',
+        related_name='gastos'
+    )
     id_categoria_gastos = models.ForeignKey(
         'CategoriaGasto',
         on_delete=models.PROTECT,
@@ -121,16 +126,25 @@ class Gasto(models.Model):
     
 class DimFecha(models.Model):
     id_fecha = models.AutoField(primary_key=True, db_column='id_fecha')
+    fecha = models.DateField(unique=True, db_column='fecha')
+    anio = models.IntegerField(db_column='anio')
+    mes = models.IntegerField(db_column='mes')
+    trimestre = models.IntegerField(db_column='trimestre')
+    semana_iso = models.IntegerField(db_column='semana_iso')
+    dia = models.IntegerField(db_column='dia')
 
     class Meta:
         managed = False
         db_table = 'dim_fecha'
 
+    def __str__(self):
+        return self.fecha.isoformat() if self.fecha else str(self.id_fecha)
+
 class Venta(models.Model):
     id_venta = models.AutoField(primary_key=True, db_column='id_venta')
     id_cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, db_column='id_cliente')
     id_tipo_transaccion = models.ForeignKey(TipoTransaccion, on_delete=models.PROTECT, db_column='id_tipo_transaccion')
-    id_fecha = models.IntegerField(db_column='id_fecha')
+    id_fecha = models.ForeignKey(DimFecha, on_delete=models.PROTECT, db_column='id_fecha', related_name='ventas')
     plazo_mes = models.IntegerField(db_column='plazo_mes', default=0)
     interes = models.DecimalField(max_digits=5, decimal_places=2, db_column='interes', default=0)
     total_venta_final = models.DecimalField(max_digits=12, decimal_places=2, db_column='total_venta_final', default=0)
@@ -162,7 +176,7 @@ class CuotaCredito(models.Model):
     id_cuota = models.AutoField(primary_key=True)
     id_venta = models.ForeignKey('Venta', db_column='id_venta', on_delete=models.CASCADE)
     numero_cuota = models.IntegerField()
-    id_fecha_venc = models.IntegerField()  # FK a dim_fecha.id_fecha
+    id_fecha_venc = models.ForeignKey(DimFecha, on_delete=models.PROTECT, db_column='id_fecha_venc', related_name='cuotas')
     monto_programado = models.DecimalField(max_digits=12, decimal_places=2)
     fecha_creacion = models.DateTimeField()
     usuario_creacion = models.CharField(max_length=50)
@@ -173,10 +187,25 @@ class CuotaCredito(models.Model):
         managed = False
         db_table = 'cuota_creditos'
 
+class PagoCuota(models.Model):
+    # asignación de un pago a una cuota; PK compuesta (id_pago, id_cuota)
+    pk = models.CompositePrimaryKey('id_pago', 'id_cuota')
+    id_pago = models.ForeignKey('Pago', db_column='id_pago', on_delete=models.CASCADE)
+    id_cuota = models.ForeignKey(CuotaCredito, db_column='id_cuota', on_delete=models.CASCADE, related_name='asignaciones')
+    monto_asignado = models.DecimalField(max_digits=12, decimal_places=2)
+    fecha_creacion = models.DateTimeField()
+    usuario_creacion = models.CharField(max_length=50)
+    fecha_modificacion = models.DateTimeField(null=True, blank=True)
+    usuario_modificacion = models.CharField(max_length=50, null=True, blank=True)
+
+    class Meta:
+        managed = False
+        db_table = 'pago_cuota'
+
 class Pago(models.Model):
     id_pago = models.AutoField(primary_key=True)
     id_venta = models.ForeignKey('Venta', db_column='id_venta', on_delete=models.CASCADE)
-    id_fecha = models.IntegerField()  # FK a dim_fecha.id_fecha
+    id_fecha = models.ForeignKey(DimFecha, on_delete=models.PROTECT, db_column='id_fecha', related_name='pagos')
     monto_pago = models.DecimalField(max_digits=12, decimal_places=2)
     fecha_creacion = models.DateTimeField()
     usuario_creacion = models.CharField(max_length=50)
@@ -201,79 +230,65 @@ def _add_months_keep_day(d: date, months: int) -> date:
     return date(y, m, dd)
 
 def _fecha_iso_to_id_fecha(fecha_iso: date) -> int | None:
-    from django.db import connection
-    with connection.cursor() as cur:
-        cur.execute("SELECT id_fecha FROM dim_fecha WHERE fecha = %s", [fecha_iso])
-        row = cur.fetchone()
-    return int(row[0]) if row else None
+    from .fechas import dim_fecha_cache
+    return dim_fecha_cache.id_de(fecha_iso)
 
 
 @receiver(post_save, sender=Venta)
-def generar_cuotas_al_crear(sender, instance: 'Venta', created: bool, **kwargs):
+def generar_cuotas_al_crear(sender, instance: 'Venta', created: bool, raw: bool = False, **kwargs):
     """
     Al CREAR una venta a crédito (id_tipo_transaccion = 2),
     genera N cuotas si (y solo si) actualmente no existen.
     Ventas previas a esta implementación se ignoran (no se corren).
+    Se ejecuta al confirmar la transacción: claves de vencimiento en una
+    consulta (ninguna con smart key) + un INSERT por lote.
     """
-    if not created:
-        return  # ignorar updates para no duplicar
-    if int(instance.id_tipo_transaccion_id or 0) != 2:
+    if not created or raw:
+        return  # ignorar updates para no duplicar; raw = loaddata
+    from .cuotas import TIPO_CREDITO, generacion_suspendida, generar_cuotas
+    if generacion_suspendida():
+        return  # operación masiva: genera sus cuotas por su cuenta
+    if int(instance.id_tipo_transaccion_id or 0) != TIPO_CREDITO:
         return  # solo crédito
 
-    from django.db import connection
-    # ¿Ya existen cuotas para esta venta?
-    with connection.cursor() as cur:
-        cur.execute("SELECT COUNT(*) FROM cuota_creditos WHERE id_venta = %s", [instance.id_venta])
-        existe = cur.fetchone()[0]
-
-    if existe and int(existe) > 0:
-        return  # ya tiene cuotas (o parciales, no generamos aquí)
-
-    # Tomar plazo y total
     plazo = int(instance.plazo_mes or 0)
-    if plazo <= 0:
-        return  # sin plazo => nada que generar
-
     total = Decimal(instance.total_venta_final or 0)
-    if total <= 0:
-        return
+    if plazo <= 0 or total <= 0:
+        return  # sin plazo o sin total => nada que generar
+
+    id_venta, id_fecha = instance.id_venta, instance.id_fecha_id
+    usuario = instance.usuario_creacion or "web"
+    transaction.on_commit(lambda: generar_cuotas(id_venta, total, plazo, id_fecha, usuario))
+
 
-    # monto por cuota
-    monto = (total / Decimal(plazo)).quantize(Decimal('0.01'))
+# campos de Venta que afectan el plan de cuotas
+CAMPOS_PLAN_CUOTAS = {"id_tipo_transaccion", "plazo_mes", "interes", "total_venta_final", "id_fecha"}
 
-    # fecha base = fecha de la venta (buscar en dim_fecha)
-    from django.db import connection
-    with connection.cursor() as cur:
-        cur.execute("SELECT fecha FROM dim_fecha WHERE id_fecha = %s", [instance.id_fecha])
-        row = cur.fetchone()
-    if not row:
+@receiver(post_save, sender=Venta)
+def replanificar_cuotas_al_modificar(sender, instance: 'Venta', created: bool, raw: bool = False,
+                                     update_fields=None, **kwargs):
+    """
+    Al MODIFICAR una venta (plazo, interés, total, fecha o tipo) re-planifica
+    sus cuotas por diferencia: conserva las que tienen pagos asignados y
+    escribe solo las filas que cambian (ver cuotas.replanificar_cuotas).
+    """
+    if created or raw:
         return
-    fecha_venta = row[0]  # datetime.date
-
-    # Generar N cuotas
-    from django.utils import timezone
-    user = "web"
-    now = timezone.now()
-
-    registros = []
-    for n in range(1, plazo + 1):
-        fecha_venc = _add_months_keep_day(fecha_venta, n)
-        id_fecha_venc = _fecha_iso_to_id_fecha(fecha_venc)
-        if not id_fecha_venc:
-            # si no existe en dim_fecha, saltamos (o podrías crearla en tu ETL)
-            continue
-        registros.append((
-            instance.id_venta, n, id_fecha_venc, str(monto), now, user
-        ))
-
-    # Inserción por lote
-    if registros:
-        with connection.cursor() as cur:
-            cur.executemany("""
-                INSERT INTO cuota_creditos
-                (id_venta, numero_cuota, id_fecha_venc, monto_programado, fecha_creacion, usuario_creacion)
-                VALUES (%s,%s,%s,%s,%s,%s)
-            """, registros)
-        
+    if update_fields is not None and not (set(update_fields) & CAMPOS_PLAN_CUOTAS):
+        return  # no cambió nada del plan
+    from .cuotas import generacion_suspendida, replanificar_cuotas
+    if generacion_suspendida():
+        return
+
+    id_venta = instance.id_venta
+    usuario = instance.usuario_modificacion or "web"
+    transaction.on_commit(lambda: replanificar_cuotas(id_venta, usuario))
 
 
+@receiver([post_save, post_delete])
+def invalidar_cache_datos(sender, raw: bool = False, **kwargs):
+    """Toda escritura de un modelo de core invalida los conteos/reportes de su tabla."""
+    if raw or sender._meta.app_label != "core":
+        return
+    from .cache_datos import invalidar
+    invalidar(sender._meta.db_table)
@@ -0,0 +1,252 @@
+# core/paginacion.py
+"""
+Paginación de los listados: por número de página (?page=) o por cursor
+(keyset, ?cursor=).
+
+Con cursor la página siguiente/anterior se pide con un token opaco que
+guarda el orden y los valores de su clave de la última/primera fila (un
+token de otro ?ordering= se rechaza con CursorInvalido); la
+consulta filtra "después de esa fila" sobre el índice en lugar de saltar
+OFFSET filas, así cualquier página cuesta lo mismo. ?cursor= vacío pide la
+primera página. En modo cursor no se calcula count.
+
+El orden tiene que ser total: la última columna debe ser la pk.
+
+count (modo página), según ?count=:
+  - (por defecto) exacto, memorizado por endpoint + filtros durante
+    CONTEO_TTL segundos; cualquier escritura en las tablas del listado lo
+    invalida (cache_datos)
+  - count=false: sin COUNT; next se decide leyendo una fila de más
+  - count=estimado: sin filtros, filas de la tabla según sus estadísticas
+    (sys.dm_db_partition_stats); con filtros, como el exacto
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from .cache_datos import cacheado
+
+CONTEO_TTL = getattr(settings, "CONTEO_TTL", 30)
+MAX_PAGE_SIZE = 1000
+
+# parámetros que no cambian el conjunto de filas contado
+_NO_FILTROS = {"page", "page_size", "cursor", "count", "ordering"}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+# ---------- token ----------
+def _a_json(v):
+    if isinstance(v, datetime):
+        # DATETIME de SQL Server: milisegundos
+        return {"dt": v.isoformat(timespec="milliseconds")}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    if isinstance(v, Decimal):
+        return {"n": str(v)}
+    return v
+
+def _de_json(v):
+    if isinstance(v, dict):
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+        if "n" in v:
+            return Decimal(v["n"])
+    return v
+
+def codificar_cursor(valores, orden: list[str], atras: bool = False) -> str:
+    crudo = json.dumps({"o": list(orden), "v": [_a_json(v) for v in valores], "a": int(atras)},
+                       separators=(",", ":"))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+def decodificar_cursor(token: str, orden: list[str]) -> tuple[list, bool]:
+    """(valores, atras) del token; CursorInvalido si no se lee o es de otro orden."""
+    try:
+        crudo = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(crudo)
+        valores, atras, orden_token = [_de_json(v) for v in data["v"]], bool(data.get("a")), data.get("o")
+    except Exception:
+        raise CursorInvalido("cursor inválido")
+    if orden_token != list(orden) or len(valores) != len(orden):
+        raise CursorInvalido("el cursor no corresponde al ordering pedido; vuelva a la primera página")
+    return valores, atras
+
+
+# ---------- helpers ----------
+def tamano_pagina(request, defecto: int = 10) -> int:
+    """?page_size= entre 1 y MAX_PAGE_SIZE; vacío o inválido -> `defecto`."""
+    try:
+        n = int(request.GET.get("page_size") or defecto)
+    except ValueError:
+        n = defecto
+    return min(max(n, 1), MAX_PAGE_SIZE)
+
+def modo_cursor(request) -> bool:
+    return "cursor" in request.GET
+
+def _url(request, **cambios) -> str:
+    qd = request.GET.copy()
+    for k, v in cambios.items():
+        qd[k] = v
+    return f"{request.build_absolute_uri(request.path)}?{qd.urlencode()}"
+
+def _orden(orden: list[str]) -> list[tuple[str, bool]]:
+    return [(c.lstrip("-"), c.startswith("-")) for c in orden]
+
+def _valor(fila, campo: str):
+    for parte in campo.split("__"):
+        fila = getattr(fila, parte)
+    return fila
+
+def q_keyset(orden: list[str], valores: list, atras: bool = False) -> Q:
+    """(a, b) > (va, vb) según la dirección de cada columna; `atras` invierte."""
+    q = Q()
+    iguales = Q()
+    for (campo, desc), v in zip(_orden(orden), valores):
+        op = "lt" if desc != atras else "gt"
+        q |= iguales & Q(**{f"{campo}__{op}": v})
+        iguales &= Q(**{campo: v})
+    return q
+
+def sql_keyset(orden: list[str], valores: list, atras: bool = False, marcadores: dict | None = None) -> tuple[str, list]:
+    """
+    Mismo predicado que q_keyset para SQL crudo (columnas = nombres de columna).
+    marcadores: columna -> expresión del parámetro, p.ej. "CAST(%s AS DATETIME)".
+    """
+    marcadores = marcadores or {}
+    partes, params = [], []
+    prefijo, prefijo_params = [], []
+    for (col, desc), v in zip(_orden(orden), valores):
+        op = "<" if desc != atras else ">"
+        m = marcadores.get(col, "%s")
+        partes.append("(" + " AND ".join(prefijo + [f"{col} {op} {m}"]) + ")")
+        params += prefijo_params + [v]
+        prefijo.append(f"{col} = {m}")
+        prefijo_params.append(v)
+    return "(" + " OR ".join(partes) + ")", params
+
+def order_by_sql(orden: list[str], atras: bool = False) -> str:
+    return ", ".join(f"{c} {'DESC' if desc != atras else 'ASC'}" for c, desc in _orden(orden))
+
+
+# ---------- paginación ----------
+def ventana_cursor(filas: list, page_size: int, valores, atras: bool):
+    """
+    filas: hasta page_size+1 filas leídas en el sentido del cursor.
+    Devuelve (filas en orden normal, hay_siguiente, hay_anterior).
+    """
+    hay_mas = len(filas) > page_size
+    filas = filas[:page_size]
+    if atras:
+        filas.reverse()
+        return filas, True, hay_mas
+    return filas, hay_mas, bool(valores)
+
+def meta_cursor(request, filas, clave, orden: list[str], hay_siguiente: bool, hay_anterior: bool) -> dict:
+    sig = codificar_cursor(clave(filas[-1]), orden) if filas and hay_siguiente else None
+    ant = codificar_cursor(clave(filas[0]), orden, atras=True) if filas and hay_anterior else None
+    return {
+        "count": None,
+        "next": _url(request, cursor=sig) if sig else None,
+        "previous": _url(request, cursor=ant) if ant else None,
+        "next_cursor": sig,
+        "previous_cursor": ant,
+    }
+
+def paginar_cursor(request, qs, orden: list[str], page_size: int, clave=None):
+    """Página por keyset de un queryset. `clave(fila)` -> valores de `orden` (por defecto atributos)."""
+    if clave is None:
+        campos = [c for c, _ in _orden(orden)]
+        clave = lambda fila: [_valor(fila, c) for c in campos]
+    token = request.GET.get("cursor") or ""
+    valores, atras = decodificar_cursor(token, orden) if token else (None, False)
+    if atras:
+        qs = qs.order_by(*[c if d else f"-{c}" for c, d in _orden(orden)])
+    else:
+        qs = qs.order_by(*orden)
+    if valores:
+        qs = qs.filter(q_keyset(orden, valores, atras))
+    filas, hay_sig, hay_ant = ventana_cursor(list(qs[:page_size + 1]), page_size, valores, atras)
+    return filas, meta_cursor(request, filas, clave, orden, hay_sig, hay_ant)
+
+# ---------- count ----------
+def modo_conteo(request) -> str:
+    v = (request.GET.get("count") or "").lower()
+    if v in ("false", "0", "no"):
+        return "no"
+    if v in ("estimado", "estimate"):
+        return "estimado"
+    return "exacto"
+
+def firma_filtros(request) -> list:
+    return sorted((k, v) for k, vs in request.GET.lists() if k not in _NO_FILTROS for v in vs)
+
+def estimar_filas(tabla: str) -> int | None:
+    """Filas de la tabla según sus estadísticas (requiere VIEW DATABASE STATE)."""
+    try:
+        with connection.cursor() as cur:
+            cur.execute("""
+                SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+                WHERE object_id = OBJECT_ID(%s) AND index_id IN (0, 1)
+            """, [tabla])
+            r = cur.fetchone()
+    except DatabaseError:
+        return None
+    return int(r[0]) if r and r[0] is not None else None
+
+def contar(request, tablas: list[str], calcular) -> tuple[int | None, bool]:
+    """(count, es_estimado) según ?count=. `tablas[0]` es la tabla listada."""
+    modo = modo_conteo(request)
+    if modo == "no":
+        return None, False
+    filtros = firma_filtros(request)
+    if modo == "estimado" and not filtros:
+        n = cacheado("estimado", [], tablas[0], lambda: estimar_filas(tablas[0]), CONTEO_TTL)
+        if n is not None:
+            return n, True
+    return cacheado("conteo", tablas, [request.path, filtros], calcular, CONTEO_TTL), False
+
+def numero_pagina(request, count: int | None, page_size: int) -> int:
+    """?page= como Paginator.get_page: inválido -> 1, fuera de rango -> última (si hay count)."""
+    try:
+        page = max(int(request.GET.get("page") or 1), 1)
+    except ValueError:
+        page = 1
+    if count is not None:
+        page = min(page, max(1, -(-count // page_size)))
+    return page
+
+def meta_pagina(request, page: int, count, hay_siguiente: bool, estimado: bool = False) -> dict:
+    meta = {
+        "count": count,
+        "next": _url(request, page=page + 1) if hay_siguiente else None,
+        "previous": _url(request, page=page - 1) if page > 1 else None,
+    }
+    if estimado:
+        meta["count_estimado"] = True
+    return meta
+
+
+def paginar(request, qs, orden: list[str], page_size: int, clave=None, tablas: list[str] | None = None):
+    """
+    (filas, meta) con meta = {count, next, previous[, next_cursor, previous_cursor]}.
+    ?cursor= -> keyset; si no, ?page= (mismo orden) con count según ?count=.
+    tablas: de las que depende el count (por defecto la del modelo).
+    """
+    if modo_cursor(request):
+        return paginar_cursor(request, qs, orden, page_size, clave)
+    qs = qs.order_by(*orden)
+    count, estimado = contar(request, tablas or [qs.model._meta.db_table], qs.count)
+    page = numero_pagina(request, None if estimado else count, page_size)
+    offset = (page - 1) * page_size
+    filas = list(qs[offset:offset + page_size + 1])
+    return filas[:page_size], meta_pagina(request, page, count, len(filas) > page_size, estimado)
@@ -0,0 +1,210 @@
+# core/prorrateo.py
+"""
+Prorrateo de gastos por segmento (tipo_cliente, tipo_transaccion,
+categoria_producto) de cada mes.
+
+fn_resumen_mensual solo reparte por participación en ventas. Acá el
+criterio ("driver") es configurable:
+  - ventas:    participación en venta (lo mismo que la función)
+  - unidades:  participación en unidades vendidas
+  - costo:     participación en costo de venta
+  - categoria: cada categoría de gasto va a las categorías de producto que
+               indica prorrateo_categoria_gastos (por ventas entre ellas);
+               las no configuradas, por ventas entre todos
+  - pesos:     peso fijo por categoría de producto (prorrateo_pesos) y por
+               ventas dentro de la categoría
+Lo que no tiene base (el driver suma cero en el mes) se reparte por ventas.
+
+El reparto es sobre todos los segmentos del mes (un filtro no cambia lo que
+le toca a cada segmento) y se redondea a centavos por resto mayor: la suma
+de lo asignado es exactamente el gasto del mes. Cada (mes, driver) queda en
+caché; los meses que faltan se calculan juntos con dos consultas.
+
+Con RENTABILIDAD_AGREGADA=True venta/costo/unidades salen de
+agg_rentabilidad_mensual y cada (mes, driver) depende solo de la versión de
+su mes en el agregado (la cambia el refresco) y de la configuración de su
+driver: escribir una venta no invalida los demás meses.
+"""
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .cache_datos import cacheados
+from .rentabilidad import tabla_mes, usa_agregado
+
+DRIVERS = ("ventas", "unidades", "costo", "categoria", "pesos")
+
+TABLAS_PRORRATEO = [
+    "ventas", "detalle_ventas", "gastos", "dim_fecha", "clientes", "productos",
+    "prorrateo_categoria_gastos", "prorrateo_pesos",
+]
+
+# con el agregado: lo demás lo cubre la versión de cada mes (tabla_mes), que
+# cambia con el total de gastos del mes; "categoria" depende además de cómo
+# se reparte ese total entre categorías de gasto
+TABLAS_DRIVER = {
+    "categoria": ["gastos", "prorrateo_categoria_gastos"],
+    "pesos": ["prorrateo_pesos"],
+}
+
+_MESES_JSON = "OPENJSON(%s) WITH (anio INT '$[0]', mes INT '$[1]') m"
+
+_SQL_SEGMENTOS = f"""
+    SELECT df.anio, df.mes, cl.id_tipo_cliente, v.id_tipo_transaccion, pr.id_categoria,
+           SUM(dv.cantidad * dv.precio_unitario),
+           SUM(dv.cantidad * dv.costo_unitario_venta),
+           SUM(dv.cantidad)
+    FROM {_MESES_JSON}
+    JOIN dim_fecha df      ON df.anio = m.anio AND df.mes = m.mes
+    JOIN ventas v          ON v.id_fecha = df.id_fecha
+    JOIN clientes cl       ON cl.id_cliente = v.id_cliente
+    JOIN detalle_ventas dv ON dv.id_venta = v.id_venta
+    JOIN productos pr      ON pr.id_producto = dv.id_producto
+    GROUP BY df.anio, df.mes, cl.id_tipo_cliente, v.id_tipo_transaccion, pr.id_categoria
+"""
+
+_SQL_SEGMENTOS_AGREGADO = f"""
+    SELECT a.anio, a.mes, a.id_tipo_cliente, a.id_tipo_transaccion, a.id_categoria_producto,
+           a.total_venta, a.total_costo, a.total_unidades
+    FROM {_MESES_JSON}
+    JOIN agg_rentabilidad_mensual a ON a.anio = m.anio AND a.mes = m.mes
+"""
+
+_SQL_GASTOS = f"""
+    SELECT df.anio, df.mes, g.id_categoria_gastos, SUM(g.monto_gasto)
+    FROM {_MESES_JSON}
+    JOIN dim_fecha df ON df.anio = m.anio AND df.mes = m.mes
+    JOIN gastos g     ON g.id_fecha = df.id_fecha
+    GROUP BY df.anio, df.mes, g.id_categoria_gastos
+"""
+
+_SQL_MAPEO = "SELECT id_categoria_gastos, id_categoria_producto FROM prorrateo_categoria_gastos"
+_SQL_PESOS = "SELECT id_categoria_producto, peso FROM prorrateo_pesos"
+
+
+def driver_por_defecto() -> str:
+    return getattr(settings, "PRORRATEO_DRIVER", "ventas")
+
+
+def _centavos(monto) -> int:
+    return int((Decimal(monto) * 100).to_integral_value())
+
+
+def _repartir(centavos: int, pesos: list) -> list[int] | None:
+    """`centavos` repartidos según `pesos` (resto mayor); None si los pesos suman 0."""
+    pesos = [max(p, 0) for p in pesos]
+    total = sum(pesos)
+    if total <= 0:
+        return None
+    crudo = [Decimal(centavos) * p / total for p in pesos]
+    partes = [int(c) for c in crudo]
+    orden = sorted(range(len(partes)), key=lambda i: (partes[i] - crudo[i], i))
+    for i in orden[:centavos - sum(partes)]:
+        partes[i] += 1
+    return partes
+
+
+def _configuracion(driver: str) -> dict:
+    if driver not in ("categoria", "pesos"):
+        return {}
+    try:
+        with connection.cursor() as cur:
+            if driver == "categoria":
+                cur.execute(_SQL_MAPEO)
+                mapeo = defaultdict(set)
+                for id_gasto, id_categoria in cur.fetchall():
+                    mapeo[id_gasto].add(id_categoria)
+                return {"mapeo": dict(mapeo)}
+            cur.execute(_SQL_PESOS)
+            pesos = {id_categoria: Decimal(p) for id_categoria, p in cur.fetchall()}
+    except DatabaseError as e:
+        raise ValueError(f"El driver '{driver}' requiere bd/migracion_prorrateo_gastos.sql.") from e
+    if not pesos:
+        raise ValueError("prorrateo_pesos no tiene pesos configurados.")
+    return {"pesos": pesos}
+
+
+def repartir_mes(segmentos: list[tuple], gastos: list[tuple], driver: str, config: dict) -> dict:
+    """
+    segmentos: [((id_tipo_cliente, id_tipo_transaccion, id_categoria), venta, costo, unidades)]
+    gastos:    [(id_categoria_gastos, monto)]
+    -> {segmento: centavos asignados}
+    """
+    if not segmentos or not gastos:
+        return {}
+    claves = [s[0] for s in segmentos]
+    ventas = [Decimal(s[1] or 0) for s in segmentos]
+    total_centavos = sum(_centavos(m or 0) for _, m in gastos)
+
+    # (centavos, pesos) a repartir; "categoria" arma un grupo por destino
+    grupos = []
+    if driver == "categoria":
+        por_destino = defaultdict(int)
+        for id_gasto, monto in gastos:
+            por_destino[frozenset(config["mapeo"].get(id_gasto, ()))] += _centavos(monto or 0)
+        for destino, centavos in por_destino.items():
+            pesos = [v if not destino or k[2] in destino else 0 for k, v in zip(claves, ventas)]
+            grupos.append((centavos, pesos))
+    elif driver == "pesos":
+        venta_categoria = defaultdict(Decimal)
+        for k, v in zip(claves, ventas):
+            venta_categoria[k[2]] += v
+        pesos = [
+            config["pesos"].get(k[2], 0) * v / venta_categoria[k[2]] if venta_categoria[k[2]] > 0 else 0
+            for k, v in zip(claves, ventas)
+        ]
+        grupos.append((total_centavos, pesos))
+    else:
+        columna = {"ventas": 1, "costo": 2, "unidades": 3}[driver]
+        grupos.append((total_centavos, [Decimal(s[columna] or 0) for s in segmentos]))
+
+    asignado = [0] * len(claves)
+    for centavos, pesos in grupos:
+        partes = _repartir(centavos, pesos) or _repartir(centavos, ventas)
+        if partes:
+            asignado = [a + p for a, p in zip(asignado, partes)]
+    return dict(zip(claves, asignado))
+
+
+def _calcular(meses: list[tuple], driver: str) -> dict:
+    config = _configuracion(driver)
+    param = json.dumps([[a, m] for a, m in meses])
+    segmentos, gastos = defaultdict(list), defaultdict(list)
+    with connection.cursor() as cur:
+        cur.execute(_SQL_SEGMENTOS_AGREGADO if usa_agregado() else _SQL_SEGMENTOS, [param])
+        for anio, mes, tc, tt, cat, venta, costo, unidades in cur.fetchall():
+            segmentos[(anio, mes)].append(((tc, tt, cat), venta, costo, unidades))
+        cur.execute(_SQL_GASTOS, [param])
+        for anio, mes, id_gasto, monto in cur.fetchall():
+            gastos[(anio, mes)].append((id_gasto, monto))
+    return {
+        (anio, mes, driver): repartir_mes(segmentos[(anio, mes)], gastos[(anio, mes)], driver, config)
+        for anio, mes in meses
+    }
+
+
+def asignaciones(meses, driver: str) -> dict:
+    """
+    {(anio, mes): {(id_tipo_cliente, id_tipo_transaccion, id_categoria): Decimal}}
+    para `meses` [(anio, mes)]. ValueError si el driver no existe o le falta configuración.
+    """
+    if driver not in DRIVERS:
+        raise ValueError(f"driver inválido. Valores: {list(DRIVERS)}")
+    claves = [(int(a), int(m), driver) for a, m in sorted(set(meses))]
+    if not claves:
+        return {}
+    ttl = getattr(settings, "RENTABILIDAD_TTL", 3600)
+    calcular = lambda faltan: _calcular([(a, m) for a, m, _ in faltan], driver)
+    if usa_agregado():
+        # "agregado" en la clave: no se mezclan con las calculadas sobre los hechos
+        valores = cacheados("prorrateo:agregado", TABLAS_DRIVER.get(driver, []), claves, calcular, ttl,
+                            tablas_de=lambda c: [tabla_mes(c[0], c[1])])
+    else:
+        valores = cacheados("prorrateo", TABLAS_PRORRATEO, claves, calcular, ttl)
+    return {
+        (a, m): {seg: Decimal(c).scaleb(-2) for seg, c in valores.get((a, m, d), {}).items()}
+        for a, m, d in claves
+    }
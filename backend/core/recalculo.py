@@ -0,0 +1,197 @@
+# core/recalculo.py
+"""
+Cola de recálculo de total_venta_final.
+
+Las vistas de detalle, el ETL y las operaciones masivas marcan las ventas
+afectadas con marcar_venta()/marcar_ventas(). Cada venta distinta se
+recalcula una sola vez, con un UPDATE por lote:
+  - dentro de recalculo_diferido(): al salir del bloque más externo, dentro
+    de la transacción que lo contiene (las vistas lo abren junto con su
+    atomic: si el recálculo falla, la escritura se deshace con él)
+  - fuera de él: de inmediato, en la transacción del que marca (si la hay)
+No hay recálculo "al confirmar": un callback de on_commit se pierde con un
+rollback y la cola es por hilo, así que nunca queda trabajo pendiente entre
+transacciones.
+"""
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache_datos import invalidar
+from .cuotas import generacion_suspendida, replanificar_cuotas_lote
+
+# ids por sentencia (OPENJSON no tiene el límite de 2100 parámetros)
+LOTE_RECALCULO = 10000
+
+_estado = threading.local()
+
+# total_venta_final = subtotal * (1 + interes/100); solo escribe (y solo
+# dispara trg_bitacora_ventas) en las ventas cuyo total cambia
+_SQL_RECALCULAR_TOTALES = """
+    SET NOCOUNT ON;
+    DECLARE @cambios TABLE (id_venta INT PRIMARY KEY);
+    UPDATE v
+    SET total_venta_final = n.total, fecha_modificacion = %s
+    OUTPUT inserted.id_venta INTO @cambios
+    FROM ventas v
+    JOIN OPENJSON(%s) WITH (id_venta INT '$') j ON j.id_venta = v.id_venta
+    CROSS APPLY (
+        SELECT CONVERT(DECIMAL(12,2), ROUND(ISNULL(SUM(d.subtotal), 0) * (1 + v.interes / 100.0), 2)) AS total
+        FROM detalle_ventas d
+        WHERE d.id_venta = v.id_venta
+    ) n
+    WHERE v.total_venta_final <> n.total;
+    SELECT id_venta FROM @cambios;
+"""
+
+
+def recalcular_totales(ids, lote: int = LOTE_RECALCULO) -> list[int]:
+    """
+    Recalcula los totales de `ids` (un UPDATE por lote). Devuelve las ventas
+    que cambiaron. El UPDATE directo no pasa por post_save: las cuotas de las
+    que cambian se re-planifican aquí, un lote a la vez.
+    """
+    ids = sorted({int(i) for i in ids if i is not None})
+    ahora = timezone.now()
+    cambiadas = []
+    for i in range(0, len(ids), lote):
+        with connection.cursor() as cur:
+            cur.execute(_SQL_RECALCULAR_TOTALES, [ahora, json.dumps(ids[i:i + lote])])
+            cambios = [r[0] for r in cur.fetchall()]
+        if cambios and not generacion_suspendida():
+            replanificar_cuotas_lote(cambios)
+        cambiadas.extend(cambios)
+    if cambiadas:
+        invalidar("ventas")
+    return cambiadas
+
+
+# ===== Conciliación: total guardado vs. total esperado desde detalle_ventas =====
+
+# keyset por id_venta: cada bloque se lee (y se repara) sin guardar la
+# lista completa de ventas con diferencia
+_SQL_DIFERENCIAS = """
+    SELECT TOP (%s) v.id_venta, v.total_venta_final, n.total
+    FROM ventas v
+    CROSS APPLY (
+        SELECT CONVERT(DECIMAL(12,2), ROUND(ISNULL(SUM(d.subtotal), 0) * (1 + v.interes / 100.0), 2)) AS total
+        FROM detalle_ventas d
+        WHERE d.id_venta = v.id_venta
+    ) n
+    WHERE v.id_venta > %s AND v.total_venta_final <> n.total
+    ORDER BY v.id_venta
+"""
+
+
+def reconciliar_totales(reparar: bool = False, lote: int = LOTE_RECALCULO, muestra: int = 20) -> dict:
+    """
+    Compara total_venta_final con el total esperado de TODAS las ventas,
+    recorriéndolas por id en bloques de `lote` diferencias. Con `reparar`
+    cada bloque se corrige al leerlo con un UPDATE en su propia transacción.
+    Devuelve contadores, las `muestra` diferencias más grandes y el
+    rendimiento (ventas/s).
+    """
+    t0 = time.monotonic()
+    with connection.cursor() as cur:
+        cur.execute("SELECT COUNT_BIG(*) FROM ventas")
+        revisadas = int(cur.fetchone()[0])
+
+    peores = []
+    con_diferencia = reparadas = 0
+    diferencia_total = Decimal("0")
+    t_reparacion = 0.0
+    ultimo_id = 0
+    while True:
+        with connection.cursor() as cur:
+            cur.execute(_SQL_DIFERENCIAS, [lote, ultimo_id])
+            rows = cur.fetchall()
+        if not rows:
+            break
+        ultimo_id = rows[-1][0]
+        con_diferencia += len(rows)
+        for id_venta, guardado, esperado in rows:
+            dif = Decimal(esperado) - Decimal(guardado)
+            diferencia_total += abs(dif)
+            item = (abs(dif), -id_venta, (id_venta, guardado, esperado, dif))
+            if len(peores) < muestra:
+                heapq.heappush(peores, item)
+            elif muestra:
+                heapq.heappushpop(peores, item)
+        if reparar:
+            t1 = time.monotonic()
+            with transaction.atomic():
+                reparadas += len(recalcular_totales([r[0] for r in rows], lote=lote))
+            t_reparacion += time.monotonic() - t1
+        if len(rows) < lote:
+            break
+
+    segundos = time.monotonic() - t0
+    t_lectura = segundos - t_reparacion
+    return {
+        "revisadas": revisadas,
+        "con_diferencia": con_diferencia,
+        "diferencia_total": str(diferencia_total),
+        "reparadas": reparadas,
+        "muestra": [
+            {"id_venta": v, "guardado": str(g), "esperado": str(e), "diferencia": str(d)}
+            for _, _, (v, g, e, d) in sorted(peores, reverse=True)
+        ],
+        "segundos": round(segundos, 3),
+        "revisadas_por_seg": round(revisadas / t_lectura, 1) if t_lectura else None,
+        "reparadas_por_seg": round(reparadas / t_reparacion, 1) if reparadas and t_reparacion else None,
+    }
+
+
+def _pendientes() -> set:
+    if not hasattr(_estado, "pendientes"):
+        _estado.pendientes = set()
+    return _estado.pendientes
+
+
+def vaciar() -> list[int]:
+    """Recalcula las ventas pendientes de este hilo."""
+    ids, _estado.pendientes = _pendientes(), set()
+    return recalcular_totales(ids) if ids else []
+
+
+def marcar_ventas(ids):
+    """Encola ventas para recalcular su total (una vez por venta); fuera de recalculo_diferido() las recalcula ya."""
+    _pendientes().update(int(i) for i in ids if i is not None)
+    if getattr(_estado, "nivel", 0):
+        return  # lo vacía recalculo_diferido()
+    vaciar()
+
+
+def marcar_venta(id_venta: int):
+    marcar_ventas([id_venta])
+
+
+@contextmanager
+def recalculo_diferido():
+    """
+    Agrupa las marcas del bloque y recalcula cada venta una vez al salir,
+    en la transacción actual:
+
+        with transaction.atomic(), recalculo_diferido():
+            ...escrituras + marcar_venta(id)...
+
+    Si el bloque falla, las marcas se descartan (la transacción se deshace).
+    """
+    nivel = getattr(_estado, "nivel", 0)
+    _estado.nivel = nivel + 1
+    try:
+        yield
+    except BaseException:
+        _estado.nivel = nivel
+        if nivel == 0:
+            _estado.pendientes = set()
+        raise
+    _estado.nivel = nivel
+    if nivel == 0:
+        vaciar()
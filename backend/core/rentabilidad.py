@@ -0,0 +1,320 @@
+# core/rentabilidad.py
+"""
+Agregado mensual de rentabilidad (bd/migracion_agg_rentabilidad.sql).
+
+agg_rentabilidad_mensual guarda por (anio, mes, tipo_cliente,
+tipo_transaccion, categoria_producto) lo que fn_resumen_mensual recalcula
+en cada lectura desde los hechos: venta, costo y la suma/cantidad de días
+venta->pago (DSO), más las unidades (driver del prorrateo de gastos). El gasto se guarda por mes en agg_gastos_mensual y se
+prorratea al leer, sobre los segmentos filtrados, como hace la función.
+
+refrescar_rentabilidad() recalcula solo los meses tocados desde el último
+refresco (marcas en agg_rentabilidad_estado):
+  - bitácora de ventas (id_bitacora > marca): mes anterior y nuevo de cada
+    venta insertada, modificada o borrada; cubre el ETL y los cambios de
+    detalle que mueven el total
+  - detalle_ventas y pagos nuevos (id > marca) o modificados (fecha_modificacion)
+  - clientes y productos modificados (pueden cambiar de tipo/categoría)
+agg_gastos_mensual se regenera entero (un GROUP BY sobre gastos, que es chico).
+Un id se asigna al insertar pero la fila se ve al confirmar: las marcas de
+id se releen con MARGEN_IDS de holgura, como fecha_modificacion con
+MARGEN_MODIFICACION, para no perder filas confirmadas después de leer MAX(id).
+Lo llaman el ETL al terminar y `manage.py rentabilidad_refrescar`
+(programado); la lectura (/rentabilidad/) solo lee el agregado.
+Un borrado que no pasa por la bitácora (pagos, detalle sin cambio de total)
+solo lo toma un refresco completo.
+"""
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cobranza import usa_cobranza
+
+# holgura para cambios confirmados mientras corría el refresco anterior
+MARGEN_MODIFICACION = timedelta(minutes=5)
+# ids anteriores a la marca que se vuelven a revisar (mismo motivo); releer
+# de más solo puede marcar un mes que no cambió
+MARGEN_IDS = 10000
+
+
+def usa_agregado() -> bool:
+    return bool(getattr(settings, "RENTABILIDAD_AGREGADA", False))
+
+
+_SQL_ESTADO = """
+    SELECT ultimo_id_bitacora, ultimo_id_detalle, ultimo_id_pago, ultima_modificacion
+    FROM agg_rentabilidad_estado WITH (UPDLOCK, HOLDLOCK)
+    WHERE id = 1
+"""
+
+_SQL_MARCAS = """
+    SELECT
+        (SELECT ISNULL(MAX(id_bitacora), 0) FROM bitacora_ventas),
+        (SELECT ISNULL(MAX(id_detalle_venta), 0) FROM detalle_ventas),
+        (SELECT ISNULL(MAX(id_pago), 0) FROM pagos)
+"""
+
+# meses tocados entre las marcas anteriores menos MARGEN_IDS (exclusivas) y las nuevas (inclusivas)
+_SQL_MESES_TOCADOS = """
+    SELECT DISTINCT df.anio, df.mes
+    FROM (
+        SELECT TRY_CAST(JSON_VALUE(b.datos_anteriores, '$.id_fecha') AS INT) AS id_fecha
+        FROM bitacora_ventas b WHERE b.id_bitacora > %s AND b.id_bitacora <= %s
+        UNION
+        SELECT TRY_CAST(JSON_VALUE(b.datos_nuevos, '$.id_fecha') AS INT)
+        FROM bitacora_ventas b WHERE b.id_bitacora > %s AND b.id_bitacora <= %s
+        UNION
+        SELECT v.id_fecha
+        FROM detalle_ventas d JOIN ventas v ON v.id_venta = d.id_venta
+        WHERE (d.id_detalle_venta > %s AND d.id_detalle_venta <= %s) OR d.fecha_modificacion >= %s
+        UNION
+        SELECT v.id_fecha
+        FROM pagos p JOIN ventas v ON v.id_venta = p.id_venta
+        WHERE (p.id_pago > %s AND p.id_pago <= %s) OR p.fecha_modificacion >= %s
+        UNION
+        SELECT v.id_fecha
+        FROM clientes c JOIN ventas v ON v.id_cliente = c.id_cliente
+        WHERE c.fecha_modificacion >= %s
+        UNION
+        SELECT v.id_fecha
+        FROM productos p
+        JOIN detalle_ventas d ON d.id_producto = p.id_producto
+        JOIN ventas v ON v.id_venta = d.id_venta
+        WHERE p.fecha_modificacion >= %s
+    ) t
+    JOIN dim_fecha df ON df.id_fecha = t.id_fecha
+"""
+
+_SQL_TODOS_LOS_MESES = """
+    SELECT DISTINCT df.anio, df.mes
+    FROM ventas v JOIN dim_fecha df ON df.id_fecha = v.id_fecha
+    UNION
+    SELECT anio, mes FROM agg_rentabilidad_mensual
+"""
+
+# DSO por venta-categoría: un renglón por pago, o con COBRANZA_VENTAS los
+# días y pagos ya sumados por venta en cobranza_ventas (mismo resultado)
+_DSO_PAGOS = """
+        SELECT vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion, vc.id_categoria_producto,
+               SUM(CAST(DATEDIFF(DAY, vm.fecha, fp.fecha) AS BIGINT)) AS dso_suma_dias,
+               COUNT(*) AS dso_pagos
+        FROM ventas_mes vm
+        JOIN ventas_categorias vc ON vc.id_venta = vm.id_venta
+        JOIN pagos p              ON p.id_venta = vm.id_venta
+        JOIN dim_fecha fp         ON fp.id_fecha = p.id_fecha
+        GROUP BY vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion, vc.id_categoria_producto"""
+
+_DSO_COBRANZA = """
+        SELECT vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion, vc.id_categoria_producto,
+               SUM(CAST(cv.dias_suma AS BIGINT)) AS dso_suma_dias,
+               SUM(cv.pagos) AS dso_pagos
+        FROM ventas_mes vm
+        JOIN ventas_categorias vc ON vc.id_venta = vm.id_venta
+        JOIN cobranza_ventas cv   ON cv.id_venta = vm.id_venta
+        GROUP BY vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion, vc.id_categoria_producto"""
+
+# mismas definiciones que fn_resumen_mensual (base, ventas_categorias, dso_segmento)
+_SQL_REFRESCAR_MESES = """
+    SET NOCOUNT ON;
+    DECLARE @meses TABLE (anio INT NOT NULL, mes INT NOT NULL, PRIMARY KEY (anio, mes));
+    INSERT INTO @meses (anio, mes)
+    SELECT anio, mes FROM OPENJSON(%s) WITH (anio INT '$[0]', mes INT '$[1]');
+
+    DELETE a
+    FROM agg_rentabilidad_mensual a
+    JOIN @meses m ON m.anio = a.anio AND m.mes = a.mes;
+
+    WITH ventas_mes AS (
+        SELECT v.id_venta, v.id_tipo_transaccion, cl.id_tipo_cliente, df.anio, df.mes, df.fecha
+        FROM ventas v
+        JOIN dim_fecha df ON df.id_fecha = v.id_fecha
+        JOIN @meses m     ON m.anio = df.anio AND m.mes = df.mes
+        JOIN clientes cl  ON cl.id_cliente = v.id_cliente
+    ),
+    base AS (
+        SELECT vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion,
+               pr.id_categoria AS id_categoria_producto,
+               SUM(dv.cantidad * dv.precio_unitario)      AS total_venta,
+               SUM(dv.cantidad * dv.costo_unitario_venta) AS total_costo,
+               SUM(dv.cantidad)                           AS total_unidades
+        FROM ventas_mes vm
+        JOIN detalle_ventas dv ON dv.id_venta = vm.id_venta
+        JOIN productos pr      ON pr.id_producto = dv.id_producto
+        GROUP BY vm.anio, vm.mes, vm.id_tipo_cliente, vm.id_tipo_transaccion, pr.id_categoria
+    ),
+    ventas_categorias AS (
+        SELECT DISTINCT dv.id_venta, pr.id_categoria AS id_categoria_producto
+        FROM ventas_mes vm
+        JOIN detalle_ventas dv ON dv.id_venta = vm.id_venta
+        JOIN productos pr      ON pr.id_producto = dv.id_producto
+    ),
+    dso AS ({dso}
+    )
+    INSERT INTO agg_rentabilidad_mensual
+        (anio, mes, id_tipo_cliente, id_tipo_transaccion, id_categoria_producto,
+         total_venta, total_costo, total_unidades, dso_suma_dias, dso_pagos, fecha_actualizacion)
+    SELECT b.anio, b.mes, b.id_tipo_cliente, b.id_tipo_transaccion, b.id_categoria_producto,
+           b.total_venta, b.total_costo, b.total_unidades, ISNULL(d.dso_suma_dias, 0), ISNULL(d.dso_pagos, 0), GETDATE()
+    FROM base b
+    LEFT JOIN dso d
+      ON d.anio = b.anio AND d.mes = b.mes
+     AND d.id_tipo_cliente = b.id_tipo_cliente
+     AND d.id_tipo_transaccion = b.id_tipo_transaccion
+     AND d.id_categoria_producto = b.id_categoria_producto;
+
+    SELECT @@ROWCOUNT;
+"""
+
+_SQL_REFRESCAR_GASTOS = """
+    MERGE agg_gastos_mensual AS t
+    USING (
+        SELECT df.anio, df.mes, SUM(g.monto_gasto) AS total_gasto
+        FROM gastos g
+        JOIN dim_fecha df ON df.id_fecha = g.id_fecha
+        GROUP BY df.anio, df.mes
+    ) AS s
+    ON t.anio = s.anio AND t.mes = s.mes
+    WHEN MATCHED AND t.total_gasto <> s.total_gasto THEN
+        UPDATE SET total_gasto = s.total_gasto, fecha_actualizacion = GETDATE()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (anio, mes, total_gasto, fecha_actualizacion) VALUES (s.anio, s.mes, s.total_gasto, GETDATE())
+    WHEN NOT MATCHED BY SOURCE THEN
+        DELETE
+    OUTPUT ISNULL(inserted.anio, deleted.anio), ISNULL(inserted.mes, deleted.mes);
+"""
+
+_SQL_GUARDAR_ESTADO = """
+    UPDATE agg_rentabilidad_estado
+    SET ultimo_id_bitacora = %s, ultimo_id_detalle = %s, ultimo_id_pago = %s,
+        ultima_modificacion = %s, fecha_refresco = %s, meses_refrescados = %s
+    WHERE id = 1
+"""
+
+# mismas columnas (y prorrateo de gastos) que fn_resumen_mensual, leyendo el agregado
+SQL_RESUMEN_AGREGADO = """
+    SET NOCOUNT ON;
+    DECLARE @desde DATE = %s, @hasta DATE = %s, @id_tipo_cliente INT = %s,
+            @id_tipo_transaccion INT = %s, @id_categoria_producto INT = %s;
+
+    WITH rango AS (
+        SELECT ISNULL(@desde, (SELECT MIN(fecha) FROM dim_fecha)) AS f_ini,
+               ISNULL(@hasta, (SELECT MAX(fecha) FROM dim_fecha)) AS f_fin
+    ),
+    meses AS (
+        SELECT DISTINCT df.anio, df.mes
+        FROM dim_fecha df CROSS JOIN rango r
+        WHERE df.fecha BETWEEN r.f_ini AND r.f_fin
+    ),
+    base AS (
+        SELECT a.*
+        FROM agg_rentabilidad_mensual a
+        JOIN meses m ON m.anio = a.anio AND m.mes = a.mes
+        WHERE (@id_tipo_cliente       IS NULL OR a.id_tipo_cliente       = @id_tipo_cliente)
+          AND (@id_tipo_transaccion   IS NULL OR a.id_tipo_transaccion   = @id_tipo_transaccion)
+          AND (@id_categoria_producto IS NULL OR a.id_categoria_producto = @id_categoria_producto)
+    ),
+    ventas_periodo AS (
+        SELECT anio, mes, SUM(total_venta) AS total_venta_periodo
+        FROM base
+        GROUP BY anio, mes
+    )
+    SELECT
+        m.anio,
+        m.mes,
+        DATEFROMPARTS(m.anio, m.mes, 1) AS mes_inicio,
+        b.id_tipo_cliente,
+        ISNULL(tc.nombre_tipo_cliente, 'N/A'),
+        b.id_tipo_transaccion,
+        ISNULL(tt.nombre_tipo_transaccion, 'N/A'),
+        b.id_categoria_producto,
+        ISNULL(cp.nombre_categoria, 'N/A'),
+        ISNULL(b.total_venta, 0),
+        ISNULL(b.total_costo, 0),
+        ISNULL(b.total_venta, 0) - ISNULL(b.total_costo, 0),
+        CONVERT(DECIMAL(12,2), ISNULL(g.total_gasto, 0) * ISNULL(p.pct, 0)),
+        CONVERT(DECIMAL(12,2),
+            (ISNULL(b.total_venta, 0) - ISNULL(b.total_costo, 0))
+            - (ISNULL(g.total_gasto, 0) * ISNULL(p.pct, 0))
+        ),
+        b.dso_suma_dias * 1.0 / NULLIF(b.dso_pagos, 0)
+    FROM meses m
+    LEFT JOIN base b
+      ON b.anio = m.anio AND b.mes = m.mes
+    LEFT JOIN ventas_periodo vp
+      ON vp.anio = b.anio AND vp.mes = b.mes
+    OUTER APPLY (
+        SELECT CAST(b.total_venta AS DECIMAL(18,6)) / NULLIF(CAST(vp.total_venta_periodo AS DECIMAL(18,6)), 0) AS pct
+    ) p
+    LEFT JOIN agg_gastos_mensual g       ON g.anio = m.anio AND g.mes = m.mes
+    LEFT JOIN tipo_clientes tc           ON tc.id_tipo_cliente = b.id_tipo_cliente
+    LEFT JOIN tipo_transacciones tt      ON tt.id_tipo_transaccion = b.id_tipo_transaccion
+    LEFT JOIN categoria_productos cp     ON cp.id_categoria = b.id_categoria_producto
+    ORDER BY m.anio, m.mes, b.id_tipo_cliente, b.id_tipo_transaccion, b.id_categoria_producto;
+"""
+
+
+def tabla_mes(anio: int, mes: int) -> str:
+    """Nombre de versión (cache_datos) de un mes del agregado: cambia cuando el refresco toca ese mes o sus gastos."""
+    return f"agg_rentabilidad_mensual:{int(anio)}-{int(mes)}"
+
+
+def refrescar_rentabilidad(completo: bool = False) -> dict:
+    """
+    Recalcula en el agregado los meses tocados desde el último refresco
+    (todos con `completo`, o si nunca se refrescó). Una transacción; dos
+    refrescos simultáneos se serializan sobre la fila de estado.
+    """
+    t0 = time.monotonic()
+    # fecha_modificacion la escribe el ORM en UTC sin zona
+    ahora = timezone.now().replace(tzinfo=None)
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(_SQL_ESTADO)
+            id_bit, id_det, id_pag, ultima_mod = cur.fetchone()
+            cur.execute(_SQL_MARCAS)
+            n_bit, n_det, n_pag = cur.fetchone()
+
+            if completo or ultima_mod is None:
+                cur.execute(_SQL_TODOS_LOS_MESES)
+            else:
+                desde_mod = ultima_mod - MARGEN_MODIFICACION
+                desde_bit, desde_det, desde_pag = (max(int(i or 0) - MARGEN_IDS, 0) for i in (id_bit, id_det, id_pag))
+                cur.execute(_SQL_MESES_TOCADOS, [
+                    desde_bit, n_bit, desde_bit, n_bit,
+                    desde_det, n_det, desde_mod,
+                    desde_pag, n_pag, desde_mod,
+                    desde_mod,
+                    desde_mod,
+                ])
+            meses = sorted({(int(a), int(m)) for a, m in cur.fetchall()})
+
+            filas = 0
+            if meses:
+                dso = _DSO_COBRANZA if usa_cobranza() else _DSO_PAGOS
+                cur.execute(_SQL_REFRESCAR_MESES.format(dso=dso), [json.dumps(meses)])
+                filas = int(cur.fetchone()[0] or 0)
+            cur.execute(_SQL_REFRESCAR_GASTOS)
+            meses_gasto = {(int(a), int(m)) for a, m in cur.fetchall()}
+            cur.execute(_SQL_GUARDAR_ESTADO, [n_bit, n_det, n_pag, ahora, ahora, len(meses)])
+
+    cambiados = set(meses) | meses_gasto
+    if cambiados:
+        from .cache_datos import invalidar
+        invalidar("agg_rentabilidad_mensual", *(tabla_mes(a, m) for a, m in cambiados))
+    return {
+        "meses": len(meses),
+        "filas": filas,
+        "completo": bool(completo or ultima_mod is None),
+        "segundos": round(time.monotonic() - t0, 3),
+    }
+
+
+def leer_resumen_agregado(filtros: tuple) -> list[tuple]:
+    """Filas con las columnas de fn_resumen_mensual leídas del agregado (filtros normalizados)."""
+    with connection.cursor() as cur:
+        cur.execute(SQL_RESUMEN_AGREGADO, list(filtros))
+        return cur.fetchall()
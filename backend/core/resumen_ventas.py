@@ -0,0 +1,105 @@
+# core/resumen_ventas.py
+"""
+Totales mensuales de ventas (/ventas/totales-mes/).
+
+Con RESUMEN_VENTAS_MENSUAL=True se leen de resumen_ventas_mensual
+(bd/migracion_resumen_ventas_mensual.sql): una fila por (anio, mes,
+tipo_cliente, tipo_transaccion) que los triggers de ventas y clientes
+mantienen con deltas en cada escritura (vistas, recálculo de totales, ETL).
+Los filtros de fechas y segmento caen sobre la pk del resumen, así que
+no cuestan un recorrido de ventas. Sin la migración se agrupa desde ventas
+con el mismo SQL.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cuotas import TIPO_CREDITO
+
+# mismas columnas que el resumen, calculadas desde los hechos
+_SQL_FUENTE_HECHOS = """
+    SELECT df.anio, df.mes, c.id_tipo_cliente, v.id_tipo_transaccion,
+           v.total_venta_final AS total, 1 AS ventas
+    FROM ventas v
+    JOIN dim_fecha df ON df.id_fecha = v.id_fecha
+    JOIN clientes c   ON c.id_cliente = v.id_cliente
+"""
+
+_SQL_FUENTE_RESUMEN = """
+    SELECT anio, mes, id_tipo_cliente, id_tipo_transaccion, total, ventas
+    FROM resumen_ventas_mensual
+"""
+
+_SQL_DIFERENCIAS = f"""
+    SELECT COUNT(*)
+    FROM (
+        SELECT anio, mes, id_tipo_cliente, id_tipo_transaccion, SUM(total) AS total, SUM(ventas) AS ventas
+        FROM ({_SQL_FUENTE_HECHOS}) h
+        GROUP BY anio, mes, id_tipo_cliente, id_tipo_transaccion
+    ) h
+    FULL JOIN resumen_ventas_mensual r
+      ON r.anio = h.anio AND r.mes = h.mes
+     AND r.id_tipo_cliente = h.id_tipo_cliente AND r.id_tipo_transaccion = h.id_tipo_transaccion
+    WHERE h.anio IS NULL OR r.anio IS NULL OR r.total <> h.total OR r.ventas <> h.ventas
+"""
+
+_SQL_RECONSTRUIR = f"""
+    DELETE FROM resumen_ventas_mensual;
+    INSERT INTO resumen_ventas_mensual (anio, mes, id_tipo_cliente, id_tipo_transaccion, total, ventas)
+    SELECT anio, mes, id_tipo_cliente, id_tipo_transaccion, SUM(total), SUM(ventas)
+    FROM ({_SQL_FUENTE_HECHOS}) h
+    GROUP BY anio, mes, id_tipo_cliente, id_tipo_transaccion;
+"""
+
+
+def usa_resumen() -> bool:
+    return bool(getattr(settings, "RESUMEN_VENTAS_MENSUAL", False))
+
+
+def totales_mes(desde: tuple[int, int] | None = None, hasta: tuple[int, int] | None = None,
+                id_tipo_cliente: int | None = None, id_tipo_transaccion: int | None = None,
+                por_tipo_cliente: bool = False) -> list[tuple]:
+    """
+    Filas (anio, mes[, id_tipo_cliente], total, ventas, total_credito, ventas_credito)
+    ordenadas por mes. desde/hasta: (anio, mes) inclusivos.
+    """
+    where, params = [], []
+    if desde:
+        where.append("(anio > %s OR (anio = %s AND mes >= %s))")
+        params += [desde[0], desde[0], desde[1]]
+    if hasta:
+        where.append("(anio < %s OR (anio = %s AND mes <= %s))")
+        params += [hasta[0], hasta[0], hasta[1]]
+    if id_tipo_cliente is not None:
+        where.append("id_tipo_cliente = %s")
+        params.append(id_tipo_cliente)
+    if id_tipo_transaccion is not None:
+        where.append("id_tipo_transaccion = %s")
+        params.append(id_tipo_transaccion)
+    where_sql = " WHERE " + " AND ".join(where) if where else ""
+    grupo = "anio, mes, id_tipo_cliente" if por_tipo_cliente else "anio, mes"
+    fuente = _SQL_FUENTE_RESUMEN if usa_resumen() else _SQL_FUENTE_HECHOS
+
+    with connection.cursor() as cur:
+        cur.execute(f"""
+            SELECT {grupo},
+                   CONVERT(DECIMAL(12,2), SUM(total)) AS total,
+                   SUM(ventas) AS ventas,
+                   CONVERT(DECIMAL(12,2), SUM(CASE WHEN id_tipo_transaccion = %s THEN total ELSE 0 END)),
+                   SUM(CASE WHEN id_tipo_transaccion = %s THEN ventas ELSE 0 END)
+            FROM ({fuente}) s
+            {where_sql}
+            GROUP BY {grupo}
+            ORDER BY {grupo}
+        """, [TIPO_CREDITO, TIPO_CREDITO] + params)
+        return cur.fetchall()
+
+
+def reconstruir_resumen_ventas(reparar: bool = False) -> dict:
+    """Compara el resumen con ventas; con `reparar` lo regenera si hay diferencias."""
+    with connection.cursor() as cur:
+        cur.execute(_SQL_DIFERENCIAS)
+        diferencias = int(cur.fetchone()[0])
+    if reparar and diferencias:
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute(_SQL_RECONSTRUIR)
+    return {"diferencias": diferencias, "reconstruido": bool(reparar and diferencias)}
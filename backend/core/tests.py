@@ -1,3 +1,780 @@
-from django.test import TestCase
+import json
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.db import DatabaseError, DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import cache_datos, prorrateo, recalculo, rentabilidad
+from .cache_datos import cacheado, invalidar, versiones
+from .checks import revisar_cache_datos
+from .cubo import CuboRentabilidad, np
+from .cuotas import TIPO_CREDITO, cotizar_plazos, diff_cuotas, montos_cuotas
+from .fechas import dim_fecha_cache, fecha_smart, id_fecha_smart
+from .models import (CategoriaProducto, Cliente, CuotaCredito, DetalleVenta, DimFecha, Pago, PagoCuota,
+    Producto, TipoCliente, TipoTransaccion, Venta)
+from .paginacion import CursorInvalido, codificar_cursor, decodificar_cursor, q_keyset, sql_keyset
+from .prorrateo import _repartir, asignaciones, repartir_mes
+from .recalculo import marcar_venta, marcar_ventas, recalculo_diferido
+from .rentabilidad import refrescar_rentabilidad, tabla_mes
+from .validacion import ValidadorFK, validador_de
+from .views_rentabilidad import rentabilidad_mensual
+from .views_ventas import _anotar_resumen, detalle_ventas_bulk, ventas_cotizar, ventas_crear_completa
+
+
+class FechaSmartTests(SimpleTestCase):
+    def test_ida_y_vuelta(self):
+        for f in (date(2025, 1, 31), date(2024, 2, 29), date(1999, 12, 1)):
+            self.assertEqual(fecha_smart(id_fecha_smart(f)), f)
+        self.assertEqual(id_fecha_smart(date(2025, 1, 31)), 20250131)
+
+    def test_clave_invalida(self):
+        self.assertIsNone(fecha_smart(20250230))
+        self.assertIsNone(fecha_smart(20251301))
+        self.assertIsNone(fecha_smart(0))
+
+
+def _ids_smart(fechas):
+    return {f: id_fecha_smart(f) for f in fechas}
+
+
+@mock.patch.object(dim_fecha_cache, "ids_de", side_effect=_ids_smart)
+class DiffCuotasTests(SimpleTestCase):
+    base = date(2025, 1, 31)
+
+    def test_plan_nuevo(self, _):
+        deseado = diff_cuotas([], 2, 3, Decimal("100.00"), self.base)
+        self.assertEqual(deseado, {
+            1: (20250228, Decimal("33.34")),
+            2: (20250331, Decimal("33.33")),
+            3: (20250430, Decimal("33.33")),
+        })
+
+    def test_sin_cambios(self, _):
+        actuales = [(1, 20250228, Decimal("33.34"), 0), (2, 20250331, Decimal("33.33"), 0),
+                    (3, 20250430, Decimal("33.33"), 0)]
+        self.assertIsNone(diff_cuotas(actuales, 2, 3, Decimal("100.00"), self.base))
+
+    def test_conserva_cuotas_pagadas(self, _):
+        actuales = [(1, 20250228, Decimal("33.34"), 1), (2, 20250331, Decimal("33.33"), 0),
+                    (3, 20250430, Decimal("33.33"), 0)]
+        deseado = diff_cuotas(actuales, 2, 3, Decimal("120.00"), self.base)
+        self.assertEqual(deseado, {2: (20250331, Decimal("43.33")), 3: (20250430, Decimal("43.33"))})
+
+    def test_contado_elimina_libres(self, _):
+        actuales = [(1, 20250228, Decimal("50.00"), 1), (2, 20250331, Decimal("50.00"), 0)]
+        self.assertEqual(diff_cuotas(actuales, 1, 0, Decimal("100.00"), self.base), {})
+        self.assertIsNone(diff_cuotas([], 1, 0, Decimal("100.00"), self.base))
+
+
+class MontosCuotasTests(SimpleTestCase):
+    def test_resto_en_las_primeras_cuotas(self):
+        montos = montos_cuotas(Decimal("100.00"), 3)
+        self.assertEqual(montos, [Decimal("33.34"), Decimal("33.33"), Decimal("33.33")])
+        self.assertEqual(sum(montos), Decimal("100.00"))
+
+    def test_menos_centavos_que_cuotas(self):
+        self.assertEqual(montos_cuotas(Decimal("0.02"), 3), [Decimal("0.01"), Decimal("0.01"), Decimal("0.00")])
+
+    def test_sin_plazo_o_total(self):
+        self.assertEqual(montos_cuotas(Decimal("100"), 0), [])
+        self.assertEqual(montos_cuotas(Decimal("0"), 3), [])
+
+
+@mock.patch.object(dim_fecha_cache, "ids_de", side_effect=_ids_smart)
+class PlanLegadoTests(SimpleTestCase):
+    # planes generados con total/plazo redondeado en todas las cuotas
+    base = date(2025, 1, 31)
+    legado = [(1, 20250228, Decimal("33.33"), 0), (2, 20250331, Decimal("33.33"), 0),
+              (3, 20250430, Decimal("33.33"), 0)]
+
+    def test_no_se_reescribe(self, _):
+        self.assertIsNone(diff_cuotas(self.legado, 2, 3, Decimal("100.00"), self.base))
+
+    def test_cambio_real_usa_el_reparto_nuevo(self, _):
+        deseado = diff_cuotas(self.legado, 2, 3, Decimal("101.00"), self.base)
+        self.assertEqual([m for _, m in deseado.values()], [Decimal("33.67"), Decimal("33.67"), Decimal("33.66")])
+
+
+class CotizarTests(SimpleTestCase):
+    def test_opciones(self):
+        r = cotizar_plazos(15, 100, date(2025, 1, 31), [6, 3])
+        self.assertEqual(r["total_venta_final"], "115.00")
+        self.assertEqual([o["plazo_mes"] for o in r["opciones"]], [3, 6])
+        tres = r["opciones"][0]
+        self.assertEqual(tres["cuota"], "38.33")
+        self.assertEqual([c["monto"] for c in tres["cuotas"]], ["38.34", "38.33", "38.33"])
+        self.assertEqual([c["fecha_venc"] for c in tres["cuotas"]], ["2025-02-28", "2025-03-31", "2025-04-30"])
+        for o in r["opciones"]:
+            self.assertEqual(sum(Decimal(c["monto"]) for c in o["cuotas"]), Decimal("115.00"))
+
+    def test_memoizado(self):
+        a = cotizar_plazos("15", "100", date(2025, 1, 31), [3])
+        b = cotizar_plazos(Decimal("15.00"), Decimal("100.00"), date(2025, 1, 31), (3,))
+        self.assertIs(a, b)
+
+    def test_plazos_vacio(self):
+        with self.assertRaises(ValueError):
+            cotizar_plazos(15, 100, date(2025, 1, 31), [0])
+
+    def test_fuera_de_decimal_12_2(self):
+        for subtotal in ("1e27", "10000000000", "9999999999.99"):
+            with self.assertRaises(ValueError):
+                cotizar_plazos(15, Decimal(subtotal), date(2025, 1, 31), [3])
+
+    def test_endpoint_subtotal_fuera_de_rango(self):
+        for subtotal in ("1e27", "NaN", "0"):
+            r = ventas_cotizar(RequestFactory().get("/ventas/cotizar/", {"id_cliente": 1, "subtotal": subtotal}))
+            self.assertEqual(r.status_code, 400)
+
+
+@mock.patch.object(recalculo, "recalcular_totales", return_value=[])
+class RecalculoDiferidoTests(SimpleTestCase):
+    def tearDown(self):
+        recalculo._estado.pendientes = set()
+
+    def test_fuera_del_bloque_recalcula_ya(self, recalcular):
+        marcar_venta(7)
+        recalcular.assert_called_once_with({7})
+
+    def test_una_vez_por_venta_al_salir_del_bloque_externo(self, recalcular):
+        with recalculo_diferido():
+            marcar_ventas([1, 2])
+            with recalculo_diferido():
+                marcar_ventas([2, 3])
+            recalcular.assert_not_called()
+        recalcular.assert_called_once_with({1, 2, 3})
+
+    def test_error_en_el_bloque_descarta_las_marcas(self, recalcular):
+        with self.assertRaises(RuntimeError):
+            with recalculo_diferido():
+                marcar_venta(1)
+                raise RuntimeError
+        recalcular.assert_not_called()
+        marcar_venta(2)
+        recalcular.assert_called_once_with({2})
+
+    def test_error_al_recalcular_no_deja_pendientes(self, recalcular):
+        recalcular.side_effect = [RuntimeError, []]
+        with self.assertRaises(RuntimeError):
+            marcar_venta(1)
+        marcar_venta(2)
+        self.assertEqual(recalcular.call_args_list, [mock.call({1}), mock.call({2})])
+
+
+BD = Path(__file__).resolve().parent.parent / "bd"
+_GO = re.compile(r"^\s*GO\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def ejecutar_script(nombre: str):
+    """Corre un script de bd/ lote por lote (separados por GO, como sqlcmd)."""
+    with connection.cursor() as cur:
+        for lote in _GO.split((BD / nombre).read_text(encoding="utf-8-sig")):
+            if lote.strip():
+                cur.execute(lote)
+
+
+def crear_tablas_core():
+    """
+    Los modelos de core no son administrados: la base de pruebas no tiene sus
+    tablas. En SQL Server salen de bd/schema_base.sql (triggers y columnas
+    computadas incluidas); en otros motores, de los modelos.
+    """
+    if connection.vendor == "microsoft":
+        ejecutar_script("schema_base.sql")
+        return
+    existentes = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for modelo in apps.get_app_config("core").get_models():
+            if not modelo._meta.managed and modelo._meta.db_table not in existentes:
+                editor.create_model(modelo)
+
+
+class DatosCore:
+    """Catálogos, un cliente, dos productos y cuatro fines de mes de 2025 en dim_fecha."""
+    fechas_base = (date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30))
+
+    @classmethod
+    def crear_datos(cls):
+        tipo_cliente = TipoCliente.objects.create(nombre_tipo_cliente="Minorista", tasa_interes_default=Decimal("15.00"))
+        cls.cliente = Cliente.objects.create(nombre_cliente="Ana", apellido_cliente="Pérez", id_tipo_cliente=tipo_cliente)
+        cls.contado = TipoTransaccion.objects.create(pk=1, nombre_tipo_transaccion="Contado")
+        cls.credito = TipoTransaccion.objects.create(pk=TIPO_CREDITO, nombre_tipo_transaccion="Crédito")
+        categoria = CategoriaProducto.objects.create(nombre_categoria="Muebles")
+        cls.producto = Producto.objects.create(nombre_producto="Silla", precio_unitario=Decimal("10.00"),
+                                               costo_unitario=Decimal("6.00"), id_categoria=categoria)
+        cls.producto2 = Producto.objects.create(nombre_producto="Mesa", precio_unitario=Decimal("25.50"),
+                                                costo_unitario=Decimal("15.00"), id_categoria=categoria)
+        cls.fechas = {
+            f: DimFecha.objects.create(fecha=f, anio=f.year, mes=f.month, trimestre=(f.month - 1) // 3 + 1,
+                                       semana_iso=f.isocalendar()[1], dia=f.day)
+            for f in cls.fechas_base
+        }
+
+    def venta(self, fecha=date(2025, 1, 31), credito=False, plazo=0, total=Decimal("0"), lineas=()):
+        v = Venta.objects.create(
+            id_cliente=self.cliente, id_tipo_transaccion=self.credito if credito else self.contado,
+            id_fecha=self.fechas[fecha], plazo_mes=plazo, total_venta_final=total,
+            fecha_creacion=timezone.now(), usuario_creacion="test",
+        )
+        for producto, cantidad in lineas:
+            DetalleVenta.objects.create(
+                id_venta=v, id_producto=producto, cantidad=Decimal(cantidad), precio_unitario=producto.precio_unitario,
+                costo_unitario_venta=producto.costo_unitario, fecha_creacion=timezone.now(), usuario_creacion="test",
+            )
+        return v
+
+
+class TablasCoreTestCase(DatosCore, TestCase):
+    """TestCase sobre las tablas de core (creadas una vez por proceso) con DatosCore."""
+    _tablas_creadas = False
+
+    @classmethod
+    def setUpClass(cls):
+        if not TablasCoreTestCase._tablas_creadas:
+            crear_tablas_core()
+            TablasCoreTestCase._tablas_creadas = True
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.crear_datos()
+
+    def setUp(self):
+        dim_fecha_cache.invalidar()
+
+
+def _post_json(vista, payload, *args):
+    r = vista(RequestFactory().post("/", json.dumps(payload), content_type="application/json"), *args)
+    return r.status_code, json.loads(r.content)
+
+
+class DetalleBulkTests(TablasCoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.v = self.venta(lineas=[(self.producto, "2"), (self.producto2, "1")])
+        self.det2 = DetalleVenta.objects.get(id_venta=self.v, id_producto=self.producto2)
+        self.producto3 = Producto.objects.create(nombre_producto="Banco", precio_unitario=Decimal("7.25"),
+                                                 costo_unitario=Decimal("4.00"), id_categoria=self.producto.id_categoria)
+
+    def _cantidades(self):
+        return dict(DetalleVenta.objects.filter(id_venta=self.v).values_list("id_producto_id", "cantidad"))
+
+    def test_item_invalido_no_escribe_nada(self):
+        antes = self._cantidades()
+        status, body = _post_json(detalle_ventas_bulk, {
+            "upserts": [{"id_producto": self.producto.pk, "cantidad": 5}, {"id_producto": 999999, "cantidad": 1}],
+            "deletes": [self.det2.pk],
+        }, self.v.pk)
+        self.assertEqual(status, 400)
+        self.assertEqual([r["status"] for r in body["resultados"]], ["omitido", "error", "omitido"])
+        self.assertEqual(self._cantidades(), antes)
+
+    def test_borrar_item_de_otra_venta(self):
+        otro = DetalleVenta.objects.get(id_venta=self.venta(lineas=[(self.producto, "1")]))
+        status, _ = _post_json(detalle_ventas_bulk, {"deletes": [otro.pk]}, self.v.pk)
+        self.assertEqual(status, 400)
+        self.assertTrue(DetalleVenta.objects.filter(pk=otro.pk).exists())
+
+    @mock.patch.object(recalculo, "recalcular_totales", return_value=[])
+    def test_aplica_todo_y_recalcula_una_vez(self, recalcular):
+        status, body = _post_json(detalle_ventas_bulk, {
+            "upserts": [{"id_producto": self.producto.pk, "cantidad": "5"},
+                        {"id_producto": self.producto3.pk, "cantidad": "3"}],
+            "deletes": [self.det2.pk],
+        }, self.v.pk)
+        self.assertEqual(status, 200)
+        self.assertEqual((body["creados"], body["actualizados"], body["eliminados"]), (1, 1, 1))
+        self.assertEqual(body["resultados"][1]["subtotal"], "21.75")
+        self.assertEqual(self._cantidades(), {self.producto.pk: Decimal("5"), self.producto3.pk: Decimal("3")})
+        recalcular.assert_called_once_with({self.v.pk})
+
+
+class VentaCompletaTests(TablasCoreTestCase):
+    def _payload(self, detalle, **extra):
+        return {"id_cliente": self.cliente.pk, "id_tipo_transaccion": 1,
+                "id_fecha": self.fechas[date(2025, 1, 31)].pk, "detalle": detalle, **extra}
+
+    def test_contado(self):
+        status, body = _post_json(ventas_crear_completa, self._payload(
+            [{"id_producto": self.producto.pk, "cantidad": 2}, {"id_producto": self.producto2.pk, "cantidad": 1}]))
+        self.assertEqual(status, 201)
+        self.assertEqual((body["subtotal"], body["total_venta_final"], body["cuotas"]), ("45.50", "45.50", 0))
+        v = Venta.objects.get(pk=body["id_venta"])
+        self.assertEqual(v.total_venta_final, Decimal("45.50"))
+        self.assertEqual(DetalleVenta.objects.filter(id_venta=v).count(), 2)
+
+    def test_fecha_iso(self):
+        payload = self._payload([{"id_producto": self.producto.pk, "cantidad": 1}], fecha="2025-02-28")
+        del payload["id_fecha"]
+        status, body = _post_json(ventas_crear_completa, payload)
+        self.assertEqual(status, 201)
+        self.assertEqual(Venta.objects.get(pk=body["id_venta"]).id_fecha_id, self.fechas[date(2025, 2, 28)].pk)
+
+    def test_detalle_invalido_no_crea_nada(self):
+        status, body = _post_json(ventas_crear_completa, self._payload([
+            {"id_producto": self.producto.pk, "cantidad": 1},
+            {"id_producto": 999999, "cantidad": 1},
+            {"id_producto": self.producto.pk, "cantidad": 2},
+            {"id_producto": self.producto2.pk, "cantidad": 0},
+        ]))
+        self.assertEqual(status, 400)
+        self.assertEqual([e["indice"] for e in body["errores"]], [0, 1, 2, 3])
+        self.assertFalse(Venta.objects.exists())
+
+    def test_credito_sin_plazo(self):
+        status, _ = _post_json(ventas_crear_completa, self._payload(
+            [{"id_producto": self.producto.pk, "cantidad": 1}], id_tipo_transaccion=TIPO_CREDITO, plazo_mes=5))
+        self.assertEqual(status, 400)
+        self.assertFalse(Venta.objects.exists())
+
+    @skipUnless(connection.vendor == "microsoft", "generar_cuotas usa OPENJSON (SQL Server)")
+    def test_credito_genera_cuotas(self):
+        status, body = _post_json(ventas_crear_completa, self._payload(
+            [{"id_producto": self.producto.pk, "cantidad": 10}], id_tipo_transaccion=TIPO_CREDITO, plazo_mes=3))
+        self.assertEqual(status, 201)
+        self.assertEqual((body["total_venta_final"], body["cuotas"]), ("115.00", 3))
+        montos = CuotaCredito.objects.filter(id_venta_id=body["id_venta"]).order_by("numero_cuota")
+        self.assertEqual([c.monto_programado for c in montos], [Decimal("38.34"), Decimal("38.33"), Decimal("38.33")])
+
+
+class ResumenVentasTests(TablasCoreTestCase):
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        self.v = self.venta(credito=True, plazo=2, total=Decimal("100.00"),
+                            lineas=[(self.producto, "5"), (self.producto2, "1")])
+        cuotas = [
+            CuotaCredito.objects.create(id_venta=self.v, numero_cuota=n, id_fecha_venc=self.fechas[f],
+                                        monto_programado=Decimal("50.00"), fecha_creacion=ahora, usuario_creacion="test")
+            for n, f in ((1, date(2025, 2, 28)), (2, date(2025, 3, 31)))
+        ]
+        pago = Pago.objects.create(id_venta=self.v, id_fecha=self.fechas[date(2025, 2, 28)], monto_pago=Decimal("60.00"),
+                                   fecha_creacion=ahora, usuario_creacion="test")
+        PagoCuota.objects.create(id_pago=pago, id_cuota=cuotas[0], monto_asignado=Decimal("50.00"),
+                                 fecha_creacion=ahora, usuario_creacion="test")
+        PagoCuota.objects.create(id_pago=pago, id_cuota=cuotas[1], monto_asignado=Decimal("10.00"),
+                                 fecha_creacion=ahora, usuario_creacion="test")
+        self.v_contado = self.venta(total=Decimal("30.00"))
+
+    def test_anotaciones(self):
+        v = _anotar_resumen(Venta.objects.filter(pk=self.v.pk)).get()
+        self.assertEqual((v.items, v.pagado, v.saldo), (2, Decimal("60.00"), Decimal("40.00")))
+        # la cuota 1 está cubierta: el próximo vencimiento es el de la 2 (pagada en parte)
+        self.assertEqual(v.proximo_venc, date(2025, 3, 31))
+
+    def test_sin_pagos_ni_cuotas(self):
+        v = _anotar_resumen(Venta.objects.filter(pk=self.v_contado.pk)).get()
+        self.assertEqual((v.items, v.pagado, v.saldo, v.proximo_venc), (0, Decimal("0"), Decimal("30.00"), None))
+
+    def test_filtro_y_orden_por_saldo(self):
+        qs = _anotar_resumen(Venta.objects.all())
+        self.assertEqual(list(qs.filter(saldo__gte=35).values_list("pk", flat=True)), [self.v.pk])
+        self.assertEqual(list(qs.order_by("saldo").values_list("pk", flat=True)), [self.v_contado.pk, self.v.pk])
+
+
+class ValidadorFKTests(TablasCoreTestCase):
+    def test_una_consulta_para_todas_las_referencias(self):
+        v = ValidadorFK()
+        with self.assertNumQueries(1):
+            faltan = v.validar(cliente=self.cliente.pk, tipo_transaccion=[1, TIPO_CREDITO],
+                               producto=[self.producto.pk, self.producto2.pk, 999999])
+        self.assertEqual(faltan, {"producto"})
+        self.assertEqual(v.dato("cliente", self.cliente.pk), Decimal("15.00"))
+        self.assertEqual(v.dato("producto", self.producto2.pk, 1), Decimal("15.00"))
+        self.assertFalse(v.existe("producto", 999999))
+
+    def test_memoriza_en_el_request(self):
+        request = RequestFactory().get("/")
+        self.assertIs(validador_de(request), validador_de(request))
+        validador_de(request).validar(cliente=self.cliente.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(validador_de(request).validar(cliente=self.cliente.pk), set())
+            self.assertEqual(validador_de(request).validar(cliente=self.cliente.pk, producto="x"), {"producto"})
+
+    def test_dim_fecha_desde_la_cache(self):
+        dim_fecha_cache.cargar()
+        with self.assertNumQueries(0):
+            self.assertEqual(ValidadorFK().validar(dim_fecha=self.fechas[date(2025, 1, 31)].pk), set())
+
+    def test_referencia_desconocida(self):
+        with self.assertRaises(ValueError):
+            ValidadorFK().validar(bodega=1)
+
+
+class KeysetTests(SimpleTestCase):
+    orden = ["-fecha_evento", "-id_bitacora"]
+
+    def test_q_keyset(self):
+        f = datetime(2025, 6, 1, 10, 30)
+        self.assertEqual(q_keyset(self.orden, [f, 7]),
+                         Q(fecha_evento__lt=f) | (Q(fecha_evento=f) & Q(id_bitacora__lt=7)))
+        self.assertEqual(q_keyset(self.orden, [f, 7], atras=True),
+                         Q(fecha_evento__gt=f) | (Q(fecha_evento=f) & Q(id_bitacora__gt=7)))
+
+    def test_sql_keyset(self):
+        sql, params = sql_keyset(self.orden, ["2025-06-01T10:30:00.000", 7],
+                                 marcadores={"fecha_evento": "CAST(%s AS DATETIME)"})
+        self.assertEqual(sql, "((fecha_evento < CAST(%s AS DATETIME)) OR "
+                              "(fecha_evento = CAST(%s AS DATETIME) AND id_bitacora < %s))")
+        self.assertEqual(params, ["2025-06-01T10:30:00.000", "2025-06-01T10:30:00.000", 7])
+        sql, params = sql_keyset(["id_venta", "numero_cuota"], [3, 2], atras=True)
+        self.assertEqual(sql, "((id_venta < %s) OR (id_venta = %s AND numero_cuota < %s))")
+        self.assertEqual(params, [3, 3, 2])
+
+
+class CursorTests(SimpleTestCase):
+    orden = ["-fecha", "-total", "-id"]
+
+    def test_ida_y_vuelta(self):
+        valores = [date(2025, 6, 1), Decimal("10.50"), 42]
+        for atras in (False, True):
+            token = codificar_cursor(valores, self.orden, atras)
+            self.assertEqual(decodificar_cursor(token, self.orden), (valores, atras))
+
+    def test_datetime_en_milisegundos(self):
+        token = codificar_cursor([datetime(2025, 6, 1, 10, 30, 0, 123456), 1], ["-fecha_evento", "-id"])
+        valores, _ = decodificar_cursor(token, ["-fecha_evento", "-id"])
+        self.assertEqual(valores[0], datetime(2025, 6, 1, 10, 30, 0, 123000))
+
+    def test_otro_orden(self):
+        token = codificar_cursor([date(2025, 6, 1), Decimal("1"), 1], self.orden)
+        with self.assertRaises(CursorInvalido):
+            decodificar_cursor(token, ["fecha", "total", "id"])
+
+    def test_token_invalido(self):
+        for token in ("no-es-base64!", codificar_cursor([1], self.orden)):
+            with self.assertRaises(CursorInvalido):
+                decodificar_cursor(token, self.orden)
+
+
+CACHE_LOCAL = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class CacheDatosTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calculos = 0
+
+    def _calcular(self):
+        self.calculos += 1
+        return self.calculos
+
+    def test_memoriza_hasta_invalidar(self):
+        self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 1)
+        self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 1)
+        invalidar("pagos")
+        self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 1)
+        invalidar("ventas")
+        self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 2)
+
+    def test_derivadas(self):
+        antes = versiones(["bitacora_ventas"])
+        invalidar("ventas")
+        self.assertNotEqual(versiones(["bitacora_ventas"]), antes)
+
+    def test_en_transaccion_la_version_cambia_al_confirmar(self):
+        antes = versiones(["ventas"])
+        with mock.patch.object(connections[DEFAULT_DB_ALIAS], "in_atomic_block", True), \
+                mock.patch.object(cache_datos.transaction, "on_commit") as on_commit:
+            invalidar("ventas")
+            self.assertEqual(versiones(["ventas"]), antes)
+            # lo calculado dentro de la transacción (datos sin confirmar) no se guarda
+            cacheado("x", ["ventas"], 1, self._calcular, 60)
+            cacheado("x", ["ventas"], 1, self._calcular, 60)
+            self.assertEqual(self.calculos, 2)
+        on_commit.call_args.args[0]()
+        self.assertNotEqual(versiones(["ventas"]), antes)
+
+    def test_cache_caida(self):
+        rota = mock.Mock(**{f"{m}.side_effect": DatabaseError("no such table: django_cache")
+                            for m in ("get_many", "set_many")})
+        with mock.patch.object(cache_datos, "cache", rota), self.assertLogs("core.cache_datos", "ERROR"):
+            self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 1)
+            self.assertEqual(cacheado("x", ["ventas"], 1, self._calcular, 60), 2)
+            invalidar("ventas")
+
+
+class ChequeoCacheTests(SimpleTestCase):
+    @override_settings(CACHES=CACHE_LOCAL)
+    def test_cache_por_proceso(self):
+        self.assertEqual([w.id for w in revisar_cache_datos()], ["core.W001"])
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                                           "LOCATION": "django_cache"}})
+    def test_falta_la_tabla(self):
+        with mock.patch("core.checks.cache") as c:
+            c.get.side_effect = DatabaseError("no such table: django_cache")
+            self.assertEqual([w.id for w in revisar_cache_datos()], ["core.W002"])
+            c.get.side_effect = None
+            self.assertEqual(revisar_cache_datos(), [])
+
+
+@skipUnless(connection.vendor == "microsoft", "OPENJSON/MERGE: solo SQL Server")
+@override_settings(CACHES=CACHE_LOCAL, RENTABILIDAD_AGREGADA=True)
+class AgregadoRentabilidadTests(TablasCoreTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ejecutar_script("migracion_agg_rentabilidad.sql")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.venta(lineas=[(self.producto, "2")])
+        refrescar_rentabilidad(completo=True)
+
+    def _filas(self):
+        with connection.cursor() as cur:
+            cur.execute("SELECT anio, mes, total_venta, total_costo, total_unidades FROM agg_rentabilidad_mensual "
+                        "ORDER BY anio, mes")
+            return cur.fetchall()
+
+    def test_refresco_incremental(self):
+        self.assertEqual(self._filas(), [(2025, 1, Decimal("20.0000"), Decimal("12.0000"), Decimal("2.00"))])
+        self.venta(lineas=[(self.producto2, "1")])
+        self.assertEqual(refrescar_rentabilidad()["meses"], 1)
+        self.assertEqual(self._filas(), [(2025, 1, Decimal("45.5000"), Decimal("27.0000"), Decimal("3.00"))])
+
+    def test_version_solo_de_los_meses_refrescados(self):
+        enero, febrero = versiones([tabla_mes(2025, 1)]), versiones([tabla_mes(2025, 2)])
+        self.venta(fecha=date(2025, 2, 28), lineas=[(self.producto, "1")])
+        with self.captureOnCommitCallbacks(execute=True):
+            refrescar_rentabilidad()
+        self.assertEqual(versiones([tabla_mes(2025, 1)]), enero)
+        self.assertNotEqual(versiones([tabla_mes(2025, 2)]), febrero)
+
+    def test_get_lee_el_agregado_sin_refrescar(self):
+        self.venta(lineas=[(self.producto, "1")])
+        with mock.patch.object(rentabilidad, "refrescar_rentabilidad") as refrescar:
+            r = rentabilidad_mensual(RequestFactory().get("/", {"desde": "2025-01-01", "hasta": "2025-01-31"}))
+        refrescar.assert_not_called()
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Decimal(json.loads(r.content)["totales"]["total_venta"]), Decimal("20"))
+
+
+# objetos de las migraciones que schema_base.sql no borra (o que le impiden borrar ventas)
+_SQL_LIMPIAR_MIGRACIONES = """
+    IF OBJECT_ID('dbo.cobranza_ventas', 'U') IS NOT NULL DROP TABLE dbo.cobranza_ventas;
+    IF OBJECT_ID('dbo.sp_cobranza_ventas_recalcular', 'P') IS NOT NULL DROP PROCEDURE dbo.sp_cobranza_ventas_recalcular;
+    IF TYPE_ID('dbo.tipo_ids_venta') IS NOT NULL DROP TYPE dbo.tipo_ids_venta;
+    IF OBJECT_ID('dbo.resumen_ventas_mensual', 'U') IS NOT NULL DROP TABLE dbo.resumen_ventas_mensual;
+    IF OBJECT_ID('dbo.dim_fecha_yyyymmdd', 'U') IS NOT NULL DROP TABLE dbo.dim_fecha_yyyymmdd;
+"""
+
+
+@skipUnless(connection.vendor == "microsoft", "migraciones de bd/: solo SQL Server")
+class MigracionSQLTestCase(DatosCore, TransactionTestCase):
+    """
+    Corre migraciones de bd/ (abren y confirman su propia transacción, no
+    caben en un TestCase) sobre un schema_base.sql limpio, y al terminar lo
+    deja limpio para el resto de las pruebas.
+    """
+    scripts = ()
+
+    def setUp(self):
+        self._schema_limpio()
+        for nombre in self.scripts:
+            ejecutar_script(nombre)
+        self.crear_datos()
+
+    def tearDown(self):
+        self._schema_limpio()
+
+    def _schema_limpio(self):
+        with connection.cursor() as cur:
+            cur.execute(_SQL_LIMPIAR_MIGRACIONES)
+        ejecutar_script("schema_base.sql")
+        dim_fecha_cache.invalidar()
+
+    def migrar_smart_key(self):
+        ejecutar_script("migracion_dim_fecha_smart_key.sql")
+        dim_fecha_cache.invalidar()
+        self.fechas = {f: DimFecha.objects.get(fecha=f) for f in self.fechas_base}
+
+
+class SmartKeyResumenVentasTests(MigracionSQLTestCase):
+    scripts = ("migracion_resumen_ventas_mensual.sql",)
+
+    def _resumen(self):
+        with connection.cursor() as cur:
+            cur.execute("SELECT anio, mes, id_tipo_transaccion, total, ventas FROM resumen_ventas_mensual "
+                        "ORDER BY anio, mes, id_tipo_transaccion")
+            return cur.fetchall()
+
+    def _recalculado(self):
+        with connection.cursor() as cur:
+            cur.execute("""
+                SELECT df.anio, df.mes, v.id_tipo_transaccion, SUM(v.total_venta_final), COUNT(*)
+                FROM ventas v JOIN dim_fecha df ON df.id_fecha = v.id_fecha
+                GROUP BY df.anio, df.mes, v.id_tipo_transaccion
+                ORDER BY df.anio, df.mes, v.id_tipo_transaccion
+            """)
+            return cur.fetchall()
+
+    def test_resumen_intacto(self):
+        self.venta(total=Decimal("100.00"))
+        self.venta(total=Decimal("30.00"))
+        self.venta(fecha=date(2025, 2, 28), total=Decimal("50.00"))
+        esperado = [(2025, 1, 1, Decimal("130.00"), 2), (2025, 2, 1, Decimal("50.00"), 1)]
+        self.assertEqual(self._resumen(), esperado)
+
+        self.migrar_smart_key()
+        self.assertEqual(self.fechas[date(2025, 1, 31)].pk, 20250131)
+        self.assertEqual(self._resumen(), esperado)
+        self.assertEqual(self._resumen(), self._recalculado())
+
+        # el trigger quedó encendido
+        self.venta(fecha=date(2025, 2, 28), total=Decimal("5.00"))
+        self.assertEqual(self._resumen()[1], (2025, 2, 1, Decimal("55.00"), 2))
+
+
+@skipUnless(np is not None, "requiere numpy")
+class CuboRentabilidadTests(SimpleTestCase):
+    # id_detalle, id_venta, anio, mes, tipo_cliente, tipo_transaccion, categoria, producto, cliente,
+    # venta y costo (4 decimales), cantidad (2 decimales)
+    filas = [
+        (1, 10, 2025, 1, 1, 1, 5, 100, 7, 1000000, 600000, 200),
+        (2, 10, 2025, 1, 1, 1, 6, 101, 7, 500000, 200000, 100),
+        (3, 11, 2025, 2, 2, 1, 5, 100, 8, 300000, 100000, 100),
+        (4, 12, 2025, 2, 1, 2, 5, 102, 7, 200000, 150000, 300),
+    ]
+
+    def setUp(self):
+        self.cubo = CuboRentabilidad()
+        self.cubo._col = self.cubo._a_columnas(self.filas)
+        patcher = mock.patch.object(self.cubo, "_asegurar_fresco")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_agrupar_por_mes(self):
+        self.assertEqual(self.cubo.consultar(["anio", "mes"]), [
+            {"anio": 2025, "mes": 1, "venta": 1500000, "costo": 800000, "margen": 700000,
+             "cantidad": 300, "lineas": 2, "ventas": 1},
+            {"anio": 2025, "mes": 2, "venta": 500000, "costo": 250000, "margen": 250000,
+             "cantidad": 400, "lineas": 2, "ventas": 2},
+        ])
+
+    def test_top_por_medida(self):
+        filas = self.cubo.consultar(["categoria"], medidas=("venta",), ordenar="-venta", top=1)
+        self.assertEqual(filas, [{"categoria": 5, "venta": 1500000}])
+
+    def test_filtros(self):
+        self.assertEqual(self.cubo.consultar(["cliente"], {"tipo_cliente": [2]}, medidas=("venta",)),
+                         [{"cliente": 8, "venta": 300000}])
+        self.assertEqual(self.cubo.consultar(["anio", "mes"], {"desde": (2025, 2)}, medidas=("lineas",)),
+                         [{"anio": 2025, "mes": 2, "lineas": 2}])
+        self.assertEqual(self.cubo.consultar(["producto"], {"producto": [999]}), [])
+
+    def test_ordenar_invalido(self):
+        with self.assertRaises(ValueError):
+            self.cubo.consultar(["anio"], ordenar="cliente")
+
+
+class RepartirTests(SimpleTestCase):
+    def test_resto_mayor(self):
+        self.assertEqual(_repartir(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(_repartir(10, [Decimal("1"), Decimal("2")]), [3, 7])
+        self.assertEqual(_repartir(5, [Decimal("0.5"), Decimal("0.25"), Decimal("0.25")]), [3, 1, 1])
+
+    def test_pesos_negativos_o_cero(self):
+        self.assertEqual(_repartir(10, [-1, 1]), [0, 10])
+        self.assertIsNone(_repartir(10, [0, 0]))
+
+
+class RepartirMesTests(SimpleTestCase):
+    # (segmento, venta, costo, unidades)
+    segmentos = [((1, 1, 10), 100, 60, 5), ((1, 2, 10), 50, 20, 1), ((2, 1, 20), 50, 40, 10)]
+    gastos = [(1, Decimal("100.01")), (2, Decimal("33.33"))]
+
+    def _reparto(self, driver, config=None):
+        r = repartir_mes(self.segmentos, self.gastos, driver, config or {})
+        self.assertEqual(sum(r.values()), 13334)
+        return [r[s[0]] for s in self.segmentos]
+
+    def test_drivers(self):
+        self.assertEqual(self._reparto("ventas"), [6667, 3334, 3333])
+        self.assertEqual(self._reparto("unidades"), [4167, 833, 8334])
+        self.assertEqual(self._reparto("costo"), [6667, 2222, 4445])
+        self.assertEqual(self._reparto("categoria", {"mapeo": {1: {20}}}), [1667, 833, 10834])
+        self.assertEqual(self._reparto("pesos", {"pesos": {10: Decimal(1), 20: Decimal(3)}}), [2222, 1111, 10001])
+
+    def test_sin_base_reparte_por_ventas(self):
+        segmentos = [((1, 1, 10), 100, 0, 0), ((1, 2, 10), 50, 0, 0)]
+        r = repartir_mes(segmentos, [(1, Decimal("3.00"))], "costo", {})
+        self.assertEqual(r, {(1, 1, 10): 200, (1, 2, 10): 100})
+
+    def test_sin_segmentos_o_gastos(self):
+        self.assertEqual(repartir_mes([], self.gastos, "ventas", {}), {})
+        self.assertEqual(repartir_mes(self.segmentos, [], "ventas", {}), {})
+
+
+@override_settings(CACHES=CACHE_LOCAL, RENTABILIDAD_AGREGADA=True)
+class AsignacionesAgregadoTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(prorrateo, "_calcular",
+                                    side_effect=lambda meses, driver: {(a, m, driver): {(1, 1, 10): 100} for a, m in meses})
+        self.calcular = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _meses_calculados(self):
+        meses = [sorted(c.args[0]) for c in self.calcular.call_args_list]
+        self.calcular.reset_mock()
+        return meses
+
+    def test_cache_por_mes(self):
+        meses = [(2025, 1), (2025, 2)]
+        self.assertEqual(asignaciones(meses, "ventas")[(2025, 1)], {(1, 1, 10): Decimal("1.00")})
+        self.assertEqual(self._meses_calculados(), [[(2025, 1), (2025, 2)]])
+        # una venta nueva no invalida nada: el agregado cambia recién con el refresco, mes por mes
+        invalidar("ventas", "detalle_ventas")
+        asignaciones(meses, "ventas")
+        self.assertEqual(self._meses_calculados(), [])
+        invalidar(tabla_mes(2025, 2))
+        asignaciones(meses, "ventas")
+        self.assertEqual(self._meses_calculados(), [[(2025, 2)]])
+
+    def test_configuracion_solo_del_driver(self):
+        asignaciones([(2025, 1)], "pesos")
+        asignaciones([(2025, 1)], "ventas")
+        self._meses_calculados()
+        invalidar("prorrateo_pesos")
+        asignaciones([(2025, 1)], "pesos")
+        asignaciones([(2025, 1)], "ventas")
+        self.assertEqual(self._meses_calculados(), [[(2025, 1)]])
+
+
+class SmartKeyCobranzaTests(MigracionSQLTestCase):
+    scripts = ("migracion_cobranza_ventas.sql",)
+
+    def _pago(self, venta, fecha, monto):
+        Pago.objects.create(id_venta=venta, id_fecha=self.fechas[fecha], monto_pago=Decimal(monto),
+                            fecha_creacion=timezone.now(), usuario_creacion="test")
+
+    def _cobranza(self, venta):
+        with connection.cursor() as cur:
+            cur.execute("SELECT pagos, dias_suma, fecha_saldada, dias_saldada FROM cobranza_ventas WHERE id_venta = %s",
+                        [venta.pk])
+            return cur.fetchone()
+
+    def test_cobranza_intacta(self):
+        v = self.venta(total=Decimal("100.00"))
+        self._pago(v, date(2025, 2, 28), "100.00")
+        self.assertEqual(self._cobranza(v), (1, 28, date(2025, 2, 28), 28))
+
+        self.migrar_smart_key()
+        self.assertEqual(self._cobranza(v), (1, 28, date(2025, 2, 28), 28))
+
+        # los triggers quedaron encendidos
+        v2 = self.venta(fecha=date(2025, 3, 31), total=Decimal("40.00"))
+        self._pago(v2, date(2025, 4, 30), "40.00")
+        self.assertEqual(self._cobranza(v2), (1, 30, date(2025, 4, 30), 30))
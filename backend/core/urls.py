@@ -9,10 +9,12 @@ from .views_categoria_gastos import categoria_gastos_list, categoria_gastos_deta
 from .views_clientes_crud import clientes_list, clientes_detail
 from .views_productos import productos_list, productos_detail
 from .views_gastos import gastos_list, gastos_detail
-from .views_dim_fecha import dim_fecha_lookup, dim_fecha_detail
-from .views_ventas import  ventas_list, ventas_detail, ventas_totales_mes, detalle_ventas_list, detalle_venta_detail
+from .views_dim_fecha import dim_fecha_lookup, dim_fecha_detail, dim_fecha_cache_stats
+from .views_ventas import  ventas_list, ventas_detail, ventas_full, ventas_totales_mes, ventas_cotizar, ventas_crear_completa, detalle_ventas_list, detalle_venta_detail, detalle_ventas_bulk
 from .views_bitacora import bitacora_ventas_list
 from .views_cuotas import cuotas_list, cuota_asignar_pago
+from .views_rentabilidad import rentabilidad_mensual
+from .views_cubo import cubo_rentabilidad_consulta, cubo_rentabilidad_estado
 
 
 
@@ -47,18 +49,28 @@ urlpatterns = [
     #DIM FECHA
     path('dim-fecha/', dim_fecha_lookup, name='dim-fecha-lookup'),
     path('dim-fecha/<int:id_fecha>/', dim_fecha_detail, name='dim-fecha-detail'),
+    path('dim-fecha/cache/', dim_fecha_cache_stats, name='dim-fecha-cache-stats'),
     #vENTAS
     path('ventas/', ventas_list, name='ventas-list'),
     path('ventas/<int:id_venta>/', ventas_detail, name='ventas-detail'),
+    path('ventas/<int:id_venta>/full/', ventas_full, name='ventas-full'),
     path('ventas/totales-mes/', ventas_totales_mes, name='ventas-totales-mes'),
+    path('ventas/cotizar/', ventas_cotizar, name='ventas-cotizar'),
+    path('ventas/completa/', ventas_crear_completa, name='ventas-crear-completa'),
     #detalle ventas
     path('ventas/<int:id_venta>/detalle/', detalle_ventas_list, name='detalle-ventas-list'),
     path('ventas/<int:id_venta>/detalle/<int:id_detalle>/', detalle_venta_detail, name='detalle-venta-detail'),
+    path('ventas/<int:id_venta>/detalle/bulk/', detalle_ventas_bulk, name='detalle-ventas-bulk'),
     #bitacora ventas
     path('bitacora-ventas/', bitacora_ventas_list, name='bitacora-ventas-list'),
     #cuotas
     path('cuotas/', cuotas_list, name='cuotas_list'),
     path('cuotas/<int:id_cuota>/asignar-pago/', cuota_asignar_pago, name='cuota_asignar_pago'),
+    #rentabilidad
+    path('rentabilidad/', rentabilidad_mensual, name='rentabilidad-mensual'),
+    #cubo en memoria
+    path('cubo/rentabilidad/', cubo_rentabilidad_consulta, name='cubo-rentabilidad'),
+    path('cubo/estado/', cubo_rentabilidad_estado, name='cubo-estado'),
 
 
     
@@ -0,0 +1,121 @@
+# core/validacion.py
+"""
+Validación de claves foráneas para las vistas de escritura.
+
+En lugar de un exists()/get() por FK, todas las claves de una escritura se
+comprueban en UNA consulta (UNION ALL, una rama IN (...) por referencia), que además
+trae los datos que la vista necesita (p.ej. la tasa del tipo de cliente).
+Los resultados se guardan en el request: una segunda validación de la misma
+clave dentro del mismo request no vuelve a la base de datos.
+dim_fecha no entra en la consulta: se resuelve con la caché de fechas.
+
+    v = validador_de(request)
+    faltan = v.validar(cliente=id_cliente, tipo_transaccion=id_tipo, dim_fecha=id_fecha)
+    if "cliente" in faltan: ...
+    tasa = v.dato("cliente", id_cliente)
+"""
+from django.db import connection
+
+from .fechas import dim_fecha_cache
+
+MAX_PARAMS = 2000
+
+# referencia -> (FROM, columna clave, dato_a, dato_b)   (datos: DECIMAL(12,2) o NULL)
+REFERENCIAS = {
+    "cliente": (
+        "clientes c JOIN tipo_clientes tc ON tc.id_tipo_cliente = c.id_tipo_cliente",
+        "c.id_cliente", "tc.tasa_interes_default", "NULL",
+    ),
+    "tipo_cliente": ("tipo_clientes", "id_tipo_cliente", "tasa_interes_default", "NULL"),
+    "tipo_transaccion": ("tipo_transacciones", "id_tipo_transaccion", "NULL", "NULL"),
+    "categoria_gastos": ("categoria_gastos", "id_categoria_gastos", "NULL", "NULL"),
+    "categoria_productos": ("categoria_productos", "id_categoria", "NULL", "NULL"),
+    "producto": ("productos", "id_producto", "precio_unitario", "costo_unitario"),
+    "venta": ("ventas", "id_venta", "total_venta_final", "NULL"),
+}
+
+
+class ValidadorFK:
+    def __init__(self):
+        # (referencia, id) -> (dato_a, dato_b) | None si no existe
+        self._memo: dict[tuple[str, int], tuple | None] = {}
+
+    def validar(self, **claves) -> set[str]:
+        """
+        claves: referencia=id (o lista de ids). Devuelve las referencias con
+        algún id inexistente o no entero. Como máximo una consulta.
+        """
+        faltan, pedir = set(), []
+        for ref, valor in claves.items():
+            ids = valor if isinstance(valor, (list, tuple, set)) else [valor]
+            for i in ids:
+                try:
+                    i = int(i)
+                except (TypeError, ValueError):
+                    faltan.add(ref)
+                    continue
+                if ref == "dim_fecha":
+                    if not dim_fecha_cache.fecha_de(i):
+                        faltan.add(ref)
+                elif ref not in REFERENCIAS:
+                    raise ValueError(f"referencia desconocida: {ref}")
+                elif (ref, i) not in self._memo:
+                    pedir.append((ref, i))
+        self._consultar(pedir)
+        for ref, valor in claves.items():
+            if ref == "dim_fecha":
+                continue
+            ids = valor if isinstance(valor, (list, tuple, set)) else [valor]
+            for i in ids:
+                try:
+                    if self._memo.get((ref, int(i))) is None:
+                        faltan.add(ref)
+                except (TypeError, ValueError):
+                    pass
+        return faltan
+
+    def existe(self, ref: str, id_) -> bool:
+        return self._memo.get((ref, int(id_))) is not None
+
+    def dato(self, ref: str, id_, indice: int = 0):
+        """Dato traído en la validación (0 = dato_a, 1 = dato_b); None si no existe."""
+        fila = self._memo.get((ref, int(id_)))
+        return fila[indice] if fila else None
+
+    def _consultar(self, pedir):
+        por_ref: dict[str, list[int]] = {}
+        for ref, i in dict.fromkeys(pedir):
+            self._memo[(ref, i)] = None
+            por_ref.setdefault(ref, []).append(i)
+        # una rama por referencia (IN); SQL Server admite 2100 parámetros por sentencia
+        ramas, params = [], []
+        for ref, ids in por_ref.items():
+            desde, clave, a, b = REFERENCIAS[ref]
+            for k in range(0, len(ids), MAX_PARAMS):
+                lote = ids[k:k + MAX_PARAMS]
+                if ramas and len(params) + len(lote) + 1 > MAX_PARAMS:
+                    self._ejecutar(ramas, params)
+                    ramas, params = [], []
+                ramas.append(
+                    f"SELECT %s AS ref, {clave} AS id, CAST({a} AS DECIMAL(12,2)) AS a, CAST({b} AS DECIMAL(12,2)) AS b "
+                    f"FROM {desde} WHERE {clave} IN ({', '.join(['%s'] * len(lote))})"
+                )
+                params += [ref, *lote]
+        if ramas:
+            self._ejecutar(ramas, params)
+
+    def _ejecutar(self, ramas, params):
+        with connection.cursor() as cur:
+            cur.execute(" UNION ALL ".join(ramas), params)
+            for ref, i, a, b in cur.fetchall():
+                self._memo[(ref, int(i))] = (a, b)
+
+
+def validador_de(request) -> ValidadorFK:
+    """Validador memorizado en el request (uno nuevo si no hay request)."""
+    if request is None:
+        return ValidadorFK()
+    v = getattr(request, "_validador_fk", None)
+    if v is None:
+        v = request._validador_fk = ValidadorFK()
+    return v
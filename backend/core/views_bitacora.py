@@ -1,8 +1,12 @@
 # core/views_bitacora.py
 import json
+from datetime import datetime
 from django.http import JsonResponse, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
 from django.db import connection
+from .paginacion import (CursorInvalido, contar, decodificar_cursor, meta_cursor, meta_pagina, modo_cursor,
+                         numero_pagina, order_by_sql, sql_keyset, tamano_pagina, ventana_cursor)
+from .cargadores import cargadores_de, nombre_cliente, registrar_clientes_de_ventas
 
 def _parse_int(s, default=None):
     try:
@@ -10,16 +14,20 @@ def _parse_int(s, default=None):
     except Exception:
         return default
 
+ORDEN_BITACORA = ["-fecha_evento", "-id_bitacora"]
+
 @csrf_exempt
 def bitacora_ventas_list(request):
     """
-    GET /bitacora-ventas/?q=&operacion=&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&venta=&page=&page_size=
+    GET /bitacora-ventas/?q=&operacion=&desde=YYYY-MM-DD&hasta=YYYY-MM-DD&venta=&page=&page_size=&cursor=
+      - cursor: paginación keyset por (fecha_evento, id_bitacora); next_cursor/previous_cursor
+      - count: false (sin COUNT) | estimado (sin filtros: estadísticas de la tabla)
       - q: texto libre (usuario, #venta, operación)
       - operacion: INSERT | UPDATE | DELETE
       - desde/hasta: fecha_evento (DATE)
       - venta: id_venta exacto
     Respuesta:
-      { count, next, previous, results: [ {id_bitacora, id_venta, operacion, usuario_evento, fecha_evento_iso, datos_anteriores, datos_nuevos}, ... ] }
+      { count, next, previous, results: [ {id_bitacora, id_venta, id_cliente, cliente, operacion, usuario_evento, fecha_evento_iso, datos_anteriores, datos_nuevos}, ... ] }
     """
     if request.method != "GET":
         return HttpResponseNotAllowed(["GET"])
@@ -31,9 +39,7 @@ def bitacora_ventas_list(request):
     venta_txt = (request.GET.get("venta") or "").strip()
     id_venta  = _parse_int(venta_txt, None)
 
-    page      = _parse_int(request.GET.get("page"), 1) or 1
-    page_size = _parse_int(request.GET.get("page_size"), 1000) or 1000
-    offset    = (page - 1) * page_size
+    page_size = tamano_pagina(request, 1000)
 
     where = []
     params = []
@@ -66,32 +72,79 @@ def bitacora_ventas_list(request):
         {where_sql}
     """
 
-    with connection.cursor() as cur:
-        # total
-        cur.execute(f"SELECT COUNT(1) {base_sql}", params)
-        total = cur.fetchone()[0] if cur.rowcount != -1 else 0
-
-        # page
-        cur.execute(f"""
-            SELECT
+    columnas = """
               id_bitacora,
               id_venta,
               operacion,
               datos_anteriores,
               datos_nuevos,
               usuario_evento,
-              CONVERT(VARCHAR(19), fecha_evento, 120) AS fecha_evento_iso
-            {base_sql}
-            ORDER BY fecha_evento DESC, id_bitacora DESC
-            OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
-        """, params + [offset, page_size])
-        rows = cur.fetchall()
+              CONVERT(VARCHAR(19), fecha_evento, 120) AS fecha_evento_iso,
+              fecha_evento
+    """
+
+    if modo_cursor(request):
+        # keyset sobre (fecha_evento, id_bitacora): sin COUNT ni OFFSET
+        token = request.GET.get("cursor") or ""
+        try:
+            valores, atras = decodificar_cursor(token, ORDEN_BITACORA) if token else (None, False)
+            if valores and not isinstance(valores[0], datetime):
+                raise CursorInvalido("cursor inválido")
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        where_k, params_k = list(where), list(params)
+        if valores:
+            # DATETIME comparado como DATETIME (no datetime2) para que la igualdad sea exacta
+            fecha, id_b = valores[0], valores[1]
+            sql, ps = sql_keyset(ORDEN_BITACORA, [fecha.isoformat(timespec="milliseconds"), id_b], atras,
+                                 marcadores={"fecha_evento": "CAST(%s AS DATETIME)"})
+            where_k.append(sql)
+            params_k += ps
+        where_sql_k = " WHERE " + " AND ".join(where_k) if where_k else ""
+        with connection.cursor() as cur:
+            cur.execute(f"""
+                SELECT TOP (%s) {columnas}
+                FROM bitacora_ventas
+                {where_sql_k}
+                ORDER BY {order_by_sql(ORDEN_BITACORA, atras)}
+            """, [page_size + 1] + params_k)
+            rows = cur.fetchall()
+        rows, hay_sig, hay_ant = ventana_cursor(rows, page_size, valores, atras)
+        meta = meta_cursor(request, rows, lambda r: [r[7], r[0]], ORDEN_BITACORA, hay_sig, hay_ant)
+    else:
+        def _contar():
+            with connection.cursor() as cur:
+                cur.execute(f"SELECT COUNT(1) {base_sql}", params)
+                return cur.fetchone()[0]
+
+        total, estimado = contar(request, ["bitacora_ventas"], _contar)
+        page = numero_pagina(request, None if estimado else total, page_size)
+        with connection.cursor() as cur:
+            # una fila de más para saber si hay página siguiente
+            cur.execute(f"""
+                SELECT {columnas}
+                {base_sql}
+                ORDER BY fecha_evento DESC, id_bitacora DESC
+                OFFSET %s ROWS FETCH NEXT %s ROWS ONLY
+            """, params + [(page - 1) * page_size, page_size + 1])
+            rows = cur.fetchall()
+        hay_sig = len(rows) > page_size
+        rows = rows[:page_size]
+        meta = meta_pagina(request, page, total, hay_sig, estimado)
+
+    # cliente de cada venta: 2 consultas por página (ventas -> clientes)
+    cg = cargadores_de(request)
+    registrar_clientes_de_ventas(cg, (r[1] for r in rows))
 
     results = []
     for r in rows:
+        venta = cg["venta"].get(r[1])
+        id_cliente = venta["id_cliente_id"] if venta else None
         results.append({
             "id_bitacora": r[0],
             "id_venta": r[1],
+            "id_cliente": id_cliente,
+            "cliente": nombre_cliente(cg, id_cliente),
             "operacion": r[2],
             "datos_anteriores": r[3],
             "datos_nuevos": r[4],
@@ -99,10 +152,7 @@ def bitacora_ventas_list(request):
             "fecha_evento_iso": r[6],
         })
 
-    # no incluimos next/previous reales para simplificar
     return JsonResponse({
-        "count": total,
-        "next": None,
-        "previous": None,
+        **meta,
         "results": results
     })
@@ -1,49 +1,35 @@
 # core/views_categoria_productos.py
 import json
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from .models import CategoriaProducto
-
-def _build_page_links(request, page_obj):
-    base_url = request.build_absolute_uri(request.path)
-    querydict = request.GET.copy()
-
-    def url_for_page(n):
-        querydict['page'] = n
-        return f"{base_url}?{querydict.urlencode()}"
-
-    next_url = url_for_page(page_obj.next_page_number()) if page_obj.has_next() else None
-    prev_url = url_for_page(page_obj.previous_page_number()) if page_obj.has_previous() else None
-    return next_url, prev_url
+from .paginacion import paginar, tamano_pagina, CursorInvalido
 
 @csrf_exempt
 def categoria_productos_list(request):
     """
-    GET  /categorias-productos/?search=&page=&page_size=
+    GET  /categorias-productos/?search=&page=&page_size=&cursor=
     POST /categorias-productos/  { "nombre_categoria": "..." }
     """
     if request.method == "GET":
         search = (request.GET.get("search") or "").strip()
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
 
         qs = CategoriaProducto.objects.all()
         if search:
             qs = qs.filter(Q(nombre_categoria__icontains=search))
 
-        paginator = Paginator(qs, page_size)
-        page_obj = paginator.get_page(page)
-        next_url, prev_url = _build_page_links(request, page_obj)
+        try:
+            items, meta = paginar(request, qs, ["id_categoria"], page_size)
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": paginator.count,
-            "next": next_url,
-            "previous": prev_url,
+            **meta,
             "results": [
                 {"id_categoria": o.id_categoria, "nombre_categoria": o.nombre_categoria}
-                for o in page_obj.object_list
+                for o in items
             ],
         }
         return JsonResponse(data)
@@ -1,32 +1,22 @@
 # core/views_clientes_crud.py
 import json
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from .models import Cliente, TipoCliente
-
-def _page_links(request, page_obj):
-    base = request.build_absolute_uri(request.path)
-    qd = request.GET.copy()
-    def url_for(n):
-        qd['page'] = n
-        return f"{base}?{qd.urlencode()}"
-    next_url = url_for(page_obj.next_page_number()) if page_obj.has_next() else None
-    prev_url = url_for(page_obj.previous_page_number()) if page_obj.has_previous() else None
-    return next_url, prev_url
+from .paginacion import paginar, tamano_pagina, CursorInvalido
+from .validacion import validador_de
 
 @csrf_exempt
 def clientes_list(request):
     """
-    GET  /clientes/?search=&page=&page_size=
+    GET  /clientes/?search=&page=&page_size=&cursor=&count=false|estimado
     POST /clientes/ { "nombre_cliente": "...", "apellido_cliente": "...", "id_tipo_cliente": 1 }
     """
     if request.method == "GET":
         search = (request.GET.get("search") or "").strip()
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
 
         qs = Cliente.objects.select_related('id_tipo_cliente').all()
         if search:
@@ -35,14 +25,13 @@ def clientes_list(request):
                 Q(apellido_cliente__icontains=search)
             )
 
-        paginator = Paginator(qs, page_size)
-        page_obj = paginator.get_page(page)
-        next_url, prev_url = _page_links(request, page_obj)
+        try:
+            items, meta = paginar(request, qs, ["id_cliente"], page_size)
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": paginator.count,
-            "next": next_url,
-            "previous": prev_url,
+            **meta,
             "results": [
                 {
                     "id_cliente": o.id_cliente,
@@ -53,7 +42,7 @@ def clientes_list(request):
                     "fecha_creacion": o.fecha_creacion.isoformat() if o.fecha_creacion else None,
                     "fecha_modificacion": o.fecha_modificacion.isoformat() if o.fecha_modificacion else None,
                 }
-                for o in page_obj.object_list
+                for o in items
             ],
         }
         return JsonResponse(data)
@@ -72,15 +61,13 @@ def clientes_list(request):
             return JsonResponse({"detail": "Nombre y apellido son obligatorios."}, status=400)
         if not isinstance(tipo_id, int):
             return JsonResponse({"detail": "id_tipo_cliente es obligatorio."}, status=400)
-        try:
-            tipo = TipoCliente.objects.get(pk=tipo_id)
-        except TipoCliente.DoesNotExist:
+        if validador_de(request).validar(tipo_cliente=tipo_id):
             return JsonResponse({"detail": "Tipo de cliente inválido."}, status=400)
 
         obj = Cliente.objects.create(
             nombre_cliente=nombre,
             apellido_cliente=apellido,
-            id_tipo_cliente=tipo,
+            id_tipo_cliente_id=tipo_id,
             # fecha/usuario de creación los maneja SQL por default, pero ponemos guard rails
             fecha_creacion=timezone.now(),
             usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
@@ -128,14 +115,12 @@ def clientes_detail(request, id_cliente):
             return JsonResponse({"detail": "Nombre y apellido son obligatorios."}, status=400)
         if not isinstance(tipo_id, int):
             return JsonResponse({"detail": "id_tipo_cliente es obligatorio."}, status=400)
-        try:
-            tipo = TipoCliente.objects.get(pk=tipo_id)
-        except TipoCliente.DoesNotExist:
+        if validador_de(request).validar(tipo_cliente=tipo_id):
             return JsonResponse({"detail": "Tipo de cliente inválido."}, status=400)
 
         obj.nombre_cliente = nombre
         obj.apellido_cliente = apellido
-        obj.id_tipo_cliente = tipo
+        obj.id_tipo_cliente_id = tipo_id
         obj.fecha_modificacion = timezone.now()
         obj.usuario_modificacion = getattr(getattr(request, "user", None), "username", None) or "web"
         obj.save(update_fields=["nombre_cliente", "apellido_cliente", "id_tipo_cliente", "fecha_modificacion", "usuario_modificacion"])
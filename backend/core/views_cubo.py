@@ -0,0 +1,111 @@
+# core/views_cubo.py
+from decimal import Decimal
+
+from django.http import JsonResponse, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
+
+from .cargadores import cargadores_de, nombre_cliente
+from .cubo import DIMENSIONES, ESCALAS, MEDIDAS, CuboNoDisponible, cubo_rentabilidad, disponible
+
+# dimensión -> (cargador, campo del nombre)
+_NOMBRES = {
+    "tipo_cliente": ("tipo_cliente", "nombre_tipo_cliente"),
+    "tipo_transaccion": ("tipo_transaccion", "nombre_tipo_transaccion"),
+    "categoria": ("categoria_productos", "nombre_categoria"),
+    "producto": ("producto", "nombre_producto"),
+}
+
+
+def _lista(valor: str | None) -> list[str]:
+    return [x.strip() for x in (valor or "").split(",") if x.strip()]
+
+
+def _anio_mes(valor: str) -> tuple[int, int]:
+    anio, mes = (int(x) for x in valor.strip()[:7].split("-"))
+    if not 1 <= mes <= 12:
+        raise ValueError(valor)
+    return anio, mes
+
+
+@csrf_exempt
+def cubo_rentabilidad_consulta(request):
+    """
+    GET /cubo/rentabilidad/?agrupar=anio,mes,tipo_cliente,tipo_transaccion,categoria
+                           &desde=YYYY-MM&hasta=YYYY-MM
+                           &tipo_cliente=1,2&tipo_transaccion=&categoria=&producto=&cliente=
+                           &medidas=venta,costo,margen,cantidad,lineas,ventas
+                           &ordenar=[-]medida|dimension&top=10
+      -> { agrupar, medidas, filas: [{ <dimension>, nombre_<dimension>, <medida> }] }
+    Montos (venta, costo, margen) y cantidad como texto decimal; lineas/ventas enteros.
+    Requiere numpy y CUBO_RENTABILIDAD=True (503 si no).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    if not disponible():
+        return JsonResponse({"detail": "Cubo no disponible (requiere numpy y CUBO_RENTABILIDAD=True)."}, status=503)
+
+    g = request.GET
+    agrupar = _lista(g.get("agrupar")) or ["anio", "mes"]
+    medidas = _lista(g.get("medidas")) or list(MEDIDAS)
+    if any(d not in DIMENSIONES for d in agrupar) or len(set(agrupar)) != len(agrupar):
+        return JsonResponse({"detail": f"agrupar inválido. Valores: {list(DIMENSIONES)}"}, status=400)
+    if any(m not in MEDIDAS for m in medidas):
+        return JsonResponse({"detail": f"medidas inválidas. Valores: {list(MEDIDAS)}"}, status=400)
+
+    filtros = {}
+    try:
+        if g.get("desde"):
+            filtros["desde"] = _anio_mes(g["desde"])
+        if g.get("hasta"):
+            filtros["hasta"] = _anio_mes(g["hasta"])
+        for dim in ("tipo_cliente", "tipo_transaccion", "categoria", "producto", "cliente"):
+            if g.get(dim):
+                filtros[dim] = [int(x) for x in _lista(g[dim])]
+        top = int(g["top"]) if g.get("top") else None
+    except ValueError:
+        return JsonResponse({"detail": "desde/hasta YYYY-MM; filtros de dimensión y top enteros."}, status=400)
+    if top is not None and top < 1:
+        return JsonResponse({"detail": "top debe ser > 0."}, status=400)
+
+    try:
+        filas = cubo_rentabilidad.consultar(agrupar, filtros, medidas, ordenar=g.get("ordenar") or None, top=top)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    except CuboNoDisponible as e:
+        return JsonResponse({"detail": str(e)}, status=503)
+
+    # nombres de los catálogos: una consulta por tipo para todas las filas
+    cg = cargadores_de(request)
+    for dim in agrupar:
+        if dim in _NOMBRES:
+            cg[_NOMBRES[dim][0]].registrar(f[dim] for f in filas)
+        elif dim == "cliente":
+            cg["cliente"].registrar(f[dim] for f in filas)
+    for f in filas:
+        for dim in agrupar:
+            if dim in _NOMBRES:
+                tipo, campo = _NOMBRES[dim]
+                f[f"nombre_{dim}"] = (cg[tipo].get(f[dim]) or {}).get(campo)
+            elif dim == "cliente":
+                f["nombre_cliente"] = nombre_cliente(cg, f[dim])
+        for m in medidas:
+            if m in ESCALAS:
+                f[m] = str(Decimal(f[m]).scaleb(-ESCALAS[m]))
+
+    return JsonResponse({"agrupar": agrupar, "medidas": medidas, "filas": filas})
+
+
+@csrf_exempt
+def cubo_rentabilidad_estado(request):
+    """
+    GET  /cubo/estado/ -> { disponible, cargado, filas, bytes_columnas, bytes_total, cargas, refrescos, ... }
+    POST /cubo/estado/ -> recarga completa y devuelve el estado
+    """
+    if request.method == "POST":
+        if not disponible():
+            return JsonResponse({"detail": "Cubo no disponible (requiere numpy y CUBO_RENTABILIDAD=True)."}, status=503)
+        cubo_rentabilidad.cargar()
+        return JsonResponse(cubo_rentabilidad.stats())
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET", "POST"])
+    return JsonResponse(cubo_rentabilidad.stats())
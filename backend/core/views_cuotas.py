@@ -4,75 +4,83 @@ from decimal import Decimal
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.db import connection, IntegrityError
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
 from django.utils import timezone
 from .models import CuotaCredito, Venta
+from .fechas import dim_fecha_cache, filtro_rango_fechas
+from .cache_datos import invalidar
+from .paginacion import paginar, tamano_pagina, CursorInvalido
+from .cargadores import cargadores_de, nombre_cliente, registrar_clientes_de_ventas
 
 def _fecha_iso_from_id(id_fecha: int) -> str | None:
-    with connection.cursor() as cur:
-        cur.execute("SELECT fecha FROM dim_fecha WHERE id_fecha = %s", [id_fecha])
-        row = cur.fetchone()
-    return row[0].isoformat() if row and row[0] else None
+    return dim_fecha_cache.iso_de(id_fecha)
 
 def _id_fecha_from_iso(iso_str: str) -> int | None:
-    with connection.cursor() as cur:
-        cur.execute("SELECT id_fecha FROM dim_fecha WHERE fecha = %s", [iso_str])
-        row = cur.fetchone()
-    return int(row[0]) if row else None
+    return dim_fecha_cache.id_de(iso_str)
 
 @csrf_exempt
 def cuotas_list(request):
     """
-    GET /cuotas/?page=&page_size=&q=&desde=&hasta=&id_venta=
+    GET /cuotas/?page=&page_size=&q=&desde=&hasta=&id_venta=&cursor=&count=false|estimado
       - Solo lectura
-      - Devuelve: id_cuota, id_venta, numero_cuota, id_fecha_venc, fecha_venc_iso, monto_programado
+      - Devuelve: id_cuota, id_venta, cliente, numero_cuota, id_fecha_venc, fecha_venc_iso, monto_programado
+      - cliente: por lotes (cargadores), 2 consultas por página
+      - Filtros, conteo y paginación se resuelven en SQL (desde/hasta usan IX_cuota_fecha_venc)
     """
     if request.method != "GET":
         return HttpResponseNotAllowed(["GET"])
 
-    page = int(request.GET.get("page") or 1)
-    page_size = int(request.GET.get("page_size") or 10)
+    page_size = tamano_pagina(request)
     q = (request.GET.get("q") or "").strip().lower()
     desde = request.GET.get("desde")
     hasta = request.GET.get("hasta")
     id_venta = request.GET.get("id_venta")
 
-    qs = CuotaCredito.objects.all().order_by('id_venta', 'numero_cuota')
+    try:
+        qs = CuotaCredito.objects.filter(filtro_rango_fechas("id_fecha_venc", desde, hasta))
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
     if id_venta:
         try:
             qs = qs.filter(id_venta_id=int(id_venta))
         except:
             pass
+    if q:
+        # mismo texto que se buscaba antes en Python: "venta:<id> n:<numero> <YYYY-MM-DD>"
+        qs = qs.annotate(texto=Concat(
+            Value("venta:"), Cast("id_venta", CharField()),
+            Value(" n:"), Cast("numero_cuota", CharField()),
+            Value(" "), Cast("id_fecha_venc__fecha", CharField()),
+            output_field=CharField(),
+        )).filter(texto__icontains=q)
+
+    # (id_venta, numero_cuota) es único (UQ_cuota_venta_num): orden total para el cursor
+    orden = ["id_venta", "numero_cuota"]
+    qs = qs.values_list("id_cuota", "id_venta_id", "numero_cuota", "id_fecha_venc_id",
+                        "id_fecha_venc__fecha", "monto_programado")
+    try:
+        rows, meta = paginar(request, qs, orden, page_size, clave=lambda r: [r[1], r[2]])
+    except CursorInvalido as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    cg = cargadores_de(request)
+    registrar_clientes_de_ventas(cg, (r[1] for r in rows))
+    items = [
+        {
+            "id_cuota": id_cuota,
+            "id_venta": id_v,
+            "cliente": nombre_cliente(cg, (cg["venta"].get(id_v) or {}).get("id_cliente_id")),
+            "numero_cuota": numero,
+            "id_fecha_venc": id_fecha_venc,
+            "fecha_venc_iso": fecha.isoformat() if fecha else None,
+            "monto_programado": str(monto),
+        }
+        for id_cuota, id_v, numero, id_fecha_venc, fecha, monto in rows
+    ]
 
-    items = []
-    for c in qs:
-        iso = _fecha_iso_from_id(int(c.id_fecha_venc))
-        # filtros de fecha
-        if desde and (not iso or iso < desde):
-            continue
-        if hasta and (not iso or iso > hasta):
-            continue
-        # filtro de texto
-        texto = f"venta:{c.id_venta_id} n:{c.numero_cuota} {iso or ''}".lower()
-        if q and q not in texto:
-            continue
-
-        items.append({
-            "id_cuota": c.id_cuota,
-            "id_venta": c.id_venta_id,
-            "numero_cuota": c.numero_cuota,
-            "id_fecha_venc": c.id_fecha_venc,
-            "fecha_venc_iso": iso,
-            "monto_programado": str(c.monto_programado),
-        })
-
-    total = len(items)
-    start = (page - 1) * page_size
-    end = start + page_size
     return JsonResponse({
-        "count": total,
-        "next": None,
-        "previous": None,
-        "results": items[start:end],
+        **meta,
+        "results": items,
     })
 
 
@@ -122,6 +130,7 @@ def cuota_asignar_pago(request, id_cuota: int):
                 INSERT INTO pagos (id_venta, id_fecha, monto_pago, fecha_creacion, usuario_creacion)
                 VALUES (%s, %s, %s, %s, %s)
             """, [cuota.id_venta_id, id_fecha, str(monto), now, user])
+        invalidar("pagos")
     except IntegrityError as e:
         return JsonResponse({"detail": f"Violación de integridad: {e}"}, status=400)
 
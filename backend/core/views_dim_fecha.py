@@ -1,8 +1,8 @@
 # core/views_dim_fecha.py
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
 from django.views.decorators.csrf import csrf_exempt
-from .models import DimFecha
 from django.utils.dateparse import parse_date
+from .fechas import dim_fecha_cache
 
 @csrf_exempt
 def dim_fecha_lookup(request):
@@ -15,12 +15,10 @@ def dim_fecha_lookup(request):
     d = parse_date(fecha_str)
     if not d:
         return JsonResponse({"detail": "Parámetro 'fecha' (YYYY-MM-DD) es obligatorio."}, status=400)
-    obj = DimFecha.objects.filter().extra(where=["fecha = %s"], params=[d]).values("id_fecha").first()
-    # Nota: como no mapeamos el campo fecha en el modelo, usamos extra() para comparar por nombre de columna;
-    # si prefieres, mapea 'fecha = models.DateField(db_column="fecha")' y usa filter(fecha=d).
-    if not obj:
+    id_fecha = dim_fecha_cache.id_de(d)
+    if not id_fecha:
         return JsonResponse({"detail": f"No existe en dim_fecha: {fecha_str}"}, status=404)
-    return JsonResponse({"id_fecha": obj["id_fecha"], "fecha": fecha_str})
+    return JsonResponse({"id_fecha": id_fecha, "fecha": fecha_str})
 
 @csrf_exempt
 def dim_fecha_detail(request, id_fecha):
@@ -29,12 +27,16 @@ def dim_fecha_detail(request, id_fecha):
     """
     if request.method != "GET":
         return HttpResponseNotAllowed(["GET"])
-    # Igual que arriba: si mapeas campo fecha en el modelo puedes acceder directo; aquí usamos raw SQL liviano.
-    from django.db import connection
-    with connection.cursor() as cur:
-        cur.execute("SELECT fecha FROM dim_fecha WHERE id_fecha = %s", [id_fecha])
-        row = cur.fetchone()
-    if not row:
+    fecha = dim_fecha_cache.iso_de(id_fecha)
+    if not fecha:
         raise Http404("id_fecha no encontrado")
-    fecha = row[0].isoformat()
     return JsonResponse({"id_fecha": id_fecha, "fecha": fecha})
+
+@csrf_exempt
+def dim_fecha_cache_stats(request):
+    """
+    GET /dim-fecha/cache/ -> { cargada, filas, hits, misses, hit_ratio }
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    return JsonResponse(dim_fecha_cache.stats())
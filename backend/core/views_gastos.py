@@ -1,31 +1,21 @@
 # core/views_gastos.py
 import json
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.db import IntegrityError
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from .models import Gasto, CategoriaGasto, DimFecha
+from .paginacion import paginar, tamano_pagina, CursorInvalido
+from .validacion import validador_de
 import traceback
 from decimal import Decimal, InvalidOperation
 
 
-def _page_links(request, page_obj):
-    base = request.build_absolute_uri(request.path)
-    qd = request.GET.copy()
-    def url_for(n):
-        qd['page'] = n
-        return f"{base}?{qd.urlencode()}"
-    next_url = url_for(page_obj.next_page_number()) if page_obj.has_next() else None
-    prev_url = url_for(page_obj.previous_page_number()) if page_obj.has_previous() else None
-    return next_url, prev_url
-
-
 @csrf_exempt
 def gastos_list(request):
     """
-    GET  /gastos/?search=&page=&page_size=&id_categoria_gastos=
+    GET  /gastos/?search=&page=&page_size=&cursor=&count=false|estimado&id_categoria_gastos=
     POST /gastos/ {
       "nombre_gasto": "...",
       "monto_gasto": 0,
@@ -36,11 +26,10 @@ def gastos_list(request):
     # === GET (listar/paginar) ===
     if request.method == "GET":
         search = (request.GET.get("search") or "").strip()
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
         cat = request.GET.get("id_categoria_gastos")
 
-        qs = Gasto.objects.select_related('id_categoria_gastos').all()
+        qs = Gasto.objects.select_related('id_categoria_gastos', 'id_fecha').all()
         if search:
             qs = qs.filter(Q(nombre_gasto__icontains=search))
         if cat:
@@ -49,29 +38,26 @@ def gastos_list(request):
             except ValueError:
                 pass
 
-        paginator = Paginator(qs, page_size)
-        page_obj = paginator.get_page(page)
-        next_url, prev_url = _page_links(request, page_obj)
+        try:
+            items, meta = paginar(request, qs, ["id_gasto"], page_size)
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": paginator.count,
-            "next": next_url,
-            "previous": prev_url,
+            **meta,
             "results": [
                 {
                     "id_gasto": o.id_gasto,
                     "nombre_gasto": o.nombre_gasto,
                     "monto_gasto": str(o.monto_gasto),
-                    "id_fecha": o.id_fecha,
-                    "fecha": (lambda: __import__("django.db").db.connection.cursor().execute(
-                    "SELECT fecha FROM dim_fecha WHERE id_fecha = %s", [o.id_fecha]
-                    ) or None) and None,  # placeholder para inline, lo reemplazamos abajo por helper
+                    "id_fecha": o.id_fecha_id,
+                    "fecha": o.id_fecha.fecha.isoformat() if o.id_fecha_id else None,
                     "id_categoria_gastos": o.id_categoria_gastos_id,
                     "nombre_categoria_gasto": o.id_categoria_gastos.nombre_categoria if o.id_categoria_gastos else None,
                     "fecha_creacion": o.fecha_creacion.isoformat() if o.fecha_creacion else None,
                     "fecha_modificacion": o.fecha_modificacion.isoformat() if o.fecha_modificacion else None,
                 }
-                for o in page_obj.object_list
+                for o in items
             ],
         }
         return JsonResponse(data)
@@ -112,19 +98,18 @@ def gastos_list(request):
             return JsonResponse({"detail": "id_categoria_gastos es obligatorio (int)."}, status=400)
 
         # existencia en tablas relacionadas
-        if not DimFecha.objects.filter(pk=id_fecha).exists():
+        faltan = validador_de(request).validar(dim_fecha=id_fecha, categoria_gastos=cat_id)
+        if "dim_fecha" in faltan:
             return JsonResponse({"detail": f"id_fecha={id_fecha} no existe en dim_fecha."}, status=400)
-        try:
-            cat = CategoriaGasto.objects.get(pk=cat_id)
-        except CategoriaGasto.DoesNotExist:
+        if "categoria_gastos" in faltan:
             return JsonResponse({"detail": "Categoría de gasto inválida."}, status=400)
 
         try:
             obj = Gasto.objects.create(
                 nombre_gasto=nombre,
                 monto_gasto=monto_dec,
-                id_fecha=id_fecha,
-                id_categoria_gastos=cat,
+                id_fecha_id=id_fecha,
+                id_categoria_gastos_id=cat_id,
                 fecha_creacion=timezone.now(),
                 usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
             )
@@ -132,7 +117,7 @@ def gastos_list(request):
                 "id_gasto": obj.id_gasto,
                 "nombre_gasto": obj.nombre_gasto,
                 "monto_gasto": str(obj.monto_gasto),
-                "id_fecha": obj.id_fecha,
+                "id_fecha": obj.id_fecha_id,
                 "id_categoria_gastos": obj.id_categoria_gastos_id,
             }, status=201)
 
@@ -155,7 +140,7 @@ def gastos_detail(request, id_gasto):
     DELETE /gastos/<id>/
     """
     try:
-        obj = Gasto.objects.get(pk=id_gasto)
+        obj = Gasto.objects.select_related('id_fecha').get(pk=id_gasto)
     except Gasto.DoesNotExist:
         raise Http404("Gasto no encontrado")
 
@@ -165,8 +150,8 @@ def gastos_detail(request, id_gasto):
             "id_gasto": obj.id_gasto,
             "nombre_gasto": obj.nombre_gasto,
             "monto_gasto": str(obj.monto_gasto),
-            "id_fecha": obj.id_fecha,
-            "fecha": str(DimFecha.objects.get(pk=obj.id_fecha).fecha),
+            "id_fecha": obj.id_fecha_id,
+            "fecha": obj.id_fecha.fecha.isoformat(),
             "id_categoria_gastos": obj.id_categoria_gastos_id,
         })
 
@@ -203,17 +188,16 @@ def gastos_detail(request, id_gasto):
         except Exception:
             return JsonResponse({"detail": "id_categoria_gastos es obligatorio (int)."}, status=400)
 
-        if not DimFecha.objects.filter(pk=id_fecha).exists():
+        faltan = validador_de(request).validar(dim_fecha=id_fecha, categoria_gastos=cat_id)
+        if "dim_fecha" in faltan:
             return JsonResponse({"detail": f"id_fecha={id_fecha} no existe en dim_fecha."}, status=400)
-        try:
-            cat = CategoriaGasto.objects.get(pk=cat_id)
-        except CategoriaGasto.DoesNotExist:
+        if "categoria_gastos" in faltan:
             return JsonResponse({"detail": "Categoría de gasto inválida."}, status=400)
 
         obj.nombre_gasto = nombre
         obj.monto_gasto = monto_dec
-        obj.id_fecha = id_fecha
-        obj.id_categoria_gastos = cat
+        obj.id_fecha_id = id_fecha
+        obj.id_categoria_gastos_id = cat_id
         obj.fecha_modificacion = timezone.now()
         obj.usuario_modificacion = getattr(getattr(request, "user", None), "username", None) or "web"
 
@@ -226,7 +210,7 @@ def gastos_detail(request, id_gasto):
                 "id_gasto": obj.id_gasto,
                 "nombre_gasto": obj.nombre_gasto,
                 "monto_gasto": str(obj.monto_gasto),
-                "id_fecha": obj.id_fecha,
+                "id_fecha": obj.id_fecha_id,
                 "id_categoria_gastos": obj.id_categoria_gastos_id,
             })
         except IntegrityError as e:
@@ -1,26 +1,17 @@
 # core/views_productos.py
 import json
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from .models import Producto, CategoriaProducto
-
-def _page_links(request, page_obj):
-    base = request.build_absolute_uri(request.path)
-    qd = request.GET.copy()
-    def url_for(n):
-        qd['page'] = n
-        return f"{base}?{qd.urlencode()}"
-    next_url = url_for(page_obj.next_page_number()) if page_obj.has_next() else None
-    prev_url = url_for(page_obj.previous_page_number()) if page_obj.has_previous() else None
-    return next_url, prev_url
+from .paginacion import paginar, tamano_pagina, CursorInvalido
+from .validacion import validador_de
 
 @csrf_exempt
 def productos_list(request):
     """
-    GET  /productos/?search=&page=&page_size=&id_categoria=(opcional)
+    GET  /productos/?search=&page=&page_size=&cursor=&count=false|estimado&id_categoria=(opcional)
     POST /productos/ {
         "nombre_producto": "...",
         "precio_unitario": 0,
@@ -30,8 +21,7 @@ def productos_list(request):
     """
     if request.method == "GET":
         search = (request.GET.get("search") or "").strip()
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
         id_cat = request.GET.get("id_categoria")
 
         qs = Producto.objects.select_related('id_categoria').all()
@@ -43,14 +33,13 @@ def productos_list(request):
             except ValueError:
                 pass
 
-        paginator = Paginator(qs, page_size)
-        page_obj = paginator.get_page(page)
-        next_url, prev_url = _page_links(request, page_obj)
+        try:
+            items, meta = paginar(request, qs, ["id_producto"], page_size)
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": paginator.count,
-            "next": next_url,
-            "previous": prev_url,
+            **meta,
             "results": [
                 {
                     "id_producto": o.id_producto,
@@ -62,7 +51,7 @@ def productos_list(request):
                     "fecha_creacion": o.fecha_creacion.isoformat() if o.fecha_creacion else None,
                     "fecha_modificacion": o.fecha_modificacion.isoformat() if o.fecha_modificacion else None,
                 }
-                for o in page_obj.object_list
+                for o in items
             ],
         }
         return JsonResponse(data)
@@ -92,16 +81,14 @@ def productos_list(request):
 
         if not isinstance(cat_id, int):
             return JsonResponse({"detail": "id_categoria es obligatorio."}, status=400)
-        try:
-            cat = CategoriaProducto.objects.get(pk=cat_id)
-        except CategoriaProducto.DoesNotExist:
+        if validador_de(request).validar(categoria_productos=cat_id):
             return JsonResponse({"detail": "Categoría inválida."}, status=400)
 
         obj = Producto.objects.create(
             nombre_producto=nombre,
             precio_unitario=precio_f,
             costo_unitario=costo_f,
-            id_categoria=cat,
+            id_categoria_id=cat_id,
             fecha_creacion=timezone.now(),
             usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
         )
@@ -161,15 +148,13 @@ def productos_detail(request, id_producto):
 
         if not isinstance(cat_id, int):
             return JsonResponse({"detail": "id_categoria es obligatorio."}, status=400)
-        try:
-            cat = CategoriaProducto.objects.get(pk=cat_id)
-        except CategoriaProducto.DoesNotExist:
+        if validador_de(request).validar(categoria_productos=cat_id):
             return JsonResponse({"detail": "Categoría inválida."}, status=400)
 
         obj.nombre_producto = nombre
         obj.precio_unitario = precio_f
         obj.costo_unitario = costo_f
-        obj.id_categoria = cat
+        obj.id_categoria_id = cat_id
         obj.fecha_modificacion = timezone.now()
         obj.usuario_modificacion = getattr(getattr(request, "user", None), "username", None) or "web"
         obj.save(update_fields=[
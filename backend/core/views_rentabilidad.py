@@ -0,0 +1,187 @@
+# core/views_rentabilidad.py
+"""
+Reporte de rentabilidad mensual sobre dbo.fn_resumen_mensual.
+
+La función (siete CTE sobre ventas, detalle, gastos y pagos) solo se
+ejecuta cuando cambiaron los datos: el resultado completo de cada
+combinación de filtros normalizada queda en caché con las versiones de las
+tablas que lee (cache_datos: escrituras de la app y corridas del ETL las
+invalidan). Orden y paginación se hacen sobre esa copia.
+
+Con RENTABILIDAD_AGREGADA=True la lectura sale del agregado mensual
+(core/rentabilidad.py) tal como está: lo refrescan el ETL y
+`manage.py rentabilidad_refrescar`, nunca un GET.
+
+gastos_asignados y margen_neto salen del prorrateo (core/prorrateo.py)
+con el driver pedido (?driver=, por defecto PRORRATEO_DRIVER), repartido
+sobre todos los segmentos del mes y no solo sobre los filtrados.
+"""
+import calendar
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache_datos import cacheado
+from .fechas import _a_fecha
+from .paginacion import meta_pagina, numero_pagina
+from .prorrateo import DRIVERS, asignaciones, driver_por_defecto
+from .rentabilidad import leer_resumen_agregado, usa_agregado
+
+# red de seguridad; normalmente lo invalidan las escrituras antes
+RENTABILIDAD_TTL = getattr(settings, "RENTABILIDAD_TTL", 3600)
+
+TABLAS_RENTABILIDAD = [
+    "ventas", "detalle_ventas", "gastos", "pagos", "dim_fecha",
+    "clientes", "productos", "tipo_clientes", "tipo_transacciones", "categoria_productos",
+    "agg_rentabilidad_mensual", "prorrateo_categoria_gastos", "prorrateo_pesos",
+]
+# con el agregado los hechos no se leen: sus escrituras no invalidan el reporte
+TABLAS_AGREGADO = [
+    "agg_rentabilidad_mensual", "gastos", "dim_fecha",
+    "tipo_clientes", "tipo_transacciones", "categoria_productos",
+    "prorrateo_categoria_gastos", "prorrateo_pesos",
+]
+
+COLUMNAS = [
+    "anio", "mes", "mes_inicio",
+    "id_tipo_cliente", "nombre_tipo_cliente",
+    "id_tipo_transaccion", "nombre_tipo_transaccion",
+    "id_categoria_producto", "nombre_categoria_producto",
+    "total_venta", "total_costo", "margen_bruto", "gastos_asignados", "margen_neto", "dso_dias_prom",
+]
+MONTOS = ["total_venta", "total_costo", "margen_bruto", "gastos_asignados", "margen_neto"]
+ORDEN_RENTABILIDAD = set(COLUMNAS) - {"mes_inicio"}
+
+_SQL_RESUMEN = f"""
+    SELECT {", ".join(COLUMNAS)}
+    FROM dbo.fn_resumen_mensual(%s, %s, %s, %s, %s)
+    ORDER BY anio, mes, id_tipo_cliente, id_tipo_transaccion, id_categoria_producto
+"""
+
+
+def _entero(valor):
+    return int(valor) if valor not in (None, "", "0") else None
+
+
+def normalizar_filtros(desde, hasta, id_tipo_cliente=None, id_tipo_transaccion=None, id_categoria_producto=None) -> tuple:
+    """
+    La función agrupa por mes: desde/hasta se llevan al primer/último día de
+    su mes, así "2025-06-15" y "2025-06-01" comparten la entrada de caché.
+    """
+    d, h = _a_fecha(desde), _a_fecha(hasta)
+    if d:
+        d = d.replace(day=1)
+    if h:
+        h = h.replace(day=calendar.monthrange(h.year, h.month)[1])
+    return d, h, _entero(id_tipo_cliente), _entero(id_tipo_transaccion), _entero(id_categoria_producto)
+
+
+def _consultar(filtros: tuple, driver: str) -> dict:
+    if usa_agregado():
+        filas = [dict(zip(COLUMNAS, r)) for r in leer_resumen_agregado(filtros)]
+    else:
+        with connection.cursor() as cur:
+            cur.execute(_SQL_RESUMEN, list(filtros))
+            filas = [dict(zip(COLUMNAS, r)) for r in cur.fetchall()]
+
+    # el prorrateo de la consulta (por ventas de lo filtrado) se reemplaza por el del driver
+    con_datos = [f for f in filas if f["id_tipo_cliente"] is not None]
+    asignado = asignaciones({(f["anio"], f["mes"]) for f in con_datos}, driver)
+    for f in con_datos:
+        segmento = (f["id_tipo_cliente"], f["id_tipo_transaccion"], f["id_categoria_producto"])
+        gasto = asignado[(f["anio"], f["mes"])].get(segmento, Decimal("0.00"))
+        f["gastos_asignados"] = gasto
+        f["margen_neto"] = (f["margen_bruto"] or Decimal("0")) - gasto
+    totales = {m: sum((f[m] or Decimal("0") for f in filas), Decimal("0")) for m in MONTOS}
+    return {"filas": filas, "totales": totales}
+
+
+def resumen_mensual(filtros: tuple, driver: str | None = None) -> dict:
+    """{filas, totales} de fn_resumen_mensual para `filtros` normalizados y el driver de prorrateo (memorizado)."""
+    driver = driver or driver_por_defecto()
+    tablas = TABLAS_AGREGADO if usa_agregado() else TABLAS_RENTABILIDAD
+    return cacheado("rentabilidad", tablas, [*filtros, driver],
+                    lambda: _consultar(filtros, driver), RENTABILIDAD_TTL)
+
+
+def _ordenar(filas: list[dict], ordering: list[str]) -> list[dict]:
+    """Orden estable por varias columnas; los NULL siempre al final."""
+    filas = list(filas)
+    for campo in reversed(ordering):
+        nombre, desc = campo.lstrip("-"), campo.startswith("-")
+        con = [f for f in filas if f[nombre] is not None]
+        sin = [f for f in filas if f[nombre] is None]
+        con.sort(key=lambda f: f[nombre], reverse=desc)
+        filas = con + sin
+    return filas
+
+
+def _valor_json(v):
+    # montos como texto decimal (como el resto de los endpoints): float pierde centavos
+    if isinstance(v, Decimal):
+        return str(v)
+    return v.isoformat() if isinstance(v, date) else v
+
+
+def _fila_json(f: dict) -> dict:
+    return {k: _valor_json(v) for k, v in f.items()}
+
+
+@csrf_exempt
+def rentabilidad_mensual(request):
+    """
+    GET /rentabilidad/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&id_tipo_cliente=&id_tipo_transaccion=
+                      &id_categoria_producto=&driver=ventas|unidades|costo|categoria|pesos
+                      &ordering=[-]campo[,[-]campo...]&page=&page_size=
+    -> { count, next, previous, desde, hasta, driver, totales: {total_venta, ...}, results: [fila de fn_resumen_mensual] }
+    Montos y dso_dias_prom como texto decimal.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    g = request.GET
+    for k in ("desde", "hasta"):
+        if g.get(k) and not _a_fecha(g.get(k)):
+            return JsonResponse({"detail": f"{k} debe ser YYYY-MM-DD."}, status=400)
+    try:
+        filtros = normalizar_filtros(g.get("desde"), g.get("hasta"), g.get("id_tipo_cliente"),
+                                     g.get("id_tipo_transaccion"), g.get("id_categoria_producto"))
+    except ValueError:
+        return JsonResponse({"detail": "id_tipo_cliente, id_tipo_transaccion e id_categoria_producto deben ser enteros."},
+                            status=400)
+    if filtros[0] and filtros[1] and filtros[0] > filtros[1]:
+        return JsonResponse({"detail": "desde no puede ser mayor que hasta."}, status=400)
+
+    ordering = [c.strip() for c in (g.get("ordering") or "anio,mes").split(",") if c.strip()]
+    if any(c.lstrip("-") not in ORDEN_RENTABILIDAD for c in ordering):
+        return JsonResponse({"detail": f"ordering inválido. Valores: {sorted(ORDEN_RENTABILIDAD)} (prefijo - = desc)"},
+                            status=400)
+    try:
+        page_size = max(int(g.get("page_size") or 100), 1)
+    except ValueError:
+        return JsonResponse({"detail": "page_size debe ser entero."}, status=400)
+
+    driver = g.get("driver") or driver_por_defecto()
+    if driver not in DRIVERS:
+        return JsonResponse({"detail": f"driver inválido. Valores: {list(DRIVERS)}"}, status=400)
+
+    try:
+        datos = resumen_mensual(filtros, driver)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    filas = _ordenar(datos["filas"], ordering)
+    page = numero_pagina(request, len(filas), page_size)
+    inicio = (page - 1) * page_size
+
+    return JsonResponse({
+        **meta_pagina(request, page, len(filas), inicio + page_size < len(filas)),
+        "desde": filtros[0].isoformat() if filtros[0] else None,
+        "hasta": filtros[1].isoformat() if filtros[1] else None,
+        "driver": driver,
+        "totales": {k: _valor_json(v) for k, v in datos["totales"].items()},
+        "results": [_fila_json(f) for f in filas[inicio:inicio + page_size]],
+    })
@@ -1,50 +1,38 @@
 # core/views_tipo_transacciones.py
 import json
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from .models import TipoTransaccion
-
-def _page_links(request, page_obj):
-    base = request.build_absolute_uri(request.path)
-    qd = request.GET.copy()
-    def url_for(n):
-        qd['page'] = n
-        return f"{base}?{qd.urlencode()}"
-    next_url = url_for(page_obj.next_page_number()) if page_obj.has_next() else None
-    prev_url = url_for(page_obj.previous_page_number()) if page_obj.has_previous() else None
-    return next_url, prev_url
+from .paginacion import paginar, tamano_pagina, CursorInvalido
 
 @csrf_exempt
 def tipo_transacciones_list(request):
     """
-    GET  /tipo-transacciones/?search=&page=&page_size=
+    GET  /tipo-transacciones/?search=&page=&page_size=&cursor=
     POST /tipo-transacciones/ { "nombre_tipo_transaccion": "Contado" }
     """
     if request.method == "GET":
         search = (request.GET.get("search") or "").strip()
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
 
         qs = TipoTransaccion.objects.all()
         if search:
             qs = qs.filter(Q(nombre_tipo_transaccion__icontains=search))
 
-        paginator = Paginator(qs, page_size)
-        page_obj = paginator.get_page(page)
-        next_url, prev_url = _page_links(request, page_obj)
+        try:
+            items, meta = paginar(request, qs, ["id_tipo_transaccion"], page_size)
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": paginator.count,
-            "next": next_url,
-            "previous": prev_url,
+            **meta,
             "results": [
                 {
                     "id_tipo_transaccion": o.id_tipo_transaccion,
                     "nombre_tipo_transaccion": o.nombre_tipo_transaccion,
                 }
-                for o in page_obj.object_list
+                for o in items
             ],
         }
         return JsonResponse(data)
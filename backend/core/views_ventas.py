@@ -1,52 +1,91 @@
 # core/views_ventas.py
 import json
-from decimal import Decimal
-from django.db.models import Sum
-from django.db import IntegrityError, connection
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import (Count, DateField, DecimalField, ExpressionWrapper, F, IntegerField, Min, OuterRef,
+                              Q, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+from django.db import IntegrityError, connection, transaction
 from django.http import JsonResponse, HttpResponseNotAllowed, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from .models import Venta, DetalleVenta, Cliente, TipoTransaccion, DimFecha, Producto
-
-PLAZOS_VALIDOS = [3, 6, 9, 12, 24, 36, 48]
-
-def _sum_subtotal_venta(id_venta: int) -> Decimal:
-    # la columna 'subtotal' es computada y persistida en SQL; la usamos directo
-    with connection.cursor() as cur:
-        cur.execute("SELECT ISNULL(SUM(subtotal),0) FROM detalle_ventas WHERE id_venta = %s", [id_venta])
-        row = cur.fetchone()
-    return Decimal(row[0]) if row and row[0] is not None else Decimal('0')
-
-def _fecha_iso(id_fecha: int) -> str | None:
-    with connection.cursor() as cur:
-        cur.execute("SELECT fecha FROM dim_fecha WHERE id_fecha = %s", [id_fecha])
-        row = cur.fetchone()
-    return row[0].isoformat() if row and row[0] else None
-
-def _recalcular_total_venta(id_venta: int):
-    """ total_venta_final = subtotal * (1 + interes/100) """
-    v = Venta.objects.get(pk=id_venta)
-    subtotal = _sum_subtotal_venta(id_venta)
-    interes = Decimal(v.interes or 0)
-    total = subtotal * (Decimal('1') + (interes / Decimal('100')))
-    v.total_venta_final = total.quantize(Decimal('0.01'))
-    v.fecha_modificacion = timezone.now()
-    v.save(update_fields=['total_venta_final', 'fecha_modificacion'])
+from .models import Venta, DetalleVenta, Cliente, TipoTransaccion, DimFecha, Producto, Pago, CuotaCredito, PagoCuota
+from .cuotas import (MONTO_MAXIMO, PLAZOS_VALIDOS, TIPO_CREDITO, interes_porcentaje, cotizar_plazos, total_con_interes,
+                     suspender_generacion, generar_cuotas)
+from .fechas import dim_fecha_cache, _a_fecha
+from .recalculo import marcar_venta, recalculo_diferido
+from .resumen_ventas import totales_mes
+from .validacion import validador_de
+from .cache_datos import invalidar
+from .paginacion import paginar, tamano_pagina, CursorInvalido
+
+MAX_ITEMS_BULK = 500
+
+def _fecha_iso(df: DimFecha | None) -> str | None:
+    return df.fecha.isoformat() if df and df.fecha else None
+
+# ?ordering= permitido -> campo del queryset
+ORDEN_VENTAS = {"id_venta": "id_venta", "fecha": "id_fecha__fecha", "total": "total_venta_final", "saldo": "saldo"}
+
+_DEC = DecimalField(max_digits=14, decimal_places=2)
+
+def _anotar_resumen(qs):
+    """items, pagado, saldo y próximo vencimiento por subconsultas correlacionadas (misma consulta de la página)."""
+    items = (DetalleVenta.objects.filter(id_venta=OuterRef("pk")).order_by()
+             .values("id_venta").annotate(n=Count("*")).values("n"))
+    pagado = (Pago.objects.filter(id_venta=OuterRef("pk")).order_by()
+              .values("id_venta").annotate(s=Sum("monto_pago")).values("s"))
+    # vencimiento más próximo de las cuotas con saldo (asignado en pago_cuota < programado)
+    asignado = (PagoCuota.objects.filter(id_cuota=OuterRef("pk")).order_by()
+                .values("id_cuota").annotate(s=Sum("monto_asignado")).values("s"))
+    proximo = (CuotaCredito.objects.filter(id_venta=OuterRef("pk")).order_by()
+               .annotate(asignado=Coalesce(Subquery(asignado, output_field=_DEC), Value(Decimal("0")), output_field=_DEC))
+               .filter(monto_programado__gt=F("asignado"))
+               .values("id_venta").annotate(m=Min("id_fecha_venc__fecha")).values("m"))
+    return qs.annotate(
+        items=Coalesce(Subquery(items, output_field=IntegerField()), 0),
+        pagado=Coalesce(Subquery(pagado, output_field=_DEC), Value(Decimal("0")), output_field=_DEC),
+    ).annotate(
+        saldo=ExpressionWrapper(F("total_venta_final") - F("pagado"), output_field=_DEC),
+        proximo_venc=Subquery(proximo, output_field=DateField()),
+    )
+
+def _resumen_venta(v) -> dict:
+    return {
+        "items": v.items,
+        "pagado": str(v.pagado),
+        "saldo": str(v.saldo),
+        "proximo_vencimiento": v.proximo_venc.isoformat() if v.proximo_venc else None,
+    }
 
 @csrf_exempt
 def ventas_list(request):
     """
     GET  /ventas/?page=&page_size=&search=&id_cliente=&id_tipo_transaccion=
+                 &resumen=1 (items, pagado, saldo, proximo_vencimiento)
+                 &con_saldo=1 &saldo_min=&saldo_max= &ordering=[-]id_venta|fecha|total|saldo
+                 &cursor= (keyset: next_cursor / previous_cursor en lugar de page)
+                 &count=false|estimado (sin COUNT / estimado por estadísticas)
     POST /ventas/ { id_cliente, id_tipo_transaccion, id_fecha, plazo_mes?, interes? }  (interes/plazo se ajustan automáticamente por reglas)
     """
     if request.method == "GET":
-        page = int(request.GET.get("page") or 1)
-        page_size = int(request.GET.get("page_size") or 10)
+        page_size = tamano_pagina(request)
         search = (request.GET.get("search") or "").strip()
         id_cliente = request.GET.get("id_cliente")
         id_tipo = request.GET.get("id_tipo_transaccion")
 
-        qs = Venta.objects.select_related('id_cliente', 'id_tipo_transaccion').all().order_by('-id_venta')
+        resumen = (request.GET.get("resumen") or "").lower() in ("1", "true", "si", "sí")
+        ordering = request.GET.get("ordering") or "-id_venta"
+        if ordering.lstrip("-") not in ORDEN_VENTAS:
+            return JsonResponse({"detail": f"ordering inválido. Valores: {sorted(ORDEN_VENTAS)} (prefijo - = desc)"}, status=400)
+        try:
+            saldo_min = Decimal(request.GET["saldo_min"]) if request.GET.get("saldo_min") else None
+            saldo_max = Decimal(request.GET["saldo_max"]) if request.GET.get("saldo_max") else None
+        except Exception:
+            return JsonResponse({"detail": "saldo_min / saldo_max deben ser decimales."}, status=400)
+        con_saldo = (request.GET.get("con_saldo") or "").lower() in ("1", "true", "si", "sí")
+
+        qs = Venta.objects.select_related('id_cliente', 'id_tipo_transaccion', 'id_fecha').all()
         if id_cliente:
             try: qs = qs.filter(id_cliente_id=int(id_cliente))
             except: pass
@@ -54,16 +93,31 @@ def ventas_list(request):
             try: qs = qs.filter(id_tipo_transaccion_id=int(id_tipo))
             except: pass
         if search:
-            qs = qs.filter(id_cliente__nombre_cliente__icontains=search) | qs.filter(id_cliente__apellido_cliente__icontains=search)
+            qs = qs.filter(Q(id_cliente__nombre_cliente__icontains=search) | Q(id_cliente__apellido_cliente__icontains=search))
+
+        usa_saldo = con_saldo or saldo_min is not None or saldo_max is not None or ordering.lstrip("-") == "saldo"
+        if resumen or usa_saldo:
+            qs = _anotar_resumen(qs)
+        if con_saldo:
+            qs = qs.filter(saldo__gt=0)
+        if saldo_min is not None:
+            qs = qs.filter(saldo__gte=saldo_min)
+        if saldo_max is not None:
+            qs = qs.filter(saldo__lte=saldo_max)
+        campo = ORDEN_VENTAS[ordering.lstrip("-")]
+        desc = "-" if ordering.startswith("-") else ""
+        # id_venta desempata (SQL Server no admite la misma columna dos veces en ORDER BY)
+        orden = [f"{desc}{campo}", *([f"{desc}id_venta"] if campo != "id_venta" else [])]
 
-        total = qs.count()
-        offset = (page - 1) * page_size
-        items = list(qs[offset:offset + page_size])
+        try:
+            # el count depende también de clientes (search), pagos y cuotas (saldo / próximo vencimiento)
+            items, meta = paginar(request, qs, orden, page_size,
+                                  tablas=["ventas", "clientes", "pagos", "cuota_creditos", "pago_cuota"])
+        except CursorInvalido as e:
+            return JsonResponse({"detail": str(e)}, status=400)
 
         data = {
-            "count": total,
-            "next": None,
-            "previous": None,
+            **meta,
             "results": [
                 {
                     "id_venta": v.id_venta,
@@ -71,11 +125,12 @@ def ventas_list(request):
                     "id_cliente": v.id_cliente_id,
                     "id_tipo_transaccion": v.id_tipo_transaccion_id,
                     "tipo_transaccion": v.id_tipo_transaccion.nombre_tipo_transaccion if v.id_tipo_transaccion_id else None,
-                    "id_fecha": v.id_fecha,
+                    "id_fecha": v.id_fecha_id,
                     "fecha": _fecha_iso(v.id_fecha),
                     "plazo_mes": v.plazo_mes,
                     "interes": str(v.interes),
                     "total_venta_final": str(v.total_venta_final),
+                    **(_resumen_venta(v) if resumen else {}),
                 }
                 for v in items
             ]
@@ -95,14 +150,14 @@ def ventas_list(request):
         except Exception:
             return JsonResponse({"detail": "id_cliente, id_tipo_transaccion, id_fecha deben ser enteros."}, status=400)
 
-        # validar existencia
-        if not Cliente.objects.filter(pk=id_cliente).exists():
+        # validar existencia (una consulta; trae también la tasa del tipo de cliente)
+        val = validador_de(request)
+        faltan = val.validar(cliente=id_cliente, tipo_transaccion=id_tipo, dim_fecha=id_fecha)
+        if "cliente" in faltan:
             return JsonResponse({"detail": "Cliente inválido."}, status=400)
-        try:
-            tipo = TipoTransaccion.objects.get(pk=id_tipo)
-        except TipoTransaccion.DoesNotExist:
+        if "tipo_transaccion" in faltan:
             return JsonResponse({"detail": "Tipo de transacción inválido."}, status=400)
-        if not DimFecha.objects.filter(pk=id_fecha).exists():
+        if "dim_fecha" in faltan:
             return JsonResponse({"detail": "id_fecha no existe en dim_fecha."}, status=400)
 
         # reglas de negocio
@@ -117,25 +172,23 @@ def ventas_list(request):
                 return JsonResponse({"detail": "plazo_mes es obligatorio para crédito."}, status=400)
             if plazo_mes not in PLAZOS_VALIDOS:
                 return JsonResponse({"detail": f"plazo_mes inválido. Valores: {PLAZOS_VALIDOS}"}, status=400)
-            # interés desde tipo cliente
-            cli = Cliente.objects.select_related('id_tipo_cliente').get(pk=id_cliente)
-            interes = cli.id_tipo_cliente.tasa_interes_default or 0
-            interes = Decimal(interes)
-            interes = (interes * 100) if interes <= 1 else interes
+            # interés desde tipo cliente (ya traído por la validación)
+            interes = interes_porcentaje(val.dato("cliente", id_cliente))
 
         try:
-            v = Venta.objects.create(
-                id_cliente_id=id_cliente,
-                id_tipo_transaccion_id=id_tipo,
-                id_fecha=id_fecha,
-                plazo_mes=plazo_mes,
-                interes=interes,
-                total_venta_final=Decimal('0'),  # se recalcula al tener detalle
-                fecha_creacion=timezone.now(),
-                usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
-            )
-            # recalcular por si ya hay detalle (normalmente 0 al crear)
-            _recalcular_total_venta(v.id_venta)
+            with transaction.atomic(), recalculo_diferido():
+                v = Venta.objects.create(
+                    id_cliente_id=id_cliente,
+                    id_tipo_transaccion_id=id_tipo,
+                    id_fecha_id=id_fecha,
+                    plazo_mes=plazo_mes,
+                    interes=interes,
+                    total_venta_final=Decimal('0'),  # se recalcula al tener detalle
+                    fecha_creacion=timezone.now(),
+                    usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
+                )
+                # recalcular por si ya hay detalle (normalmente 0 al crear)
+                marcar_venta(v.id_venta)
         except IntegrityError as e:
             return JsonResponse({"detail": f"Violación de integridad: {e}"}, status=400)
 
@@ -148,7 +201,7 @@ def ventas_list(request):
 @csrf_exempt
 def ventas_detail(request, id_venta):
     try:
-        v = Venta.objects.get(pk=id_venta)
+        v = Venta.objects.select_related('id_cliente', 'id_tipo_transaccion', 'id_fecha').get(pk=id_venta)
     except Venta.DoesNotExist:
         raise Http404("Venta no encontrada")
 
@@ -159,7 +212,7 @@ def ventas_detail(request, id_venta):
             "cliente": f"{v.id_cliente.nombre_cliente} {v.id_cliente.apellido_cliente}",
             "id_tipo_transaccion": v.id_tipo_transaccion_id,
             "tipo_transaccion": v.id_tipo_transaccion.nombre_tipo_transaccion if v.id_tipo_transaccion_id else None,
-            "id_fecha": v.id_fecha,
+            "id_fecha": v.id_fecha_id,
             "fecha": _fecha_iso(v.id_fecha),
             "plazo_mes": v.plazo_mes,
             "interes": str(v.interes),
@@ -179,13 +232,13 @@ def ventas_detail(request, id_venta):
         except Exception:
             return JsonResponse({"detail": "id_cliente, id_tipo_transaccion, id_fecha deben ser enteros."}, status=400)
 
-        if not Cliente.objects.filter(pk=id_cliente).exists():
+        val = validador_de(request)
+        faltan = val.validar(cliente=id_cliente, tipo_transaccion=id_tipo, dim_fecha=id_fecha)
+        if "cliente" in faltan:
             return JsonResponse({"detail": "Cliente inválido."}, status=400)
-        try:
-            tipo = TipoTransaccion.objects.get(pk=id_tipo)
-        except TipoTransaccion.DoesNotExist:
+        if "tipo_transaccion" in faltan:
             return JsonResponse({"detail": "Tipo de transacción inválido."}, status=400)
-        if not DimFecha.objects.filter(pk=id_fecha).exists():
+        if "dim_fecha" in faltan:
             return JsonResponse({"detail": "id_fecha no existe en dim_fecha."}, status=400)
 
         if id_tipo == 1:
@@ -198,22 +251,20 @@ def ventas_detail(request, id_venta):
                 return JsonResponse({"detail": "plazo_mes es obligatorio para crédito."}, status=400)
             if plazo_mes not in PLAZOS_VALIDOS:
                 return JsonResponse({"detail": f"plazo_mes inválido. Valores: {PLAZOS_VALIDOS}"}, status=400)
-            cli = Cliente.objects.select_related('id_tipo_cliente').get(pk=id_cliente)
-            interes = cli.id_tipo_cliente.tasa_interes_default or 0
-            interes = Decimal(interes)
-            interes = (interes * 100) if interes <= 1 else interes
+            interes = interes_porcentaje(val.dato("cliente", id_cliente))
 
         v.id_cliente_id = id_cliente
         v.id_tipo_transaccion_id = id_tipo
-        v.id_fecha = id_fecha
+        v.id_fecha_id = id_fecha
         v.plazo_mes = plazo_mes
         v.interes = interes
         v.fecha_modificacion = timezone.now()
         v.usuario_modificacion = getattr(getattr(request, "user", None), "username", None) or "web"
 
         try:
-            v.save(update_fields=["id_cliente","id_tipo_transaccion","id_fecha","plazo_mes","interes","fecha_modificacion","usuario_modificacion"])
-            _recalcular_total_venta(v.id_venta)
+            with transaction.atomic(), recalculo_diferido():
+                v.save(update_fields=["id_cliente","id_tipo_transaccion","id_fecha","plazo_mes","interes","fecha_modificacion","usuario_modificacion"])
+                marcar_venta(v.id_venta)
         except IntegrityError as e:
             return JsonResponse({"detail": f"Violación de integridad: {e}"}, status=400)
 
@@ -225,29 +276,354 @@ def ventas_detail(request, id_venta):
 
     return HttpResponseNotAllowed(["GET","PUT","DELETE"])
 
+_SQL_CUOTAS_ESTADO_VENTA = """
+    SELECT c.id_cuota, c.numero_cuota, c.id_fecha_venc, c.monto_programado, ISNULL(pc.pagado, 0)
+    FROM cuota_creditos c
+    LEFT JOIN (
+        SELECT pc.id_cuota, SUM(pc.monto_asignado) AS pagado
+        FROM pago_cuota pc
+        JOIN cuota_creditos c2 ON c2.id_cuota = pc.id_cuota
+        WHERE c2.id_venta = %s
+        GROUP BY pc.id_cuota
+    ) pc ON pc.id_cuota = c.id_cuota
+    WHERE c.id_venta = %s
+    ORDER BY c.numero_cuota
+"""
+
+def _estado_cuota(pagado: Decimal, programado: Decimal) -> str:
+    # mismos estados que dbo.v_cuotas_estado
+    if pagado == 0:
+        return "pendiente"
+    return "parcial" if pagado < programado else "pagada"
+
 @csrf_exempt
-def ventas_totales_mes(request):
+def ventas_full(request, id_venta):
     """
-    GET /ventas/totales-mes/  -> [{ "mes": "YYYY-MM", "total": "1234.56" }, ...]
+    GET /ventas/<id_venta>/full/
+      -> encabezado + detalle (con producto) + cuotas (pagado/pendiente desde
+         pago_cuota) + pagos + saldo, en 4 consultas fijas; conteos y sumas se
+         calculan sobre las filas ya leídas. Fechas desde la caché de dim_fecha.
     """
     if request.method != "GET":
         return HttpResponseNotAllowed(["GET"])
-    # agrupa por año-mes usando dim_fecha
+    try:
+        v = Venta.objects.select_related('id_cliente', 'id_tipo_transaccion', 'id_fecha').get(pk=id_venta)
+    except Venta.DoesNotExist:
+        raise Http404("Venta no encontrada")
+
+    detalle = list(
+        DetalleVenta.objects.filter(id_venta_id=id_venta).select_related("id_producto").order_by("id_detalle_venta")
+    )
     with connection.cursor() as cur:
-        cur.execute("""
-            SELECT 
-                CAST(YEAR(df.fecha) AS int) AS anio,
-                CAST(MONTH(df.fecha) AS int) AS mes,
-                CONVERT(DECIMAL(12,2), SUM(v.total_venta_final)) AS total
-            FROM ventas v
-            JOIN dim_fecha df ON df.id_fecha = v.id_fecha
-            GROUP BY YEAR(df.fecha), MONTH(df.fecha)
-            ORDER BY YEAR(df.fecha), MONTH(df.fecha)
-        """)
-        rows = cur.fetchall()
-    data = [{"mes": f"{r[0]}-{str(r[1]).zfill(2)}", "total": str(r[2] or 0)} for r in rows]
+        cur.execute(_SQL_CUOTAS_ESTADO_VENTA, [id_venta, id_venta])
+        cuotas = cur.fetchall()
+    pagos = list(
+        Pago.objects.filter(id_venta_id=id_venta).order_by("id_pago")
+            .values_list("id_pago", "id_fecha_id", "monto_pago")
+    )
+    fechas = dim_fecha_cache.fechas_de([c[2] for c in cuotas] + [p[1] for p in pagos])
+
+    def iso(id_fecha):
+        f = fechas.get(id_fecha)
+        return f.isoformat() if f else None
+
+    lineas, subtotal = [], Decimal('0')
+    for d in detalle:
+        sub_item = _subtotal_linea(d.cantidad, d.precio_unitario)
+        subtotal += sub_item
+        lineas.append({
+            "id_detalle_venta": d.id_detalle_venta,
+            "id_producto": d.id_producto_id,
+            "producto": d.id_producto.nombre_producto,
+            "cantidad": str(d.cantidad),
+            "precio_unitario": str(d.precio_unitario),
+            "costo_unitario_venta": str(d.costo_unitario_venta),
+            "subtotal": str(sub_item),
+        })
+
+    items_cuotas, programado, asignado = [], Decimal('0'), Decimal('0')
+    for id_cuota, numero, id_fecha_venc, monto, pagado in cuotas:
+        monto, pagado = Decimal(monto), Decimal(pagado)
+        programado += monto
+        asignado += pagado
+        items_cuotas.append({
+            "id_cuota": id_cuota,
+            "numero_cuota": numero,
+            "id_fecha_venc": id_fecha_venc,
+            "fecha_venc_iso": iso(id_fecha_venc),
+            "monto_programado": str(monto),
+            "monto_pagado": str(pagado),
+            "saldo_pendiente": str(monto - pagado),
+            "estado": _estado_cuota(pagado, monto),
+        })
+
+    total_pagado = sum((Decimal(p[2]) for p in pagos), Decimal('0'))
+    total = Decimal(v.total_venta_final)
+
+    return JsonResponse({
+        "id_venta": v.id_venta,
+        "id_cliente": v.id_cliente_id,
+        "cliente": f"{v.id_cliente.nombre_cliente} {v.id_cliente.apellido_cliente}",
+        "id_tipo_transaccion": v.id_tipo_transaccion_id,
+        "tipo_transaccion": v.id_tipo_transaccion.nombre_tipo_transaccion if v.id_tipo_transaccion_id else None,
+        "id_fecha": v.id_fecha_id,
+        "fecha": _fecha_iso(v.id_fecha),
+        "plazo_mes": v.plazo_mes,
+        "interes": str(v.interes),
+        "total_venta_final": str(total),
+        "detalle": {"count": len(lineas), "subtotal": str(subtotal), "results": lineas},
+        "cuotas": {
+            "count": len(items_cuotas),
+            "monto_programado": str(programado),
+            "monto_pagado": str(asignado),
+            "saldo_pendiente": str(programado - asignado),
+            "results": items_cuotas,
+        },
+        "pagos": {
+            "count": len(pagos),
+            "total": str(total_pagado),
+            "sin_asignar": str(total_pagado - asignado),
+            "results": [
+                {"id_pago": id_pago, "id_fecha": id_fecha, "fecha": iso(id_fecha), "monto_pago": str(monto)}
+                for id_pago, id_fecha, monto in pagos
+            ],
+        },
+        "saldo": str(total - total_pagado),
+    })
+
+def _anio_mes(valor: str) -> tuple[int, int] | None:
+    """'YYYY-MM' o 'YYYY-MM-DD' -> (anio, mes)."""
+    try:
+        anio, mes = (int(x) for x in valor.strip()[:7].split("-"))
+    except ValueError:
+        return None
+    return (anio, mes) if 1 <= mes <= 12 else None
+
+@csrf_exempt
+def ventas_totales_mes(request):
+    """
+    GET /ventas/totales-mes/?desde=YYYY-MM&hasta=YYYY-MM&id_tipo_cliente=&id_tipo_transaccion=&por_tipo_cliente=1
+      -> [{ "mes": "YYYY-MM", "total": "1234.56", "ventas": 10,
+            "total_contado": "...", "total_credito": "...", "ventas_contado": 4, "ventas_credito": 6,
+            "por_tipo_cliente": [{ id_tipo_cliente, total, ventas, ... }]   (con por_tipo_cliente=1) }, ...]
+    Lee resumen_ventas_mensual (ver core/resumen_ventas.py).
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    g = request.GET
+    desde = _anio_mes(g["desde"]) if g.get("desde") else None
+    hasta = _anio_mes(g["hasta"]) if g.get("hasta") else None
+    if (g.get("desde") and not desde) or (g.get("hasta") and not hasta):
+        return JsonResponse({"detail": "desde / hasta deben ser YYYY-MM o YYYY-MM-DD."}, status=400)
+    try:
+        id_tipo_cliente = int(g["id_tipo_cliente"]) if g.get("id_tipo_cliente") else None
+        id_tipo = int(g["id_tipo_transaccion"]) if g.get("id_tipo_transaccion") else None
+    except ValueError:
+        return JsonResponse({"detail": "id_tipo_cliente / id_tipo_transaccion deben ser enteros."}, status=400)
+    por_tipo = (g.get("por_tipo_cliente") or "").lower() in ("1", "true", "si", "sí")
+
+    def _montos(total, ventas, total_cred, ventas_cred):
+        total, total_cred = total or Decimal("0"), total_cred or Decimal("0")
+        return {
+            "total": str(total),
+            "ventas": ventas,
+            "total_contado": str(total - total_cred),
+            "total_credito": str(total_cred),
+            "ventas_contado": ventas - ventas_cred,
+            "ventas_credito": ventas_cred,
+        }
+
+    rows = totales_mes(desde, hasta, id_tipo_cliente, id_tipo, por_tipo_cliente=por_tipo)
+    data = []
+    if not por_tipo:
+        for anio, mes, *montos in rows:
+            data.append({"mes": f"{anio}-{str(mes).zfill(2)}", **_montos(*montos)})
+        return JsonResponse(data, safe=False)
+
+    # por tipo de cliente: filas (anio, mes, id_tipo_cliente) -> un ítem por mes
+    meses = {}
+    for anio, mes, id_tc, *montos in rows:
+        meses.setdefault((anio, mes), []).append({"id_tipo_cliente": id_tc, **_montos(*montos)})
+    for (anio, mes), segmentos in meses.items():
+        data.append({
+            "mes": f"{anio}-{str(mes).zfill(2)}",
+            **_montos(sum((Decimal(s["total"]) for s in segmentos), Decimal("0")),
+                      sum(s["ventas"] for s in segmentos),
+                      sum((Decimal(s["total_credito"]) for s in segmentos), Decimal("0")),
+                      sum(s["ventas_credito"] for s in segmentos)),
+            "por_tipo_cliente": segmentos,
+        })
     return JsonResponse(data, safe=False)
 
+def _subtotal_linea(cantidad: Decimal, precio: Decimal) -> Decimal:
+    # igual que la columna computada: CONVERT(DECIMAL(12,2), cantidad * precio_unitario)
+    return (Decimal(cantidad) * Decimal(precio)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+@csrf_exempt
+def ventas_crear_completa(request):
+    """
+    POST /ventas/completa/
+      { id_cliente, id_tipo_transaccion, id_fecha | fecha, plazo_mes?,
+        detalle: [{ id_producto, cantidad }, ...] }
+    Crea encabezado + líneas + cuotas en una transacción. Las FKs se validan
+    en lote (cliente+tasa, tipo y productos en una consulta; la fecha desde
+    la caché), el total se calcula antes de insertar y las cuotas se generan
+    una sola vez a partir del total final.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"detail": "JSON inválido"}, status=400)
+
+    try:
+        id_cliente = int(payload.get("id_cliente"))
+        id_tipo = int(payload.get("id_tipo_transaccion"))
+    except Exception:
+        return JsonResponse({"detail": "id_cliente, id_tipo_transaccion deben ser enteros."}, status=400)
+    if payload.get("id_fecha") is not None:
+        try:
+            id_fecha = int(payload.get("id_fecha"))
+        except (TypeError, ValueError):
+            return JsonResponse({"detail": "id_fecha debe ser entero."}, status=400)
+        if not dim_fecha_cache.fecha_de(id_fecha):
+            return JsonResponse({"detail": "id_fecha no existe en dim_fecha."}, status=400)
+    else:
+        id_fecha = dim_fecha_cache.id_de(payload.get("fecha"))
+        if not id_fecha:
+            return JsonResponse({"detail": "id_fecha o fecha (YYYY-MM-DD existente en dim_fecha) es obligatorio."}, status=400)
+
+    lineas = payload.get("detalle") or []
+    if not isinstance(lineas, list) or not lineas:
+        return JsonResponse({"detail": "detalle debe ser una lista con al menos un ítem."}, status=400)
+    if len(lineas) > MAX_ITEMS_BULK:
+        return JsonResponse({"detail": f"Máximo {MAX_ITEMS_BULK} ítems por venta."}, status=400)
+    items, errores = [], []
+    for i, it in enumerate(lineas):
+        try:
+            id_producto = int(it["id_producto"])
+            cant = Decimal(str(it.get("cantidad")))
+            if not cant.is_finite() or cant <= 0:
+                raise ValueError()
+        except Exception:
+            errores.append({"indice": i, "detail": "id_producto entero y cantidad > 0 son obligatorios."})
+            continue
+        items.append((i, id_producto, cant))
+    conteo = Counter(p for _, p, _ in items)
+    errores += [{"indice": i, "detail": "Producto repetido en detalle."} for i, p, _ in items if conteo[p] > 1]
+
+    # --- FKs en lote: cliente+tasa, tipo y productos (precio/costo) en una consulta ---
+    val = validador_de(request)
+    faltan = val.validar(cliente=id_cliente, tipo_transaccion=id_tipo, producto=[p for _, p, _ in items])
+    if "cliente" in faltan:
+        return JsonResponse({"detail": "Cliente inválido."}, status=400)
+    if "tipo_transaccion" in faltan:
+        return JsonResponse({"detail": "Tipo de transacción inválido."}, status=400)
+    tasa = val.dato("cliente", id_cliente)
+    errores += [{"indice": i, "detail": "Producto inválido."} for i, p, _ in items if not val.existe("producto", p)]
+    if errores:
+        return JsonResponse({"detail": "Detalle inválido.", "errores": sorted(errores, key=lambda e: e["indice"])}, status=400)
+
+    # reglas de negocio (mismas que POST /ventas/)
+    if id_tipo == TIPO_CREDITO:
+        try:
+            plazo_mes = int(payload.get("plazo_mes"))
+        except Exception:
+            return JsonResponse({"detail": "plazo_mes es obligatorio para crédito."}, status=400)
+        if plazo_mes not in PLAZOS_VALIDOS:
+            return JsonResponse({"detail": f"plazo_mes inválido. Valores: {PLAZOS_VALIDOS}"}, status=400)
+        interes = interes_porcentaje(tasa)
+    else:
+        plazo_mes = 0
+        interes = Decimal('0')
+
+    precios = {p: (val.dato("producto", p, 0), val.dato("producto", p, 1)) for _, p, _ in items}
+    subtotal = sum((_subtotal_linea(c, precios[p][0]) for _, p, c in items), Decimal('0'))
+    total = total_con_interes(subtotal, interes)
+    usuario = getattr(getattr(request, "user", None), "username", None) or "web"
+    ahora = timezone.now()
+
+    try:
+        with transaction.atomic(), suspender_generacion():
+            v = Venta.objects.create(
+                id_cliente_id=id_cliente,
+                id_tipo_transaccion_id=id_tipo,
+                id_fecha_id=id_fecha,
+                plazo_mes=plazo_mes,
+                interes=interes,
+                total_venta_final=total,
+                fecha_creacion=ahora,
+                usuario_creacion=usuario,
+            )
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(
+                    id_venta=v,
+                    id_producto_id=p,
+                    cantidad=c,
+                    precio_unitario=Decimal(precios[p][0]),
+                    costo_unitario_venta=Decimal(precios[p][1]),
+                    fecha_creacion=ahora,
+                    usuario_creacion=usuario,
+                )
+                for _, p, c in items
+            ])
+            invalidar("detalle_ventas")  # bulk_create no envía post_save
+            cuotas = generar_cuotas(v.id_venta, total, plazo_mes, id_fecha, usuario) if plazo_mes > 0 else 0
+    except IntegrityError as e:
+        return JsonResponse({"detail": f"Violación de integridad: {e}"}, status=400)
+
+    return JsonResponse({
+        "id_venta": v.id_venta,
+        "plazo_mes": plazo_mes,
+        "interes": str(interes),
+        "subtotal": str(subtotal),
+        "total_venta_final": str(total),
+        "items": len(items),
+        "cuotas": cuotas,
+    }, status=201)
+
+@csrf_exempt
+def ventas_cotizar(request):
+    """
+    GET /ventas/cotizar/?id_cliente=&subtotal=&fecha=YYYY-MM-DD&plazos=3,6,12
+      -> plan de cuotas de cada plazo (por defecto todos los PLAZOS_VALIDOS)
+         con la tasa del tipo de cliente, sin crear la venta.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        id_cliente = int(request.GET.get("id_cliente"))
+        subtotal = Decimal(request.GET.get("subtotal"))
+    except Exception:
+        return JsonResponse({"detail": "id_cliente (entero) y subtotal (decimal) son obligatorios."}, status=400)
+    if not subtotal.is_finite() or not 0 < subtotal <= MONTO_MAXIMO:
+        return JsonResponse({"detail": f"subtotal debe ser mayor que 0 y como máximo {MONTO_MAXIMO}."}, status=400)
+
+    fecha = _a_fecha(request.GET.get("fecha")) if request.GET.get("fecha") else timezone.localdate()
+    if not fecha:
+        return JsonResponse({"detail": "fecha debe ser YYYY-MM-DD."}, status=400)
+
+    plazos = PLAZOS_VALIDOS
+    if request.GET.get("plazos"):
+        try:
+            plazos = [int(p) for p in request.GET["plazos"].split(",") if p.strip()]
+        except ValueError:
+            return JsonResponse({"detail": "plazos debe ser una lista de enteros separada por comas."}, status=400)
+        if not plazos or any(p not in PLAZOS_VALIDOS for p in plazos):
+            return JsonResponse({"detail": f"plazo_mes inválido. Valores: {PLAZOS_VALIDOS}"}, status=400)
+
+    val = validador_de(request)
+    if val.validar(cliente=id_cliente):
+        return JsonResponse({"detail": "Cliente inválido."}, status=400)
+    tasa = val.dato("cliente", id_cliente)
+
+    try:
+        cotizacion = cotizar_plazos(interes_porcentaje(tasa), subtotal, fecha, plazos)
+    except ValueError as e:
+        return JsonResponse({"detail": str(e)}, status=400)
+    return JsonResponse({"id_cliente": id_cliente, **cotizacion})
+
 # ===== Detalle de ventas =====
 
 @csrf_exempt
@@ -265,9 +641,11 @@ def detalle_ventas_list(request, id_venta: int):
     if request.method == "GET":
         qs = DetalleVenta.objects.filter(id_venta=venta).select_related("id_producto").order_by("id_detalle_venta")
         results = []
+        total_sub = Decimal('0')
         for d in qs:
-            # d.subtotal no existe en el modelo; lo calculamos aquí
-            sub_item = (Decimal(d.cantidad) * Decimal(d.precio_unitario)).quantize(Decimal('0.01'))
+            # d.subtotal no existe en el modelo; lo calculamos aquí (mismo redondeo que la columna)
+            sub_item = _subtotal_linea(d.cantidad, d.precio_unitario)
+            total_sub += sub_item
             results.append({
                 "id_detalle_venta": d.id_detalle_venta,
                 "id_producto": d.id_producto_id,
@@ -277,9 +655,8 @@ def detalle_ventas_list(request, id_venta: int):
                 "costo_unitario_venta": str(d.costo_unitario_venta),
                 "subtotal": str(sub_item),
             })
-        # incluir subtotal total de la venta (SQL)
-        total_sub = _sum_subtotal_venta(id_venta)
-        return JsonResponse({"count": qs.count(), "subtotal": str(total_sub), "results": results})
+        # conteo y subtotal sobre las filas ya leídas (sin consultas extra)
+        return JsonResponse({"count": len(results), "subtotal": str(total_sub), "results": results})
 
     if request.method == "POST":
         try:
@@ -308,17 +685,18 @@ def detalle_ventas_list(request, id_venta: int):
         costo  = Decimal(str(prod.costo_unitario))
 
         try:
-            det = DetalleVenta.objects.create(
-                id_venta=venta,
-                id_producto=prod,
-                cantidad=cant,
-                precio_unitario=precio,
-                costo_unitario_venta=costo,
-                fecha_creacion=timezone.now(),
-                usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
-            )
-            # Recalcular total de la venta tras crear ítem
-            _recalcular_total_venta(venta.id_venta)
+            with transaction.atomic(), recalculo_diferido():
+                det = DetalleVenta.objects.create(
+                    id_venta=venta,
+                    id_producto=prod,
+                    cantidad=cant,
+                    precio_unitario=precio,
+                    costo_unitario_venta=costo,
+                    fecha_creacion=timezone.now(),
+                    usuario_creacion=getattr(getattr(request, "user", None), "username", None) or "web",
+                )
+                # Recalcular total de la venta tras crear ítem (en la misma transacción)
+                marcar_venta(venta.id_venta)
         except IntegrityError as e:
             msg = (str(e) or "").lower()
             if "unique" in msg or "uq_" in msg or "duplic" in msg:
@@ -334,7 +712,7 @@ def detalle_ventas_list(request, id_venta: int):
             "cantidad": str(det.cantidad),
             "precio_unitario": str(det.precio_unitario),
             "costo_unitario_venta": str(det.costo_unitario_venta),
-            "subtotal": str((Decimal(det.cantidad) * Decimal(det.precio_unitario)).quantize(Decimal("0.01"))),
+            "subtotal": str(_subtotal_linea(det.cantidad, det.precio_unitario)),
         }, status=201)
 
     return HttpResponseNotAllowed(["GET", "POST"])
@@ -356,13 +734,165 @@ def detalle_venta_detail(request, id_venta, id_detalle):
             return JsonResponse({"detail": "cantidad debe ser > 0."}, status=400)
         d.cantidad = cantidad
         d.fecha_modificacion = timezone.now()
-        d.save(update_fields=["cantidad","fecha_modificacion"])
-        _recalcular_total_venta(id_venta)
+        with transaction.atomic(), recalculo_diferido():
+            d.save(update_fields=["cantidad","fecha_modificacion"])
+            marcar_venta(id_venta)
         return JsonResponse({"detail": "Actualizado"})
 
     if request.method == "DELETE":
-        d.delete()
-        _recalcular_total_venta(id_venta)
+        with transaction.atomic(), recalculo_diferido():
+            d.delete()
+            marcar_venta(id_venta)
         return JsonResponse({"detail": "Eliminado"})
 
     return HttpResponseNotAllowed(["PUT","DELETE"])
+
+@csrf_exempt
+def detalle_ventas_bulk(request, id_venta: int):
+    """
+    POST /ventas/<id_venta>/detalle/bulk/
+      { "upserts": [{ id_producto, cantidad }, ...],   # crea o actualiza la cantidad (clave: id_producto)
+        "deletes": [id_detalle_venta, ...] }
+    Todo o nada: si algún ítem es inválido no se escribe nada (400) y se
+    indica el error por ítem. Precio/costo de ítems nuevos desde productos.
+    Consultas: venta + productos (1) + detalle actual (1) + escrituras en
+    lote; el total se recalcula una sola vez.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    if not Venta.objects.filter(pk=id_venta).exists():
+        raise Http404("Venta no encontrada")
+    try:
+        payload = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"detail": "JSON inválido"}, status=400)
+    upserts = payload.get("upserts") or []
+    deletes = payload.get("deletes") or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        return JsonResponse({"detail": "upserts y deletes deben ser listas."}, status=400)
+    if len(upserts) + len(deletes) > MAX_ITEMS_BULK:
+        return JsonResponse({"detail": f"Máximo {MAX_ITEMS_BULK} ítems por llamada."}, status=400)
+
+    usuario = getattr(getattr(request, "user", None), "username", None) or "web"
+    ahora = timezone.now()
+    resultados = []
+
+    # --- validación de forma ---
+    items = []  # (indice, id_producto, cantidad)
+    vistos = set()
+    for i, it in enumerate(upserts):
+        res = {"indice": i, "op": "upsert", "id_producto": it.get("id_producto") if isinstance(it, dict) else None}
+        resultados.append(res)
+        try:
+            id_producto = int(it["id_producto"])
+            cant = Decimal(str(it.get("cantidad")))
+            if not cant.is_finite() or cant <= 0:
+                raise ValueError()
+        except Exception:
+            res.update(status="error", detail="id_producto entero y cantidad > 0 son obligatorios.")
+            continue
+        if id_producto in vistos:
+            res.update(status="error", detail="Producto repetido en upserts.")
+            continue
+        vistos.add(id_producto)
+        items.append((i, id_producto, cant))
+
+    ids_borrar = []
+    for j, d in enumerate(deletes):
+        res = {"indice": j, "op": "delete", "id_detalle_venta": d}
+        resultados.append(res)
+        try:
+            ids_borrar.append((res, int(d)))
+        except (TypeError, ValueError):
+            res.update(status="error", detail="id_detalle_venta debe ser entero.")
+
+    # --- una consulta de productos y una del detalle actual ---
+    productos = Producto.objects.in_bulk([p for _, p, _ in items])
+    actuales = list(DetalleVenta.objects.filter(id_venta_id=id_venta))
+    por_producto = {d.id_producto_id: d for d in actuales}
+    por_id = {d.id_detalle_venta: d for d in actuales}
+
+    crear, actualizar = [], []
+    for i, id_producto, cant in items:
+        res = resultados[i]
+        det = por_producto.get(id_producto)
+        if det is not None:
+            res["id_detalle_venta"] = det.id_detalle_venta
+            if det.cantidad == cant:
+                res["status"] = "sin_cambios"
+            else:
+                det.cantidad, det.fecha_modificacion, det.usuario_modificacion = cant, ahora, usuario
+                actualizar.append(det)
+                res["status"] = "actualizado"
+            continue
+        prod = productos.get(id_producto)
+        if prod is None:
+            res.update(status="error", detail="Producto inválido.")
+            continue
+        crear.append(DetalleVenta(
+            id_venta_id=id_venta,
+            id_producto=prod,
+            cantidad=cant,
+            precio_unitario=Decimal(str(prod.precio_unitario)),
+            costo_unitario_venta=Decimal(str(prod.costo_unitario)),
+            fecha_creacion=ahora,
+            usuario_creacion=usuario,
+        ))
+        res["status"] = "creado"
+
+    borrar = []
+    for res, id_det in ids_borrar:
+        if id_det not in por_id:
+            res.update(status="error", detail="Detalle no encontrado en la venta.")
+        elif por_id[id_det].id_producto_id in vistos:
+            res.update(status="error", detail="El ítem también está en upserts.")
+        else:
+            borrar.append(id_det)
+            res["status"] = "eliminado"
+
+    if any(r.get("status") == "error" for r in resultados):
+        for r in resultados:
+            if r.get("status") != "error":
+                r["status"] = "omitido"
+        return JsonResponse({"detail": "Hay ítems inválidos; no se aplicó ningún cambio.",
+                             "resultados": resultados}, status=400)
+
+    try:
+        with transaction.atomic(), recalculo_diferido():
+            if borrar:
+                DetalleVenta.objects.filter(id_venta_id=id_venta, pk__in=borrar).delete()
+            if actualizar:
+                DetalleVenta.objects.bulk_update(actualizar, ["cantidad", "fecha_modificacion", "usuario_modificacion"])
+            if crear:
+                DetalleVenta.objects.bulk_create(crear)
+            if borrar or actualizar or crear:
+                invalidar("detalle_ventas")  # bulk_* no envía post_save
+                marcar_venta(id_venta)
+    except IntegrityError as e:
+        return JsonResponse({"detail": f"Violación de integridad: {e}", "resultados": resultados}, status=400)
+
+    # ids de los ítems creados (si el backend no los devuelve en bulk_create)
+    if crear and any(d.pk is None for d in crear):
+        nuevos = dict(DetalleVenta.objects.filter(id_venta_id=id_venta, id_producto_id__in=[d.id_producto_id for d in crear])
+                      .values_list("id_producto_id", "id_detalle_venta"))
+        for d in crear:
+            d.id_detalle_venta = nuevos.get(d.id_producto_id)
+    creados = {d.id_producto_id: d for d in crear}
+    for i, id_producto, cant in items:
+        res = resultados[i]
+        det = creados.get(id_producto) or por_producto[id_producto]
+        res.update(
+            id_detalle_venta=det.id_detalle_venta,
+            cantidad=str(det.cantidad),
+            precio_unitario=str(det.precio_unitario),
+            subtotal=str(_subtotal_linea(det.cantidad, det.precio_unitario)),
+        )
+
+    return JsonResponse({
+        "id_venta": id_venta,
+        "creados": len(crear),
+        "actualizados": len(actualizar),
+        "eliminados": len(borrar),
+        "resultados": resultados,
+    })
+
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.cobranza import reconstruir_cobranza
+
+class Command(BaseCommand):
+    help = ("Compara cobranza_ventas con pagos y cuotas y, con --reparar, la regenera. "
+            "Uso: python manage.py cobranza_reconstruir [--reparar]")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reparar", action="store_true", help="Regenera la tabla si hay diferencias")
+
+    def handle(self, *args, **opts):
+        r = reconstruir_cobranza(reparar=opts["reparar"])
+        estilo = self.style.SUCCESS if not r["diferencias"] or r["reconstruido"] else self.style.WARNING
+        self.stdout.write(estilo(
+            f"cobranza_reconstruir: {r['diferencias']} ventas con diferencia"
+            f"{', reconstruido' if r['reconstruido'] else ''}"
+        ))
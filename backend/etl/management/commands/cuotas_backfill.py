@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.cuotas import backfill_cuotas
+
+class Command(BaseCommand):
+    help = "Genera cuotas para ventas a crédito sin cuotas (cargadas por ETL). Uso: python manage.py cuotas_backfill"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=5000, help="Ventas por lote")
+        parser.add_argument("--filas-insert", type=int, default=50000, help="Cuotas por INSERT")
+        parser.add_argument("--limite", type=int, default=None, help="Máximo de ventas a procesar")
+
+    def handle(self, *args, **opts):
+        r = backfill_cuotas(lote_ventas=opts["lote"], filas_por_insert=opts["filas_insert"], limite=opts["limite"])
+        self.stdout.write(self.style.SUCCESS(
+            f"cuotas_backfill: {r['ventas']} ventas, {r['cuotas']} cuotas, "
+            f"{r['ventas_omitidas']} omitidas, {r['segundos']}s ({r['ventas_por_seg']} ventas/s)"
+        ))
@@ -0,0 +1,40 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from core.models import DimFecha
+from etl.services import generar_calendario
+
+class Command(BaseCommand):
+    help = ("Llena dim_fecha en bloque para un rango. "
+            "Uso: python manage.py dim_fecha_generar [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD | --anios N]")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha inicial (default: fecha mínima en dim_fecha u hoy)")
+        parser.add_argument("--hasta", help="Fecha final inclusive")
+        parser.add_argument("--anios", type=int, default=settings.DIM_FECHA_HORIZONTE_ANIOS,
+                            help="Años hacia adelante desde hoy si no se indica --hasta")
+        parser.add_argument("--lote", type=int, default=3660, help="Días por lote (un INSERT por lote)")
+
+    def handle(self, *args, **opts):
+        hoy = timezone.localdate()
+        try:
+            if opts["desde"]:
+                desde = date.fromisoformat(opts["desde"])
+            else:
+                desde = DimFecha.objects.aggregate(m=Min("fecha"))["m"] or hoy
+            if opts["hasta"]:
+                hasta = date.fromisoformat(opts["hasta"])
+            else:
+                hasta = date(hoy.year + opts["anios"], 12, 31)
+        except ValueError as e:
+            raise CommandError(f"Fecha inválida: {e}")
+
+        r = generar_calendario(desde, hasta, lote_dias=max(1, opts["lote"]))
+        if r["status"] != "ok":
+            raise CommandError(r["message"])
+        self.stdout.write(self.style.SUCCESS(
+            f"dim_fecha {r['desde']}..{r['hasta']}: {r['insertadas']} insertadas, "
+            f"{r['actualizadas']} actualizadas en {r['lotes']} lote(s), {r['segundos']}s"
+        ))
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
 from django.utils import timezone
 from etl.models import EtlRun
+from etl.services import pre_proceso, post_proceso
 
 class Command(BaseCommand):
     help = "Ejecuta un SP de ETL y registra auditoría. Uso: python manage.py etl_run --proc sp_nombre"
@@ -14,12 +15,14 @@ class Command(BaseCommand):
         run = EtlRun.objects.create(process=proc, status="running")
         rows = 0
         try:
+            contexto = pre_proceso(proc)
             with connection.cursor() as cur:
                 cur.execute(f"EXEC {proc}")  # SP en bd existente
                 try:
                     rows = cur.rowcount if cur.rowcount is not None else 0
                 except Exception:
                     rows = 0
+            post_proceso(proc, contexto)
             run.status = "ok"
             run.rows_affected = rows
             run.message = "OK"
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core.rentabilidad import refrescar_rentabilidad
+
+class Command(BaseCommand):
+    help = ("Refresca agg_rentabilidad_mensual (solo los meses tocados desde el último refresco). "
+            "Uso: python manage.py rentabilidad_refrescar [--completo]")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--completo", action="store_true", help="Recalcula todos los meses")
+
+    def handle(self, *args, **opts):
+        r = refrescar_rentabilidad(completo=opts["completo"])
+        self.stdout.write(self.style.SUCCESS(
+            f"rentabilidad_refrescar: {r['meses']} meses, {r['filas']} filas"
+            f"{' (completo)' if r['completo'] else ''}, {r['segundos']}s"
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.cuotas import suspender_generacion
+from core.recalculo import reconciliar_totales
+from etl.models import EtlRun
+
+class Command(BaseCommand):
+    help = ("Compara total_venta_final con el total esperado (detalle_ventas + interés) y opcionalmente "
+            "lo repara. Uso: python manage.py ventas_reconciliar [--reparar]")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reparar", action="store_true", help="Corrige las ventas con diferencia")
+        parser.add_argument("--lote", type=int, default=10000, help="Ventas por UPDATE / filas por lectura")
+        parser.add_argument("--muestra", type=int, default=20, help="Diferencias más grandes a mostrar")
+        parser.add_argument("--sin-cuotas", action="store_true",
+                            help="No re-planificar cuotas de las ventas reparadas")
+
+    def handle(self, *args, **opts):
+        run = EtlRun.objects.create(process="ventas_reconciliar", status="running")
+        try:
+            if opts["sin_cuotas"]:
+                with suspender_generacion():
+                    r = reconciliar_totales(reparar=opts["reparar"], lote=opts["lote"], muestra=opts["muestra"])
+            else:
+                r = reconciliar_totales(reparar=opts["reparar"], lote=opts["lote"], muestra=opts["muestra"])
+            run.status = "ok"
+            run.rows_affected = r["reparadas"] if opts["reparar"] else r["con_diferencia"]
+            run.message = (f"revisadas={r['revisadas']} con_diferencia={r['con_diferencia']} "
+                           f"reparadas={r['reparadas']} {r['segundos']}s")
+        except Exception as e:
+            run.status = "error"
+            run.message = str(e)
+            raise
+        finally:
+            run.finished_at = timezone.now()
+            run.save()
+
+        for m in r["muestra"]:
+            self.stdout.write(f"  venta {m['id_venta']}: guardado={m['guardado']} esperado={m['esperado']} "
+                              f"(dif {m['diferencia']})")
+        self.stdout.write(self.style.SUCCESS(
+            f"ventas_reconciliar: {r['revisadas']} revisadas ({r['revisadas_por_seg']} ventas/s), "
+            f"{r['con_diferencia']} con diferencia (suma {r['diferencia_total']}), "
+            f"{r['reparadas']} reparadas ({r['reparadas_por_seg']} ventas/s), {r['segundos']}s"
+        ))
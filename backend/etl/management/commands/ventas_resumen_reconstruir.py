@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.resumen_ventas import reconstruir_resumen_ventas
+
+class Command(BaseCommand):
+    help = ("Compara resumen_ventas_mensual con ventas y, con --reparar, lo regenera. "
+            "Uso: python manage.py ventas_resumen_reconstruir [--reparar]")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reparar", action="store_true", help="Regenera el resumen si hay diferencias")
+
+    def handle(self, *args, **opts):
+        r = reconstruir_resumen_ventas(reparar=opts["reparar"])
+        estilo = self.style.SUCCESS if not r["diferencias"] or r["reconstruido"] else self.style.WARNING
+        self.stdout.write(estilo(
+            f"ventas_resumen_reconstruir: {r['diferencias']} segmentos con diferencia"
+            f"{', reconstruido' if r['reconstruido'] else ''}"
+        ))
@@ -1,8 +1,59 @@
 # backend/etl/services.py
+import json
+import time
+from datetime import date, timedelta
+from django.conf import settings
 from django.db import connection, transaction
 from django.utils import timezone
 from etl.models import EtlRun
 
+# SPs que insertan en dim_fecha: al terminar hay que invalidar la caché de fechas
+PROCS_DIM_FECHA = {"sp_etl_cargar_dimensiones"}
+# SPs que insertan ventas con SQL (sin post_save): hay que generar sus cuotas
+PROCS_VENTAS = {"sp_etl_cargar_ventas"}
+
+def _nombre_proc(proc_name: str) -> str:
+    # 'dbo.sp_x' / '[dbo].[sp_x]' -> 'sp_x'
+    return proc_name.split(".")[-1].strip("[] ").lower()
+
+def pre_proceso(proc_name: str) -> dict:
+    """Estado previo al SP que necesita post_proceso (p.ej. último id_venta)."""
+    contexto = {}
+    if _nombre_proc(proc_name) in PROCS_VENTAS:
+        with connection.cursor() as cur:
+            cur.execute("SELECT ISNULL(MAX(id_venta), 0) FROM ventas")
+            contexto["max_id_venta"] = int(cur.fetchone()[0])
+    return contexto
+
+def post_proceso(proc_name: str, contexto: dict | None = None):
+    """Acciones posteriores a un SP exitoso (invalidación de cachés, etc.)."""
+    contexto = contexto or {}
+    from core.cache_datos import invalidar_todo
+    invalidar_todo()  # conteos y reportes: el SP pudo tocar cualquier tabla
+    if _nombre_proc(proc_name) in PROCS_DIM_FECHA:
+        from core.fechas import dim_fecha_cache
+        dim_fecha_cache.invalidar()
+    if _nombre_proc(proc_name) in PROCS_VENTAS:
+        from core.cuotas import backfill_cuotas, suspender_generacion
+        from core.recalculo import marcar_ventas, recalculo_diferido
+        if "max_id_venta" in contexto:
+            # ventas nuevas sin total en stg_ventas (quedaron en 0): total desde
+            # detalle_ventas en una pasada. El total que trae el origen no se
+            # pisa; las diferencias con el detalle las informa ventas_reconciliar.
+            with connection.cursor() as cur:
+                cur.execute("SELECT id_venta FROM ventas WHERE id_venta > %s AND total_venta_final = 0",
+                            [contexto["max_id_venta"]])
+                nuevas = [r[0] for r in cur.fetchall()]
+            with suspender_generacion(), recalculo_diferido():
+                marcar_ventas(nuevas)
+        backfill_cuotas()
+    from core.rentabilidad import refrescar_rentabilidad, usa_agregado
+    if usa_agregado():
+        refrescar_rentabilidad()
+    from core.cubo import cubo_rentabilidad, disponible
+    if disponible() and cubo_rentabilidad.cargado:
+        cubo_rentabilidad.refrescar()
+
 def run_stored_procedure(proc_name: str, user=None) -> dict:
     """
     Ejecuta un procedimiento almacenado y registra en etl_runs.
@@ -14,10 +65,12 @@ def run_stored_procedure(proc_name: str, user=None) -> dict:
     message = "OK"
 
     try:
+        contexto = pre_proceso(proc_name)
         with connection.cursor() as cur:
             cur.execute(f"EXEC {proc_name}")
             # rowcount suele ser -1 con NOCOUNT ON; lo dejamos informativo
             rows = cur.rowcount if cur.rowcount is not None else -1
+        post_proceso(proc_name, contexto)
 
     except Exception as e:
         status = "error"
@@ -35,3 +88,125 @@ def run_stored_procedure(proc_name: str, user=None) -> dict:
     )
 
     return {"status": status, "rows": rows, "message": message}
+
+
+# ===== Calendario dim_fecha =====
+
+# columnas calculadas a partir de la fecha (lunes = 0 en DATEDIFF desde 1900-01-01)
+_SQL_CALENDARIO = """
+    WITH n AS (
+        SELECT TOP (%s) CAST(ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS INT) AS i
+        FROM sys.all_objects a CROSS JOIN sys.all_objects b
+    ),
+    d AS (
+        SELECT DATEADD(DAY, n.i, CAST(%s AS DATE)) AS fecha FROM n
+    ),
+    feriados AS (
+        SELECT value AS dia FROM OPENJSON(%s)
+    ),
+    cal AS (
+        SELECT
+            d.fecha,
+            YEAR(d.fecha)  * 10000 + MONTH(d.fecha) * 100 + DAY(d.fecha) AS id_smart,
+            YEAR(d.fecha)                  AS anio,
+            MONTH(d.fecha)                 AS mes,
+            DATEPART(QUARTER, d.fecha)     AS trimestre,
+            DATEPART(ISO_WEEK, d.fecha)    AS semana_iso,
+            DAY(d.fecha)                   AS dia,
+            CHOOSE(MONTH(d.fecha), 'Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio',
+                   'Agosto','Septiembre','Octubre','Noviembre','Diciembre') AS nombre_mes,
+            CHOOSE(DATEDIFF(DAY, '19000101', d.fecha) %% 7 + 1,
+                   'Lunes','Martes','Miércoles','Jueves','Viernes','Sábado','Domingo') AS nombre_dia,
+            CASE WHEN d.fecha = EOMONTH(d.fecha) THEN 1 ELSE 0 END AS es_fin_de_mes,
+            CASE WHEN DATEDIFF(DAY, '19000101', d.fecha) %% 7 >= 5 THEN 1 ELSE 0 END AS es_fin_de_semana,
+            CASE WHEN DATEDIFF(DAY, '19000101', d.fecha) %% 7 >= 5 THEN 0
+                 WHEN EXISTS (SELECT 1 FROM feriados f
+                              WHERE f.dia IN (CONVERT(CHAR(10), d.fecha, 120), RIGHT(CONVERT(CHAR(10), d.fecha, 120), 5)))
+                 THEN 0
+                 ELSE 1 END AS es_dia_habil
+        FROM d
+        WHERE d.fecha <= CAST(%s AS DATE)
+    )
+"""
+
+def generar_calendario(desde: date, hasta: date, lote_dias: int = 3660, feriados=None, user=None) -> dict:
+    """
+    Llena dim_fecha para [desde, hasta] en lotes de `lote_dias`.
+    Cada lote es un UPDATE (completa nombres/banderas de filas ya existentes,
+    p.ej. las que insertó sp_etl_cargar_dimensiones) y un INSERT set-based de
+    las fechas faltantes. Con DIM_FECHA_SMART_KEY la clave se inserta como YYYYMMDD.
+    """
+    if hasta < desde:
+        raise ValueError("hasta debe ser >= desde")
+    if feriados is None:
+        feriados = getattr(settings, "DIM_FECHA_FERIADOS", [])
+    smart = bool(getattr(settings, "DIM_FECHA_SMART_KEY", False))
+    feriados_json = json.dumps(list(feriados))
+
+    started = timezone.now()
+    t0 = time.monotonic()
+    insertadas = actualizadas = lotes = 0
+
+    col_id = "id_fecha, " if smart else ""
+    val_id = "cal.id_smart, " if smart else ""
+    sql_update = _SQL_CALENDARIO + """
+        UPDATE df SET
+            nombre_mes = cal.nombre_mes, nombre_dia = cal.nombre_dia,
+            es_fin_de_mes = cal.es_fin_de_mes, es_fin_de_semana = cal.es_fin_de_semana,
+            es_dia_habil = cal.es_dia_habil
+        FROM dbo.dim_fecha df
+        JOIN cal ON cal.fecha = df.fecha
+        WHERE df.nombre_mes <> cal.nombre_mes OR df.nombre_dia <> cal.nombre_dia
+           OR df.es_fin_de_mes <> cal.es_fin_de_mes OR df.es_fin_de_semana <> cal.es_fin_de_semana
+           OR df.es_dia_habil <> cal.es_dia_habil
+    """
+    sql_insert = _SQL_CALENDARIO + f"""
+        INSERT INTO dbo.dim_fecha ({col_id}fecha, anio, mes, trimestre, semana_iso, dia,
+                                   nombre_mes, nombre_dia, es_fin_de_mes, es_fin_de_semana, es_dia_habil)
+        SELECT {val_id}cal.fecha, cal.anio, cal.mes, cal.trimestre, cal.semana_iso, cal.dia,
+               cal.nombre_mes, cal.nombre_dia, cal.es_fin_de_mes, cal.es_fin_de_semana, cal.es_dia_habil
+        FROM cal
+        WHERE NOT EXISTS (SELECT 1 FROM dbo.dim_fecha df WHERE df.fecha = cal.fecha)
+        ORDER BY cal.fecha
+    """
+
+    status, message = "ok", "OK"
+    try:
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(hasta, inicio + timedelta(days=lote_dias - 1))
+            dias = (fin - inicio).days + 1
+            params = [dias, inicio, feriados_json, fin]
+            with transaction.atomic(), connection.cursor() as cur:
+                cur.execute(sql_update, params)
+                actualizadas += max(cur.rowcount or 0, 0)
+                cur.execute(sql_insert, params)
+                insertadas += max(cur.rowcount or 0, 0)
+            lotes += 1
+            inicio = fin + timedelta(days=1)
+    except Exception as e:
+        status, message = "error", str(e)
+    finally:
+        from core.fechas import dim_fecha_cache
+        dim_fecha_cache.invalidar()
+
+    EtlRun.objects.create(
+        process="dim_fecha_generar",
+        status=status,
+        rows_affected=insertadas,
+        message=message[:500],
+        started_at=started,
+        finished_at=timezone.now(),
+        user=user if user and user.is_authenticated else None,
+    )
+
+    return {
+        "status": status,
+        "message": message,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "lotes": lotes,
+        "insertadas": insertadas,
+        "actualizadas": actualizadas,
+        "segundos": round(time.monotonic() - t0, 3),
+    }
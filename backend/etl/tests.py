@@ -1,3 +1,23 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .services import _nombre_proc, generar_calendario, pre_proceso
+
+
+class NombreProcTests(SimpleTestCase):
+    def test_normaliza(self):
+        for nombre in ("sp_etl_cargar_ventas", "dbo.sp_etl_cargar_ventas", "[dbo].[SP_ETL_CARGAR_VENTAS]"):
+            self.assertEqual(_nombre_proc(nombre), "sp_etl_cargar_ventas")
+
+
+class GenerarCalendarioTests(SimpleTestCase):
+    def test_rango_invalido(self):
+        with self.assertRaises(ValueError):
+            generar_calendario(date(2025, 2, 1), date(2025, 1, 1))
+
+
+class PreProcesoTests(SimpleTestCase):
+    def test_sin_ventas(self):
+        # solo los SP de ventas leen estado previo
+        self.assertEqual(pre_proceso("dbo.sp_etl_cargar_dimensiones"), {})
@@ -105,6 +105,53 @@ USE_TZ = True
 STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# =========================
+# dim_fecha
+# =========================
+# True cuando dim_fecha.id_fecha ya es YYYYMMDD (bd/migracion_dim_fecha_smart_key.sql)
+DIM_FECHA_SMART_KEY = os.getenv("DIM_FECHA_SMART_KEY", "False") == "True"
+# horizonte que precarga `manage.py dim_fecha_generar` (créditos hasta 48 meses)
+DIM_FECHA_HORIZONTE_ANIOS = int(os.getenv("DIM_FECHA_HORIZONTE_ANIOS", "10"))
+# feriados fijos ("MM-DD") o puntuales ("YYYY-MM-DD"); no son días hábiles
+DIM_FECHA_FERIADOS = ["01-01", "05-01", "06-30", "09-15", "10-20", "11-01", "12-24", "12-25", "12-31"]
+
+
+# =========================
+# Conteos y reportes
+# =========================
+# Caché de Django compartida por todos los procesos (web, ETL, comandos): ahí
+# viven las versiones de tablas de core/cache_datos.py, así una escritura o
+# una carga del ETL invalida los resultados en todos los workers. Por defecto
+# en la base (crear la tabla una vez: `python manage.py createcachetable`;
+# `manage.py check` avisa si falta y, mientras tanto, nada se memoriza);
+# con Redis/Memcached: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_LOCATION=redis://host:6379/1. Una caché por proceso (LocMemCache)
+# solo sirve con un único proceso.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": os.getenv("CACHE_LOCATION", "django_cache"),
+        # la caché en base borra entradas al azar al pasar de MAX_ENTRIES (300 por defecto)
+        **({"OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "100000"))}}
+           if CACHE_BACKEND.endswith("DatabaseCache") else {}),
+    }
+}
+# caché (core/cache_datos.py), segundos; las escrituras y el ETL la invalidan antes
+CONTEO_TTL = int(os.getenv("CONTEO_TTL", "30"))
+RENTABILIDAD_TTL = int(os.getenv("RENTABILIDAD_TTL", "3600"))
+# True cuando existe el agregado mensual (bd/migracion_agg_rentabilidad.sql)
+RENTABILIDAD_AGREGADA = os.getenv("RENTABILIDAD_AGREGADA", "False") == "True"
+# driver del prorrateo de gastos (core/prorrateo.py): ventas|unidades|costo|categoria|pesos
+PRORRATEO_DRIVER = os.getenv("PRORRATEO_DRIVER", "ventas")
+# True cuando existe resumen_ventas_mensual (bd/migracion_resumen_ventas_mensual.sql)
+RESUMEN_VENTAS_MENSUAL = os.getenv("RESUMEN_VENTAS_MENSUAL", "False") == "True"
+# True cuando existe cobranza_ventas (bd/migracion_cobranza_ventas.sql)
+COBRANZA_VENTAS = os.getenv("COBRANZA_VENTAS", "False") == "True"
+# cubo de rentabilidad en memoria (core/cubo.py); requiere numpy
+CUBO_RENTABILIDAD = os.getenv("CUBO_RENTABILIDAD", "False") == "True"
+CUBO_TTL = int(os.getenv("CUBO_TTL", "300"))
+
 
 # === CORS / CSRF para desarrollo con React ===
 CORS_ALLOW_ALL_ORIGINS = True